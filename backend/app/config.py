@@ -0,0 +1,24 @@
+# Rutas de los ficheros de datos y dirección de origen, compartidas por la API y el pipeline.
+# Son relativas a la raíz del repositorio, desde donde se arrancan ambos.
+
+direccion_origen = "Calle Costa Rica 49, 18194, Churriana de la Vega, Granada"
+csv1 = "data/da_centros.csv"
+csv2 = "data/centros_todos.csv"
+csv_coincidencias = "data/coincidencias.csv"
+csv_centros_exportados= "data/centros_exportados.csv"
+csv_bilingues = "data/da_centros_bilingues.csv" 
+csv_compensatorios = "data/centros_compensatoria.csv"
+# Coincidencias con las que se calculó la última exportación y cambios de la última actualización incremental
+csv_instantanea = "data/coincidencias_procesadas.csv"
+json_informe_cambios = "data/informe_cambios.json"
+# Matriz de trayectos de varios orígenes candidatos a todos los centros
+npz_matriz = "data/matriz_trayectos.npz"
+# Instantáneas binarias que los procesos de la API mapean en memoria en lugar de leer los CSV
+bin_centros_exportados = "data/centros_exportados.bin"
+bin_registro = "data/registro.bin"
+# Estado de los trabajos en segundo plano lanzados desde la API (reconstrucción de la exportación)
+dir_trabajos = "data/trabajos"
+# Registro de varias comunidades procesado por fragmentos en paralelo (pipeline.py fragmentado)
+csv_registro_enriquecido = "data/registro_enriquecido.csv"
+# Interfaz web que sirve la API (index.html, css, js e imágenes)
+dir_frontend = "frontend"
@@ -1,21 +1,70 @@
+# Importa las librerías necesarias
+import hashlib
+import json
+import os
+import sys
+from contextlib import asynccontextmanager
+from typing import Literal
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 
+# Los servicios importan sus dependencias relativas a backend/app (from services..., from models...)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-direccion_origen = "Calle Costa Rica 49, 18194, Churriana de la Vega, Granada"
-csv1 = "data/da_centros.csv"
-csv2 = "data/centros_todos.csv"
-csv_coincidencias = "data/coincidencias.csv"
-csv_centros_exportados= "data/centros_exportados.csv"
-csv_bilingues = "data/da_centros_bilingues.csv" 
-csv_compensatorios = "data/centros_compensatoria.csv"
+from config import (bin_centros_exportados, bin_registro, csv1, csv_bilingues, csv_centros_exportados, csv_coincidencias,
+                    csv_compensatorios, csv_instantanea, dir_frontend, dir_trabajos, direccion_origen)
 
-# Importa las librerías necesarias
-from fastapi import FastAPI
-from fastapi.responses import HTMLResponse
-from fastapi.middleware.cors import CORSMiddleware
-import csv
-from fastapi.responses import FileResponse
+from services.almacen_centros import AlmacenCentros
+from services.cache_rutas import obtener_cache
+from services.compresion import MiddlewareGZip
+from services.estaticos import CACHE_INMUTABLE, CACHE_REVALIDAR, RecursosEstaticos
+from services.exportacion import FORMATOS, generar_exportacion
+from services.indice_espacial import IndiceEspacial
+from services.metricas import REGISTRO, MiddlewareMetricas
+from services.ranking import ServicioRanking
+from services.registro import cargar_registro
+from services.teselas import TeselasCentros
+from services.trabajos import GestorTrabajos, TrabajoEnCurso, reconstruir_exportacion
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app):
+    # Al arrancar el servidor, no al importar el módulo: los benchmarks y las pruebas importan
+    # main sin querer reanudar una reconstrucción (que hace peticiones de pago al motor de trayectos)
+    gestor_trabajos.reanudar()
+    yield
+
+
+app = FastAPI(lifespan=ciclo_de_vida)
+
+# Dataset de centros cargado una sola vez al arrancar y recargado si cambia el fichero.
+# Si el pipeline dejó sus instantáneas binarias, se mapean en memoria: todos los workers
+# de uvicorn comparten las mismas páginas y arrancan sin leer los CSV
+almacen_centros = AlmacenCentros(csv_centros_exportados, ruta_binaria=bin_centros_exportados)
+
+# Registro completo de la Junta con su índice de búsqueda, e índice espacial sobre sus coordenadas
+registro_centros, indice_busqueda = cargar_registro(csv1, csv_bilingues, csv_compensatorios, bin_registro)
+indice_espacial = IndiceEspacial(registro_centros.latitudes, registro_centros.longitudes)
+# Agrupación de los centros por teselas del mapa, precalculada para todos los zooms
+teselas_centros = TeselasCentros(registro_centros.latitudes, registro_centros.longitudes)
+
+# Rankings por origen calculados bajo demanda, con las peticiones simultáneas agrupadas
+servicio_ranking = ServicioRanking(csv_coincidencias, csv_bilingues, csv_compensatorios)
+
+# Reconstrucción de la exportación en segundo plano. Si un proceso murió a medias de una, el
+# primero que arranca la reanuda (ver ciclo_de_vida); mientras tanto se sigue sirviendo la exportación anterior
+gestor_trabajos = GestorTrabajos(dir_trabajos, lambda parametros, seguimiento: reconstruir_exportacion(
+    csv_coincidencias, csv_centros_exportados, ruta_binaria=bin_centros_exportados, csv_instantanea=csv_instantanea,
+    csv_bilingues=csv_bilingues, csv_compensatorios=csv_compensatorios, seguimiento=seguimiento, **parametros))
+
+# Frontend en memoria: index.html con las referencias a los CSS y JS con huella, ya comprimidos.
+# Se busca desde la raíz del repositorio, no desde el directorio actual (los benchmarks arrancan
+# la API desde el directorio de sus datos)
+recursos_estaticos = RecursosEstaticos(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                                    dir_frontend))
+imagen_risa = recursos_estaticos.cargar("assets/images/risa.png")
 
-app = FastAPI()
 # Configuración del middleware CORS (Cross-Origin Resource Sharing)
 # Permite que el frontend acceda a la API desde un dominio diferente
 app.add_middleware(
@@ -24,49 +73,473 @@ app.add_middleware(
     allow_credentials=True,  # Permite enviar credenciales en las peticiones
     allow_methods=["*"],  # Permite todos los métodos HTTP (GET, POST, etc)
     allow_headers=["*"],  # Permite todas las cabeceras HTTP
+    expose_headers=["X-Total-Count", "ETag", "X-Ranking", "Location"],  # Cabeceras que el frontend puede leer
 )
+# Comprime las respuestas que no vienen ya comprimidas (listados filtrados, facetas...), salvo
+# las que son binarios comprimidos de por sí (la exportación a Excel)
+app.add_middleware(MiddlewareGZip, minimum_size=1000, compresslevel=6)
+# Latencia de cada petición por ruta, para /metrics (el último añadido es el más externo)
+app.add_middleware(MiddlewareMetricas)
+
+# Métricas que se leen en el momento de exponerlas
+REGISTRO.calibre("centros_dataset_recargas_total", "Veces que se ha recargado el CSV exportado", lambda: almacen_centros.recargas,
+                 tipo="counter")
+REGISTRO.calibre("centros_dataset_filas", "Centros de la instantánea servida por /api/centros", lambda: len(almacen_centros.obtener().filas))
+REGISTRO.calibre("centros_dataset_cargado_timestamp_segundos", "Momento en que se cargó la instantánea vigente", lambda: almacen_centros.obtener().cargado_en)
+REGISTRO.calibre("centros_registro_filas", "Centros del registro completo (da_centros.csv)", lambda: len(registro_centros.latitudes))
+REGISTRO.calibre("centros_cache_rutas_aciertos_total", "Consultas resueltas desde la caché de rutas", lambda: obtener_cache().aciertos,
+                 tipo="counter")
+REGISTRO.calibre("centros_cache_rutas_fallos_total", "Consultas que no estaban en la caché de rutas", lambda: obtener_cache().fallos,
+                 tipo="counter")
+REGISTRO.calibre("centros_cache_rutas_ratio_aciertos", "Proporción de aciertos de la caché de rutas",
+                 lambda: obtener_cache().estadisticas()["ratio_aciertos"])
+REGISTRO.calibre("centros_cache_rutas_entradas", "Entradas guardadas en la caché de rutas", lambda: obtener_cache().estadisticas()["entradas"])
+REGISTRO.calibre("centros_ranking_peticiones_total", "Peticiones de /api/ranking por procedencia del resultado",
+                 lambda: {(procedencia,): servicio_ranking.estadisticas()[medida]
+                          for procedencia, medida in (("cache", "aciertos"), ("calculada", "calculos"), ("agrupada", "agrupadas"))},
+                 ("procedencia",), tipo="counter")
+REGISTRO.calibre("centros_ranking_en_memoria", "Rankings por origen guardados en memoria", lambda: servicio_ranking.estadisticas()["rankings"])
 
 # Endpoint que devuelve todos los centros educativos en formato JSON
 @app.get("/api/centros")
-def leer_centros():
+def leer_centros(
+    request: Request,
+    municipio: str | None = None,
+    provincia: str | None = None,
+    compensatorio: str | None = None,
+    idiomas: str | None = None,
+    tipo: str | None = None,
+    publico_privado: str | None = None,
+    orden: Literal["duracion", "distancia", "linea", "nombre"] | None = None,
+    desc: bool = False,
+    limit: int | None = Query(None, ge=1, le=10000),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Devuelve los centros del CSV exportado en formato JSON
+    Sin parámetros, el JSON completo se sirve ya serializado (y comprimido si el cliente acepta gzip)
+    desde memoria. Con filtros, orden o paginación la consulta se resuelve con los índices de la
+    instantánea y el total de centros que cumplen los filtros se indica en la cabecera X-Total-Count.
+    Si el cliente envía un If-None-Match con la versión vigente se responde 304 sin cuerpo.
+    Returns:
+        Response: Lista de diccionarios con los datos de cada centro
+    """
+    instantanea = almacen_centros.obtener()
+    filtros = {
+        "municipio": municipio,
+        "provincia": provincia,
+        "compensatorio": compensatorio,
+        "idiomas": idiomas,
+        "tipo": tipo,
+        "publico_privado": publico_privado,
+    }
+    if not any(filtros.values()) and orden is None and limit is None and offset == 0:
+        return respuesta_instantanea(request, instantanea)
+
+    # La respuesta depende sólo de la versión del dataset y de la consulta
+    consulta = json.dumps([filtros, orden, desc, limit, offset], sort_keys=True)
+    etag = f'W/"{instantanea.etag[1:-1]}-{hashlib.sha1(consulta.encode()).hexdigest()[:16]}"'
+    cabeceras = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cabeceras)
+
+    total, filas = instantanea.indice.buscar(filtros, orden, desc, limit, offset)
+    cabeceras["X-Total-Count"] = str(total)
+    contenido = json.dumps(filas, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return Response(content=contenido, media_type="application/json", headers=cabeceras)
+
+
+@app.get("/api/centros/facetas")
+def leer_facetas(
+    municipio: str | None = None,
+    provincia: str | None = None,
+    compensatorio: str | None = None,
+    idiomas: str | None = None,
+    tipo: str | None = None,
+    publico_privado: str | None = None,
+):
+    """
+    Devuelve, para cada columna filtrable, el número de centros de cada valor
+    teniendo en cuenta el resto de filtros aplicados. Sirve para rellenar los desplegables
+    del frontend sin descargar el dataset completo.
+    Returns:
+        dict: Columna -> {valor: número de centros}
+    """
+    filtros = {
+        "municipio": municipio,
+        "provincia": provincia,
+        "compensatorio": compensatorio,
+        "idiomas": idiomas,
+        "tipo": tipo,
+        "publico_privado": publico_privado,
+    }
+    return almacen_centros.obtener().indice.facetas(filtros)
+
+
+@app.get("/api/export")
+def exportar_centros(
+    format: Literal["csv", "ndjson", "xlsx"] = "csv",
+    municipio: str | None = None,
+    provincia: str | None = None,
+    compensatorio: str | None = None,
+    idiomas: str | None = None,
+    tipo: str | None = None,
+    publico_privado: str | None = None,
+    orden: Literal["duracion", "distancia", "linea", "nombre"] | None = None,
+    desc: bool = False,
+):
+    """
+    Descarga los centros en CSV, NDJSON o Excel con los mismos filtros y orden que /api/centros
+    El fichero se envía por bloques (transferencia chunked) a medida que se recorren las filas,
+    sin construirlo entero en memoria. El total de centros exportados va en X-Total-Count.
+    Returns:
+        StreamingResponse: Fichero descargable con los centros
+    """
+    instantanea = almacen_centros.obtener()
+    filtros = {
+        "municipio": municipio,
+        "provincia": provincia,
+        "compensatorio": compensatorio,
+        "idiomas": idiomas,
+        "tipo": tipo,
+        "publico_privado": publico_privado,
+    }
+    tipo_mime, extension = FORMATOS[format]
+    cabeceras = {
+        "Content-Disposition": f'attachment; filename="centros.{extension}"',
+        "X-Total-Count": str(len(instantanea.indice.filtrar(filtros))),
+    }
+    filas = instantanea.indice.iterar(filtros, orden, desc)
+    return StreamingResponse(generar_exportacion(format, instantanea.encabezados, filas), media_type=tipo_mime, headers=cabeceras)
+
+
+def respuesta_instantanea(request, instantanea):
+    """
+    Construye la respuesta HTTP de una instantánea con ETag, 304 y compresión gzip.
+
+    Args:
+        request (Request): Petición entrante (cabeceras If-None-Match y Accept-Encoding)
+        instantanea (InstantaneaCentros): Versión del dataset a servir
+
+    Returns:
+        Response: Respuesta 200 con el JSON o 304 si el cliente ya lo tiene
+    """
+    acepta_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    etag = instantanea.etag_gzip if acepta_gzip else instantanea.etag
+    cabeceras = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",  # El navegador puede guardarlo, pero debe revalidar
+        "Vary": "Accept-Encoding",
+    }
+
+    if instantanea.coincide_etag(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=cabeceras)
+
+    if acepta_gzip:
+        cabeceras["Content-Encoding"] = "gzip"
+        return Response(content=instantanea.json_gzip, media_type="application/json", headers=cabeceras)
+    return Response(content=instantanea.json, media_type="application/json", headers=cabeceras)
+
+def mascara_registro(tipo, publico_privado, bilingue, compensatorio, ensenanza):
+    """
+    Máscara de los filtros de atributos del registro, con las enseñanzas desconocidas como error 400
+    """
+    try:
+        return registro_centros.mascara(tipo, publico_privado, bilingue, compensatorio, ensenanza)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/ensenanzas")
+def leer_ensenanzas():
+    """
+    Devuelve las marcas de régimen y enseñanza del registro que admite el filtro 'ensenanza'
+    Returns:
+        dict: Nombre de cada marca -> número de centros que la tienen
+    """
+    return registro_centros.niveles.conteos()
+
+
+@app.get("/api/cercanos")
+def leer_cercanos(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radio_km: float | None = Query(None, gt=0),
+    k: int | None = Query(None, ge=1, le=1000),
+    tipo: str | None = None,
+    publico_privado: str | None = None,
+    bilingue: bool | None = None,
+    compensatorio: bool | None = None,
+    ensenanza: list[str] | None = Query(None),
+):
+    """
+    Devuelve los centros del registro más cercanos a un punto (en línea recta)
+    Se puede pedir un radio, un número máximo de centros o ambos; si no se indica ninguno
+    se devuelven los 20 más cercanos. Los filtros de atributos se aplican antes de buscar;
+    'ensenanza' se puede repetir y el centro debe impartirlas todas (?ensenanza=pub_eso&ensenanza=pub_bach_ord).
+    Returns:
+        list: Centros ordenados por distancia, con su distancia en línea recta en km
+    """
+    mascara = mascara_registro(tipo, publico_privado, bilingue, compensatorio, ensenanza)
+    if k is None and radio_km is not None:
+        posiciones, distancias = indice_espacial.en_radio(lat, lng, radio_km, mascara)
+    else:
+        posiciones, distancias = indice_espacial.mas_cercanos(lat, lng, k or 20, radio_km, mascara)
+
+    centros = []
+    for posicion, distancia in zip(posiciones.tolist(), distancias.tolist()):
+        centro = registro_centros.centro(posicion)
+        centro["distancia_linea_km"] = round(distancia, 3)
+        centros.append(centro)
+    return centros
+
+
+@app.get("/api/caja")
+def leer_caja(
+    lat_min: float = Query(..., ge=-90, le=90),
+    lng_min: float = Query(..., ge=-180, le=180),
+    lat_max: float = Query(..., ge=-90, le=90),
+    lng_max: float = Query(..., ge=-180, le=180),
+    tipo: str | None = None,
+    publico_privado: str | None = None,
+    bilingue: bool | None = None,
+    compensatorio: bool | None = None,
+    ensenanza: list[str] | None = Query(None),
+    limit: int = Query(1000, ge=1, le=10000),
+):
+    """
+    Devuelve los centros del registro dentro de un rectángulo de coordenadas
+    Un rectángulo con algún mínimo mayor que su máximo se rechaza con 400.
+    Returns:
+        list: Centros dentro del rectángulo (como mucho 'limit'); el total se indica en X-Total-Count
+    """
+    if lat_min > lat_max or lng_min > lng_max:
+        raise HTTPException(status_code=400, detail="Rectángulo no válido: lat_min y lng_min no pueden ser mayores que lat_max y lng_max")
+    mascara = mascara_registro(tipo, publico_privado, bilingue, compensatorio, ensenanza)
+    posiciones = indice_espacial.en_caja(lat_min, lng_min, lat_max, lng_max, mascara)
+    centros = [registro_centros.centro(posicion) for posicion in posiciones[:limit].tolist()]
+    contenido = json.dumps(centros, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return Response(content=contenido, media_type="application/json", headers={"X-Total-Count": str(len(posiciones))})
+
+
+@app.get("/api/buscar")
+def buscar_centros(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=100),
+    tipo: str | None = None,
+    publico_privado: str | None = None,
+    bilingue: bool | None = None,
+    compensatorio: bool | None = None,
+    ensenanza: list[str] | None = Query(None),
+):
+    """
+    Busca centros del registro por nombre, tipo, localidad o municipio mientras se escribe
+    No distingue mayúsculas ni tildes ('vicar' encuentra 'Vícar'), admite el principio de cada
+    palabra y siglas del tipo ('ies granada') y, si faltan resultados exactos, añade los más
+    parecidos para tolerar erratas.
+    Returns:
+        Response: Centros de mayor a menor puntuación; el total de coincidencias exactas en X-Total-Count
+    """
+    mascara = mascara_registro(tipo, publico_privado, bilingue, compensatorio, ensenanza)
+    total, resultados = indice_busqueda.buscar(q, limit, mascara)
+    centros = []
+    for posicion, puntuacion in resultados:
+        centro = registro_centros.centro(posicion)
+        centro["puntuacion"] = puntuacion
+        centros.append(centro)
+    contenido = json.dumps(centros, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return Response(content=contenido, media_type="application/json", headers={"X-Total-Count": str(total)})
+
+
+@app.get("/api/tiles/{z}/{x}/{y}")
+def leer_tesela(
+    z: int,
+    x: int,
+    y: int,
+    tipo: str | None = None,
+    publico_privado: str | None = None,
+    bilingue: bool | None = None,
+    compensatorio: bool | None = None,
+    ensenanza: list[str] | None = Query(None),
+):
+    """
+    Devuelve los centros del registro de una tesela del mapa (esquema z/x/y de OpenStreetMap)
+    Los centros cercanos entre sí se agrupan en un punto con su número de centros; los que
+    quedan solos se devuelven con sus datos básicos. Admite los mismos filtros que /api/cercanos.
+    Returns:
+        Response: Grupos y centros de la tesela; el número de centros en X-Total-Count
+    """
+    mascara = mascara_registro(tipo, publico_privado, bilingue, compensatorio, ensenanza)
+    try:
+        grupos, solos = teselas_centros.tesela(z, x, y, mascara)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    centros = [{
+        "codigo": registro_centros.codigos[posicion],
+        "nombre": registro_centros.nombres[posicion],
+        "tipo": registro_centros.tipos[posicion],
+        "publico_privado": registro_centros.publico_privado[posicion],
+        "lat": round(float(registro_centros.latitudes[posicion]), 6),
+        "lng": round(float(registro_centros.longitudes[posicion]), 6),
+    } for posicion in solos.tolist()]
+    tesela = {
+        "grupos": [{"lat": round(lat, 6), "lng": round(lng, 6), "centros": numero} for lat, lng, numero in grupos],
+        "centros": centros,
+    }
+    total = len(centros) + sum(numero for _, _, numero in grupos)
+    contenido = json.dumps(tesela, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    # El registro sólo cambia al reiniciar: el navegador puede reutilizar las teselas un rato
+    return Response(content=contenido, media_type="application/json",
+                    headers={"X-Total-Count": str(total), "Cache-Control": "public, max-age=300"})
+
+
+@app.get("/api/ranking")
+def leer_ranking(
+    origen: str | None = None,
+    lat: float | None = Query(None, ge=-90, le=90),
+    lng: float | None = Query(None, ge=-180, le=180),
+    radio_km: float | None = Query(None, gt=0),
+    top_k: int | None = Query(None, ge=1, le=10000),
+    limit: int | None = Query(None, ge=1, le=10000),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Devuelve los centros ordenados por duración del trayecto desde cualquier origen
+    El origen se indica como dirección (origen) o como coordenadas (lat y lng). Con radio_km
+    o top_k sólo se calcula el trayecto de los centros más cercanos en línea recta.
+    El ranking de cada origen se calcula una vez: las peticiones simultáneas esperan al mismo
+    cálculo y las siguientes se sirven de memoria (cabecera X-Ranking: calculada, agrupada o cache).
+    Returns:
+        Response: Centros ordenados con el formato de /api/centros; el total en X-Total-Count
+    """
+    if origen is None and (lat is None or lng is None):
+        raise HTTPException(status_code=400, detail="Indica un origen o unas coordenadas (lat y lng)")
+
+    ranking, procedencia = servicio_ranking.obtener(origen, lat, lng, radio_km, top_k)
+    filas = ranking.filas[offset:offset + limit if limit is not None else None]
+    contenido = json.dumps(filas, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    cabeceras = {"X-Total-Count": str(len(ranking.filas)), "X-Ranking": procedencia}
+    return Response(content=contenido, media_type="application/json", headers=cabeceras)
+
+
+@app.post("/api/jobs/rebuild", status_code=202)
+def lanzar_reconstruccion(
+    response: Response,
+    origen: str = Query(direccion_origen, min_length=1),
+    radio_km: float | None = Query(None, gt=0),
+    top_k: int | None = Query(None, ge=1, le=10000),
+    max_hilos: int = Query(8, ge=1, le=32),
+):
+    """
+    Lanza en segundo plano la reconstrucción de la exportación: trayectos, bilingües y
+    compensatorios, y sustitución de centros_exportados.csv y su instantánea binaria
+    Mientras dura se sigue sirviendo la exportación anterior. Si hay una reconstrucción
+    interrumpida con los mismos parámetros se reanuda en lugar de empezar otra.
+    Returns:
+        dict: Estado del trabajo; su URL de seguimiento en la cabecera Location
+    """
+    try:
+        trabajo = gestor_trabajos.crear({"origen": origen, "radio_km": radio_km, "top_k": top_k, "max_hilos": max_hilos})
+    except TrabajoEnCurso as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    response.headers["Location"] = f"/api/jobs/{trabajo['id']}"
+    return trabajo
+
+
+@app.get("/api/jobs/{id_trabajo}")
+def leer_trabajo(id_trabajo: str):
+    """
+    Devuelve el estado de un trabajo: etapa en curso, avance de cada etapa y segundos restantes estimados
+    """
+    trabajo = gestor_trabajos.obtener(id_trabajo)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return trabajo
+
+
+@app.delete("/api/jobs/{id_trabajo}", status_code=202)
+def cancelar_trabajo(id_trabajo: str):
+    """
+    Pide la cancelación de un trabajo. Se deja de pedir trayectos (los ya calculados quedan en
+    la caché de rutas) y la exportación anterior no se toca
+    """
+    trabajo = gestor_trabajos.cancelar(id_trabajo)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return trabajo
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def leer_metricas():
+    """
+    Expone las métricas del proceso en el formato de texto de Prometheus: latencia por ruta,
+    peticiones al motor de trayectos, caché de rutas, recargas del dataset y etapas del pipeline.
+    Returns:
+        PlainTextResponse: Métricas en formato text/plain; version=0.0.4
+    """
+    return PlainTextResponse(REGISTRO.exponer(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+def respuesta_estatica(request, recurso, cache_control):
     """
-    Lee el archivo CSV de centros y lo convierte a formato JSON
+    Construye la respuesta de un recurso del frontend en memoria, con ETag, 304 y la versión
+    precomprimida que acepte el cliente.
+
+    Args:
+        request (Request): Petición entrante (cabeceras If-None-Match y Accept-Encoding)
+        recurso (RecursoEstatico): Recurso a servir
+        cache_control (str): Cabecera Cache-Control de la respuesta
+
     Returns:
-        list: Lista de diccionarios con los datos de cada centro
+        Response: Respuesta 200 con el recurso o 304 si el cliente ya lo tiene
     """
-    datos = []
-    # Abre el archivo CSV con codificación ISO para caracteres españoles
-    with open(csv_centros_exportados, mode='r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)  # Crea un lector de CSV que mapea a diccionarios
-        # Itera por cada fila y la añade a la lista de datos
-        for row in reader:
-            datos.append(row)
-    return datos
+    contenido, codificacion, etag = recurso.version(request.headers.get("accept-encoding"))
+    cabeceras = {"ETag": etag, "Cache-Control": cache_control}
+    if recurso.comprimidos:
+        cabeceras["Vary"] = "Accept-Encoding"
+    if recurso.coincide_etag(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=cabeceras)
+    if codificacion:
+        cabeceras["Content-Encoding"] = codificacion
+    return Response(content=contenido, media_type=recurso.tipo_mime, headers=cabeceras)
+
 
 # Endpoint para servir la página principal
 @app.get("/", response_class=HTMLResponse)
-def get_homepage():
+def get_homepage(request: Request):
     """
-    Sirve el archivo HTML principal de la aplicación
+    Sirve el archivo HTML principal de la aplicación desde memoria, con sus referencias a los
+    CSS y JS reescritas a los nombres con huella. El navegador lo revalida con su ETag.
     Returns:
-        HTMLResponse: Contenido del archivo index.html
+        Response: Contenido de index.html o 304 si el cliente ya lo tiene
     """
-    # Lee el archivo HTML y lo devuelve como respuesta
-    with open('frontend/index.html', 'r', encoding='utf-8') as file:
-        html_content = file.read()
-    return HTMLResponse(content=html_content)
+    return respuesta_estatica(request, recursos_estaticos.html, CACHE_REVALIDAR)
+
+
+@app.get("/static/{ruta:path}")
+def get_estatico(request: Request, ruta: str):
+    """
+    Sirve los CSS y JS del frontend. Con la huella de contenido en el nombre
+    ('css/style.3f2a9c1b4d5e.css') se pueden guardar para siempre; con el nombre original
+    se revalidan con su ETag.
+    Returns:
+        Response: Recurso precomprimido con brotli o gzip si el cliente lo acepta
+    """
+    recurso, con_huella = recursos_estaticos.buscar(ruta)
+    if recurso is None:
+        raise HTTPException(status_code=404, detail=f"No existe el recurso '{ruta}'")
+    return respuesta_estatica(request, recurso, CACHE_INMUTABLE if con_huella else CACHE_REVALIDAR)
+
 
 @app.get("/image")
-async def get_image():
+async def get_image(request: Request):
     """
     Endpoint que sirve una imagen estática
     
-    Este endpoint devuelve un archivo de imagen estática ubicado en 'frontend/assets/images/risa.png'
-    como FileResponse con tipo de medio image/png.
+    Este endpoint devuelve la imagen 'frontend/assets/images/risa.png', cargada en memoria al
+    arrancar, con tipo de medio image/png y un ETag para que el navegador la revalide sin descargarla.
 
     Returns:
-        FileResponse: Un objeto FileResponse que contiene el archivo de imagen en formato PNG
+        Response: La imagen en formato PNG o 304 si el cliente ya la tiene
     """
-    return FileResponse("frontend/assets/images/risa.png", media_type="image/png")
-
-
+    return respuesta_estatica(request, imagen_risa, CACHE_REVALIDAR)
@@ -0,0 +1,293 @@
+import sys
+
+import numpy as np
+
+from services.enriquecimiento import ETAPAS_BILINGUES
+from services.unidades import formatear_distancia, formatear_duracion
+
+# Valor de las columnas enteras cuando el dato no se conoce
+DESCONOCIDO = -1
+
+
+class ColumnaCategorica:
+    """
+    Columna de texto con pocos valores distintos, guardada como un código entero por fila
+    y la lista de valores distintos (internados). Filtrar por un valor es comparar enteros.
+    """
+
+    def __init__(self, valores):
+        """
+        Args:
+            valores (list): Texto de cada fila
+        """
+        posiciones = {}
+        codigos = np.empty(len(valores), dtype=np.int32)
+        for fila, valor in enumerate(valores):
+            codigo = posiciones.get(valor)
+            if codigo is None:
+                codigo = posiciones[valor] = len(posiciones)
+            codigos[fila] = codigo
+        self.categorias = [sys.intern(valor) for valor in posiciones]
+        self.codigos = codigos
+        self._posiciones = posiciones
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def __getitem__(self, fila):
+        return self.categorias[self.codigos[fila]]
+
+    def mascara(self, valor):
+        """
+        Devuelve la máscara booleana de las filas con un valor (todas a False si no existe).
+        """
+        codigo = self._posiciones.get(valor)
+        if codigo is None:
+            return np.zeros(len(self.codigos), dtype=bool)
+        return self.codigos == codigo
+
+    def tomar(self, posiciones):
+        """
+        Devuelve una columna con las filas indicadas, compartiendo las categorías.
+        """
+        columna = ColumnaCategorica.__new__(ColumnaCategorica)
+        columna.categorias = self.categorias
+        columna.codigos = self.codigos[posiciones]
+        columna._posiciones = self._posiciones
+        return columna
+
+
+class CentroCollection:
+    """
+    Colección de centros guardada por columnas (struct of arrays).
+
+    Las métricas son enteros (metros y segundos, DESCONOCIDO si faltan) y las columnas
+    repetitivas (provincia, municipio, tipo, público/privado) son categóricas, así que ordenar,
+    quedarse con los K primeros y filtrar se hace con NumPy sobre las columnas numéricas.
+    Los textos que se muestran ('1,2 km', '1 h 5 min') sólo se generan al exportar.
+
+    Attributes:
+        codigos, nombres, direcciones, codigos_postales (list): Columnas de texto libre
+        provincias, municipios, tipos, publico_privado (ColumnaCategorica): Columnas categóricas
+        distancia_m, duracion_s, distancia_linea_m (np.ndarray): Métricas enteras
+        latitudes, longitudes (np.ndarray): Coordenadas (NaN si faltan)
+        bilingue, compensatorio (np.ndarray): Marcas booleanas
+        etapas_bilingues (list): Modalidad bilingüe por etapa de cada centro ({} si no es bilingüe)
+    """
+
+    # Columnas numéricas por las que se puede ordenar
+    ORDENACIONES = {"duracion": "duracion_s", "distancia": "distancia_m", "linea": "distancia_linea_m"}
+
+    def __init__(self, codigos, nombres, direcciones, codigos_postales, provincias, municipios, tipos,
+                 publico_privado, distancia_m, duracion_s, distancia_linea_m, latitudes, longitudes,
+                 bilingue, compensatorio, etapas_bilingues):
+        self.codigos = codigos
+        self.nombres = nombres
+        self.direcciones = direcciones
+        self.codigos_postales = codigos_postales
+        self.provincias = provincias
+        self.municipios = municipios
+        self.tipos = tipos
+        self.publico_privado = publico_privado
+        self.distancia_m = distancia_m
+        self.duracion_s = duracion_s
+        self.distancia_linea_m = distancia_linea_m
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.bilingue = bilingue
+        self.compensatorio = compensatorio
+        self.etapas_bilingues = etapas_bilingues
+
+    @classmethod
+    def desde_centros(cls, centros):
+        """
+        Construye la colección a partir de objetos CentroEducativo.
+
+        Args:
+            centros (list): Objetos CentroEducativo
+
+        Returns:
+            CentroCollection: Colección con los mismos centros y en el mismo orden
+        """
+        def entero(valor):
+            return DESCONOCIDO if valor is None else int(valor)
+
+        def real(valor):
+            return np.nan if valor is None else valor
+
+        return cls(
+            codigos=[centro.codigo_centro for centro in centros],
+            nombres=[centro.nombre_centro for centro in centros],
+            direcciones=[centro.direccion for centro in centros],
+            codigos_postales=[centro.codigo_postal for centro in centros],
+            provincias=ColumnaCategorica([centro.provincia for centro in centros]),
+            municipios=ColumnaCategorica([centro.municipio for centro in centros]),
+            tipos=ColumnaCategorica([centro.tipo_centro for centro in centros]),
+            publico_privado=ColumnaCategorica([centro.publico_privado for centro in centros]),
+            distancia_m=np.array([entero(centro.distancia_m) for centro in centros], dtype=np.int32),
+            duracion_s=np.array([entero(centro.duracion_s) for centro in centros], dtype=np.int32),
+            distancia_linea_m=np.array([DESCONOCIDO if centro.distancia_linea_km is None else round(centro.distancia_linea_km * 1000)
+                                        for centro in centros], dtype=np.int32),
+            latitudes=np.array([real(centro.latitud) for centro in centros], dtype=np.float64),
+            longitudes=np.array([real(centro.longitud) for centro in centros], dtype=np.float64),
+            bilingue=np.array([centro.bil == "Es bilingüe" for centro in centros], dtype=bool),
+            compensatorio=np.array([centro.compensatoria == "Es compensatorio" for centro in centros], dtype=bool),
+            etapas_bilingues=[centro.etapas_bilingues for centro in centros],
+        )
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def tomar(self, posiciones):
+        """
+        Devuelve una nueva colección con las filas indicadas, en ese orden.
+
+        Args:
+            posiciones (np.ndarray): Posiciones de las filas
+
+        Returns:
+            CentroCollection: Colección con esas filas
+        """
+        posiciones = np.asarray(posiciones, dtype=np.int64)
+        lista = posiciones.tolist()
+        return CentroCollection(
+            codigos=[self.codigos[fila] for fila in lista],
+            nombres=[self.nombres[fila] for fila in lista],
+            direcciones=[self.direcciones[fila] for fila in lista],
+            codigos_postales=[self.codigos_postales[fila] for fila in lista],
+            provincias=self.provincias.tomar(posiciones),
+            municipios=self.municipios.tomar(posiciones),
+            tipos=self.tipos.tomar(posiciones),
+            publico_privado=self.publico_privado.tomar(posiciones),
+            distancia_m=self.distancia_m[posiciones],
+            duracion_s=self.duracion_s[posiciones],
+            distancia_linea_m=self.distancia_linea_m[posiciones],
+            latitudes=self.latitudes[posiciones],
+            longitudes=self.longitudes[posiciones],
+            bilingue=self.bilingue[posiciones],
+            compensatorio=self.compensatorio[posiciones],
+            etapas_bilingues=[self.etapas_bilingues[fila] for fila in lista],
+        )
+
+    def _clave(self, por):
+        if por not in self.ORDENACIONES:
+            raise ValueError(f"Orden desconocido: {por!r} (disponibles: {', '.join(self.ORDENACIONES)})")
+        valores = getattr(self, self.ORDENACIONES[por]).astype(np.int64)
+        # Los desconocidos van siempre al final
+        return np.where(valores == DESCONOCIDO, np.iinfo(np.int64).max, valores)
+
+    def orden(self, por="duracion", descendente=False):
+        """
+        Calcula el orden de las filas por una métrica, con los desconocidos al final.
+
+        Args:
+            por (str): 'duracion', 'distancia' o 'linea'
+            descendente (bool): De mayor a menor
+
+        Returns:
+            np.ndarray: Posiciones de las filas ordenadas (orden estable)
+        """
+        clave = self._clave(por)
+        if descendente:
+            conocidos = clave != np.iinfo(np.int64).max
+            clave = np.where(conocidos, -clave, clave)
+        return np.argsort(clave, kind="stable")
+
+    def ordenar(self, por="duracion", descendente=False):
+        """
+        Devuelve la colección ordenada por una métrica (ver orden).
+        """
+        return self.tomar(self.orden(por, descendente))
+
+    def primeros(self, k, por="duracion"):
+        """
+        Devuelve las posiciones de los K centros con menor valor de una métrica, ordenadas.
+        Con argpartition no hace falta ordenar la colección completa.
+
+        Args:
+            k (int): Número de centros
+            por (str): 'duracion', 'distancia' o 'linea'
+
+        Returns:
+            np.ndarray: Posiciones de los K primeros (sin incluir desconocidos)
+        """
+        clave = self._clave(por)
+        candidatos = np.flatnonzero(clave != np.iinfo(np.int64).max)
+        if k < len(candidatos):
+            candidatos = candidatos[np.argpartition(clave[candidatos], k - 1)[:k]]
+        return candidatos[np.argsort(clave[candidatos], kind="stable")]
+
+    def mascara(self, provincia=None, municipio=None, tipo=None, publico_privado=None, bilingue=None,
+                compensatorio=None, max_duracion_s=None, max_distancia_m=None):
+        """
+        Construye la máscara de los centros que cumplen todos los filtros indicados.
+
+        Args:
+            provincia, municipio, tipo, publico_privado (str, optional): Valor exacto de la columna
+            bilingue, compensatorio (bool, optional): Sólo los que tienen (True) o no tienen (False) la marca
+            max_duracion_s (int, optional): Duración máxima del trayecto en segundos
+            max_distancia_m (int, optional): Distancia máxima por carretera en metros
+
+        Returns:
+            np.ndarray: Máscara booleana
+        """
+        mascara = np.ones(len(self), dtype=bool)
+        for columna, valor in ((self.provincias, provincia), (self.municipios, municipio),
+                               (self.tipos, tipo), (self.publico_privado, publico_privado)):
+            if valor is not None:
+                mascara &= columna.mascara(valor)
+        if bilingue is not None:
+            mascara &= self.bilingue if bilingue else ~self.bilingue
+        if compensatorio is not None:
+            mascara &= self.compensatorio if compensatorio else ~self.compensatorio
+        if max_duracion_s is not None:
+            mascara &= (self.duracion_s != DESCONOCIDO) & (self.duracion_s <= max_duracion_s)
+        if max_distancia_m is not None:
+            mascara &= (self.distancia_m != DESCONOCIDO) & (self.distancia_m <= max_distancia_m)
+        return mascara
+
+    def filtrar(self, **filtros):
+        """
+        Devuelve la colección con los centros que cumplen los filtros (ver mascara).
+        """
+        return self.tomar(np.flatnonzero(self.mascara(**filtros)))
+
+    def memoria_bytes(self):
+        """
+        Estima la memoria de las columnas numéricas y categóricas (sin los textos libres).
+        """
+        columnas = (self.distancia_m, self.duracion_s, self.distancia_linea_m, self.latitudes, self.longitudes,
+                    self.bilingue, self.compensatorio, self.provincias.codigos, self.municipios.codigos,
+                    self.tipos.codigos, self.publico_privado.codigos)
+        return sum(columna.nbytes for columna in columnas)
+
+    def filas_exportacion(self):
+        """
+        Genera las filas del CSV exportado, con los textos de distancia y duración formateados.
+
+        Yields:
+            dict: Fila con los encabezados de ENCABEZADOS_EXPORTACION
+        """
+        for fila in range(len(self)):
+            distancia_m = int(self.distancia_m[fila])
+            duracion_s = int(self.duracion_s[fila])
+            distancia_linea_m = int(self.distancia_linea_m[fila])
+            etapas = self.etapas_bilingues[fila]
+            resultado = {
+                "Código Centro": self.codigos[fila],
+                "Tipo Centro": self.tipos[fila],
+                "Nombre Centro": self.nombres[fila],
+                "Público/Privado": self.publico_privado[fila],
+                "Dirección": self.direcciones[fila],
+                "Código Postal": self.codigos_postales[fila],
+                "Municipio": self.municipios[fila],
+                "Provincia": self.provincias[fila],
+                "Distancia (Km)": "" if distancia_m == DESCONOCIDO else formatear_distancia(distancia_m),
+                "Duración": "" if duracion_s == DESCONOCIDO else formatear_duracion(duracion_s),
+                "Idiomas": "Es bilingüe" if self.bilingue[fila] else "Empty",
+                "Centro Compensatorio": "Es compensatorio" if self.compensatorio[fila] else "Empty",
+                "Distancia en línea (Km)": "" if distancia_linea_m == DESCONOCIDO else formatear_distancia(distancia_linea_m),
+            }
+            for etapa in ETAPAS_BILINGUES:
+                resultado[f"Bilingüe {etapa}"] = etapas.get(etapa, "")
+            yield resultado
@@ -1,8 +1,16 @@
-from services.googleConnect import calcular_distancias
+from services.enrutamiento import obtener_motor
+from services.googleConnect import calcular_distancias, calcular_distancias_lote
+from services.unidades import distancia_a_metros, duracion_a_segundos, formatear_distancia, formatear_duracion
 import re
+import sys
 
 class CentroEducativo:
-    def __init__(self, direccion,codigo_postal, municipio, provincia,codigo_centro,tipo_centro,nombre_centro,publico_privado,bil,compensatoria):
+    # Sin __dict__ por instancia: con cientos de miles de centros la diferencia de memoria es grande
+    __slots__ = ("direccion", "codigo_postal", "municipio", "provincia", "codigo_centro", "nombre_centro",
+                 "tipo_centro", "publico_privado", "bil", "compensatoria", "latitud", "longitud",
+                 "distancia_linea_km", "etapas_bilingues", "distancia_m", "duracion_s")
+
+    def __init__(self, direccion,codigo_postal, municipio, provincia,codigo_centro,tipo_centro,nombre_centro,publico_privado,bil,compensatoria,latitud=None,longitud=None):
         """
         Initialize a CentroEducativo (Educational Center) object with its basic attributes.
         Args:
@@ -16,26 +24,36 @@ class CentroEducativo:
             publico_privado (str): Indicates if the center is public or private
             bil (bool): Indicates if the center is bilingual
             compensatoria (bool): Indicates if the center has compensatory education programs
+            latitud (float, optional): Latitude from the registry (N_LATITUD), if known
+            longitud (float, optional): Longitude from the registry (N_LONGITUD), if known
         Attributes:
             All the parameters above become instance attributes, plus:
-            distancia_km (float, optional): Distance in kilometers (initialized as None)
-            distancia_m (float, optional): Distance in meters (initialized as None)
-            duracion (float, optional): Travel duration (initialized as None)
+            distancia_m (int, optional): Road distance in metres (initialized as None)
+            duracion_s (int, optional): Travel duration in seconds (initialized as None)
+            distancia_linea_km (float, optional): Straight-line distance from the origin (initialized as None)
+            etapas_bilingues (dict): Bilingual modality per stage, e.g. {'Primaria': 'BIL ING'} (initialized empty)
+        Note:
+            distancia_km and duracion are the display texts ('1,2 km', '1 h 5 min'), derived
+            from the numeric values only when they are read.
         """
 
         self.direccion = direccion
         self.codigo_postal = codigo_postal
-        self.municipio = municipio
-        self.provincia = provincia
+        # Los valores categóricos se repiten en miles de centros: se comparte una sola copia de cada texto
+        self.municipio = sys.intern(municipio)
+        self.provincia = sys.intern(provincia)
         self.codigo_centro = codigo_centro
         self.nombre_centro = nombre_centro
-        self.tipo_centro = tipo_centro
-        self.publico_privado = publico_privado
+        self.tipo_centro = sys.intern(tipo_centro)
+        self.publico_privado = sys.intern(publico_privado)
         self.bil = bil
         self.compensatoria = compensatoria
-        self.distancia_km = None
+        self.latitud = latitud
+        self.longitud = longitud
+        self.distancia_linea_km = None
+        self.etapas_bilingues = {}
         self.distancia_m = None
-        self.duracion = None
+        self.duracion_s = None
 
     def __repr__(self):
         """
@@ -46,6 +64,20 @@ class CentroEducativo:
             str: Representación del centro educativo con su nombre y código
         """
         return f"CentroEducativo({self.nombre_centro}, {self.codigo_centro})"
+
+    @property
+    def distancia_km(self):
+        """
+        str: Distancia por carretera con el formato de Google ('1,2 km'), o None si no se conoce
+        """
+        return None if self.distancia_m is None else formatear_distancia(self.distancia_m)
+
+    @property
+    def duracion(self):
+        """
+        str: Duración del trayecto con el formato de Google ('1 h 5 min'), o None si no se conoce
+        """
+        return None if self.duracion_s is None else formatear_duracion(self.duracion_s)
     
     
     def calcula_distancia_clase(self, direccion_origen):
@@ -59,11 +91,11 @@ class CentroEducativo:
             bool: True si el cálculo fue exitoso, False si hubo algún error
 
         Note:
-            Actualiza los atributos distancia_km, distancia_m y duracion del centro
+            Actualiza los atributos distancia_m y duracion_s del centro
             usando el servicio de Google Maps
         """
         # Construir la dirección completa de destino combinando los elementos
-        direccion_destino = f"{self.direccion},{self.codigo_postal}, {self.municipio}, {self.provincia}"
+        direccion_destino = self.direccion_destino()
         
         # Llamar al servicio externo de Google para calcular distancias y tiempos
         resultado = calcular_distancias(direccion_origen, direccion_destino)
@@ -71,15 +103,75 @@ class CentroEducativo:
         # Procesar el resultado si existe
         if resultado:
             # Actualizar los atributos del centro con los valores calculados
-            self.distancia_km = resultado['distancia en Km']
-            self.distancia_m = resultado['distancia en m']
-            self.duracion = resultado['duracion']
+            self.asignar_resultado(resultado)
             return True
         else:
             # En caso de error al calcular, mostrar mensaje y retornar False
             print(f"No se pudo calcular la distancia para el destino: {direccion_destino}")
             return False
 
+    def direccion_destino(self):
+        """
+        Construye la dirección completa del centro para consultarla como destino.
+
+        Returns:
+            str: Dirección, código postal, municipio y provincia separados por comas
+        """
+        return f"{self.direccion},{self.codigo_postal}, {self.municipio}, {self.provincia}"
+
+    def destino_ruta(self):
+        """
+        Devuelve el destino con el que se consulta el trayecto al motor configurado:
+        las coordenadas del registro si el motor las prefiere y se conocen, o la dirección.
+
+        Returns:
+            str | tuple: Dirección completa o par (latitud, longitud)
+        """
+        if obtener_motor().usa_coordenadas and self.latitud is not None and self.longitud is not None:
+            return (self.latitud, self.longitud)
+        return self.direccion_destino()
+
+    def asignar_resultado(self, resultado):
+        """
+        Guarda en el centro la distancia y duración calculadas, en metros y segundos.
+
+        Args:
+            resultado (dict): Diccionario con el formato que devuelve calcular_distancias
+        """
+        metros = resultado.get('distancia en m')
+        segundos = resultado.get('duracion en s')
+        # Los resultados antiguos de la caché pueden traer sólo los textos
+        self.distancia_m = int(metros) if metros is not None else distancia_a_metros(resultado.get('distancia en Km'))
+        self.duracion_s = int(segundos) if segundos is not None else duracion_a_segundos(resultado.get('duracion'))
+
+    @staticmethod
+    def calcula_distancias_lote(centros, direccion_origen, **opciones):
+        """
+        Calcula la distancia y duración desde una dirección origen hasta muchos centros
+        agrupando los destinos en peticiones por lotes que se lanzan en paralelo.
+
+        Args:
+            centros (list): Lista de objetos CentroEducativo
+            direccion_origen (str): Dirección desde donde se calcularán las distancias
+            **opciones: Opciones de calcular_distancias_lote (max_hilos, peticiones_por_segundo,
+                        max_reintentos, progreso, cancelado)
+
+        Returns:
+            list: Tuplas (centro, estado) de los centros cuya distancia no se pudo calcular
+
+        Note:
+            Actualiza los atributos distancia_m y duracion_s de cada centro calculado
+        """
+        resultados = calcular_distancias_lote(direccion_origen, [centro.destino_ruta() for centro in centros], **opciones)
+
+        fallidos = []
+        for centro, resultado in zip(centros, resultados):
+            if resultado.get("estado") == "OK":
+                centro.asignar_resultado(resultado)
+            else:
+                fallidos.append((centro, resultado.get("estado")))
+        return fallidos
+
     @staticmethod
     def convertir_duracion_a_minutos(duracion_str):
         """
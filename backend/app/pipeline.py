@@ -0,0 +1,205 @@
+# Genera los CSV de datos que sirve la API. Se ejecuta desde la raíz del repositorio:
+#
+#   python backend/app/pipeline.py coincidencias   # da_centros ∩ centros_todos -> coincidencias.csv
+#   python backend/app/pipeline.py exportar        # trayectos + bilingües/compensatorios -> centros_exportados.csv
+#   python backend/app/pipeline.py cotejar         # vuelve a marcar bilingües/compensatorios en la exportación
+#   python backend/app/pipeline.py incremental     # nueva edición de da_centros: recalcula sólo los centros que cambian
+#   python backend/app/pipeline.py matriz --origen A --origen B       # trayectos de varios orígenes -> matriz_trayectos.npz
+#   python backend/app/pipeline.py consultar-matriz --minutos 30 --todos   # consultas sobre la matriz, sin más peticiones
+#   python backend/app/pipeline.py binario         # instantáneas binarias que la API mapea en memoria
+#   python backend/app/pipeline.py fragmentado --registro a.csv --registro b.csv   # registros de varias comunidades en paralelo
+#
+# exportar, incremental y cotejar actualizan también la instantánea binaria de la exportación.
+#
+# Con --perfilar (o la variable PERFILAR_PIPELINE) se imprime al terminar el tiempo de cada etapa;
+# con --perfil-json se guarda además en un fichero:
+#
+#   python backend/app/pipeline.py --perfilar --perfil-json perfil.json exportar
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import (bin_centros_exportados, bin_registro, csv1, csv2, csv_bilingues, csv_centros_exportados, csv_coincidencias,
+                    csv_compensatorios, csv_instantanea, csv_registro_enriquecido, direccion_origen, json_informe_cambios,
+                    npz_matriz)
+from services.almacen_centros import escribir_binario_centros
+from services.csv_service import coincidencias, cotejar_bilingues, cotejar_compensatorios
+from services.ejecutor_distancias import imprimir_progreso
+from services.enrutamiento import MOTORES, configurar_motor
+from services.fragmentos import procesar_registros_fragmentados
+from services.incremental import actualizar_incremental
+from services.matriz import MatrizTrayectos
+from services.metricas import activar_perfil, medir_etapa, volcar_perfil
+from services.registro import escribir_binario_registro
+from services.trabajos import reconstruir_exportacion
+
+
+def exportar(argumentos):
+    """
+    Calcula los trayectos, cruza los centros con los ficheros de bilingües y compensatorios
+    en memoria y sustituye la exportación y su instantánea binaria de una vez.
+    """
+    if argumentos.motor:
+        configurar_motor(argumentos.motor)
+    reconstruir_exportacion(
+        csv_coincidencias,
+        csv_centros_exportados,
+        argumentos.origen,
+        ruta_binaria=bin_centros_exportados,
+        csv_instantanea=csv_instantanea,
+        csv_bilingues=csv_bilingues,
+        csv_compensatorios=csv_compensatorios,
+        radio_km=argumentos.radio_km,
+        top_k=argumentos.top_k,
+        max_hilos=argumentos.max_hilos,
+        progreso=imprimir_progreso,
+    )
+
+
+def incremental(argumentos):
+    """
+    Procesa una edición nueva de da_centros.csv: rehace las coincidencias y recalcula
+    sólo los trayectos de los centros añadidos o con otra dirección.
+    """
+    if argumentos.motor:
+        configurar_motor(argumentos.motor)
+    coincidencias(argumentos.nuevo, csv2, csv_coincidencias)
+    actualizar_incremental(
+        csv_coincidencias,
+        csv_instantanea,
+        csv_centros_exportados,
+        csv_bilingues,
+        csv_compensatorios,
+        csv_informe=json_informe_cambios,
+        max_hilos=argumentos.max_hilos,
+        progreso=imprimir_progreso,
+    )
+    print(f"Informe de cambios en '{json_informe_cambios}'.")
+    escribir_binario_centros(csv_centros_exportados, bin_centros_exportados)
+
+
+def matriz(argumentos):
+    """
+    Calcula la matriz de trayectos de varios orígenes a todos los centros y la guarda.
+    """
+    if argumentos.motor:
+        configurar_motor(argumentos.motor)
+    resultado = MatrizTrayectos.calcular(csv_coincidencias, argumentos.origen, max_hilos=argumentos.max_hilos,
+                                         progreso=imprimir_progreso)
+    resultado.guardar(argumentos.salida)
+    print(f"Matriz de {len(resultado.origenes)} orígenes × {len(resultado.codigos)} centros en '{argumentos.salida}'.")
+
+
+def consultar_matriz(argumentos):
+    """
+    Responde desde la matriz guardada qué centros quedan a menos de N minutos de alguno
+    o de todos los orígenes, o cuáles minimizan el peor trayecto.
+    """
+    resultado = MatrizTrayectos.cargar(argumentos.matriz)
+    if argumentos.minutos is not None:
+        posiciones = resultado.alcanzables(argumentos.minutos, "todos" if argumentos.todos else "alguno")
+        desde = "todos los orígenes" if argumentos.todos else "alguno de los orígenes"
+        print(f"{len(posiciones)} centros a menos de {argumentos.minutos:g} min de {desde}:")
+    else:
+        posiciones = resultado.minimax()
+        print("Centros con el menor trayecto en el peor caso:")
+    for posicion in posiciones[:argumentos.limit]:
+        fila = resultado.fila(posicion)
+        minutos = ", ".join("-" if valor is None else f"{valor:g}" for valor in fila["minutos"].values())
+        print(f"  {fila['codigo']}  {fila['nombre']} ({fila['municipio']}): {minutos} min")
+
+
+def cotejar(argumentos):
+    cotejar_bilingues(csv_centros_exportados, csv_bilingues)
+    cotejar_compensatorios(csv_centros_exportados, csv_compensatorios)
+    escribir_binario_centros(csv_centros_exportados, bin_centros_exportados)
+
+
+def binario(argumentos):
+    """
+    Escribe las instantáneas binarias de la exportación y del registro. Los workers de la API
+    las detectan y las mapean en memoria sin reiniciarse (el registro, al arrancar).
+    """
+    escribir_binario_centros(csv_centros_exportados, bin_centros_exportados)
+    escribir_binario_registro(bin_registro, csv1, csv_bilingues, csv_compensatorios)
+
+
+def fragmentado(argumentos):
+    """
+    Lee, normaliza, enriquece y ordena por distancia en línea recta registros de una o varias
+    comunidades, repartidos en fragmentos entre varios procesos.
+    """
+    if argumentos.motor:
+        configurar_motor(argumentos.motor)
+    procesar_registros_fragmentados(
+        argumentos.registro or [csv1],
+        argumentos.salida,
+        direccion_origen=argumentos.origen,
+        csv_codigos=None if argumentos.todos else csv2,
+        csv_bilingues=csv_bilingues,
+        csv_compensatorios=csv_compensatorios,
+        procesos=argumentos.procesos,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline de datos de los centros educativos")
+    parser.add_argument("--perfilar", action="store_true", help="Imprime el tiempo de cada etapa al terminar")
+    parser.add_argument("--perfil-json", help="Guarda además el tiempo de cada etapa en este fichero JSON")
+    subparsers = parser.add_subparsers(dest="orden", required=True)
+
+    parser_coincidencias = subparsers.add_parser("coincidencias", help="Cruza da_centros con centros_todos")
+    parser_coincidencias.set_defaults(funcion=lambda argumentos: coincidencias(csv1, csv2, csv_coincidencias))
+
+    parser_exportar = subparsers.add_parser("exportar", help="Calcula trayectos, enriquece y exporta")
+    parser_exportar.add_argument("--origen", default=direccion_origen, help="Dirección de origen de los trayectos")
+    parser_exportar.add_argument("--radio-km", type=float, help="Sólo centros a menos de esta distancia en línea recta")
+    parser_exportar.add_argument("--top-k", type=int, help="Sólo los K centros más cercanos en línea recta")
+    parser_exportar.add_argument("--motor", choices=list(MOTORES), help="Motor de trayectos (por defecto MOTOR_RUTAS)")
+    parser_exportar.add_argument("--max-hilos", type=int, default=8, help="Peticiones simultáneas a la API de rutas")
+    parser_exportar.set_defaults(funcion=exportar)
+
+    parser_cotejar = subparsers.add_parser("cotejar", help="Marca bilingües y compensatorios en una exportación existente")
+    parser_cotejar.set_defaults(funcion=cotejar)
+
+    parser_incremental = subparsers.add_parser("incremental", help="Actualiza la exportación con una edición nueva de da_centros")
+    parser_incremental.add_argument("--nuevo", default=csv1, help="da_centros.csv de la edición nueva")
+    parser_incremental.add_argument("--motor", choices=list(MOTORES), help="Motor de trayectos (el de la última exportación)")
+    parser_incremental.add_argument("--max-hilos", type=int, default=8, help="Peticiones simultáneas a la API de rutas")
+    parser_incremental.set_defaults(funcion=incremental)
+
+    parser_matriz = subparsers.add_parser("matriz", help="Calcula los trayectos de varios orígenes a todos los centros")
+    parser_matriz.add_argument("--origen", action="append", required=True, help="Dirección de origen (se repite por cada uno)")
+    parser_matriz.add_argument("--salida", default=npz_matriz, help="Fichero .npz donde guardar la matriz")
+    parser_matriz.add_argument("--motor", choices=list(MOTORES), help="Motor de trayectos (por defecto MOTOR_RUTAS)")
+    parser_matriz.add_argument("--max-hilos", type=int, default=8, help="Peticiones simultáneas a la API de rutas")
+    parser_matriz.set_defaults(funcion=matriz)
+
+    parser_consultar = subparsers.add_parser("consultar-matriz", help="Consulta la matriz de trayectos guardada")
+    parser_consultar.add_argument("--matriz", default=npz_matriz, help="Fichero .npz de la matriz")
+    parser_consultar.add_argument("--minutos", type=float, help="Centros a menos de estos minutos (sin él: minimizar el peor trayecto)")
+    parser_consultar.add_argument("--todos", action="store_true", help="Con --minutos, desde todos los orígenes en vez de alguno")
+    parser_consultar.add_argument("--limit", type=int, default=20, help="Número máximo de centros a mostrar")
+    parser_consultar.set_defaults(funcion=consultar_matriz)
+
+    parser_binario = subparsers.add_parser("binario", help="Escribe las instantáneas binarias que mapea la API")
+    parser_binario.set_defaults(funcion=binario)
+
+    parser_fragmentado = subparsers.add_parser("fragmentado", help="Procesa registros de varias comunidades en paralelo")
+    parser_fragmentado.add_argument("--registro", action="append", help="Registro con el formato de da_centros.csv (se repite por cada uno)")
+    parser_fragmentado.add_argument("--salida", default=csv_registro_enriquecido, help="CSV del registro enriquecido")
+    parser_fragmentado.add_argument("--origen", default=direccion_origen, help="Dirección desde la que se ordena en línea recta")
+    parser_fragmentado.add_argument("--todos", action="store_true", help="Conserva todos los centros, no sólo los de centros_todos.csv")
+    parser_fragmentado.add_argument("--procesos", type=int, help="Procesos de trabajo (por defecto, uno por núcleo)")
+    parser_fragmentado.add_argument("--motor", choices=list(MOTORES), help="Motor con el que se geocodifica el origen")
+    parser_fragmentado.set_defaults(funcion=fragmentado)
+
+    argumentos = parser.parse_args()
+    if argumentos.perfilar or argumentos.perfil_json:
+        activar_perfil()
+    with medir_etapa(argumentos.orden):
+        argumentos.funcion(argumentos)
+    volcar_perfil(argumentos.perfil_json)
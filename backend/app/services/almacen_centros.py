@@ -0,0 +1,293 @@
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from services.indice_centros import COLUMNAS_FILTRO, IndiceCentros, IndiceMapeado
+from services.instantanea_binaria import ArchivoMapeado, TablaCadenas, codificar_textos, escribir_secciones
+
+
+class InstantaneaCentros:
+    """
+    Fotografía inmutable del dataset de centros tal y como se sirve por la API.
+
+    Attributes:
+        filas (list): Lista de diccionarios con los datos de cada centro
+        encabezados (list): Columnas del dataset, en el orden del fichero
+        json (bytes): Filas ya serializadas a JSON (UTF-8)
+        json_gzip (bytes): El mismo JSON comprimido con gzip
+        indice (IndiceCentros): Índices de filtrado y ordenación sobre las filas
+        etag (str): Identificador de la versión (hash del contenido del CSV)
+        mtime_ns (int): Fecha de modificación del fichero cuando se cargó
+        mtime_binaria (int): Fecha de modificación de la instantánea binaria cuando se cargó (None si no había)
+        cargado_en (float): Momento (epoch) en que se cargó la instantánea
+    """
+
+    def __init__(self, filas, contenido_hash, mtime_ns):
+        self.filas = filas
+        self.contenido_hash = contenido_hash
+        self.encabezados = list(filas[0]) if filas else []
+        self.json = json.dumps(filas, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        # Nivel 6: buen equilibrio entre tamaño y coste, sólo se paga una vez por recarga
+        self.json_gzip = gzip.compress(self.json, compresslevel=6, mtime=0)
+        self.indice = IndiceCentros(filas)
+        self.etag = f'"{contenido_hash[:32]}"'
+        self.etag_gzip = f'"{contenido_hash[:32]}-gzip"'
+        self.mtime_ns = mtime_ns
+        self.mtime_binaria = None
+        self.cargado_en = time.time()
+
+    def guardar_binario(self, ruta):
+        """
+        Guarda la instantánea en un fichero binario que los procesos de la API mapean en memoria:
+        cada columna como identificadores de una tabla de cadenas, los índices de filtrado y
+        ordenación y el JSON ya serializado y comprimido.
+
+        Args:
+            ruta (str): Ruta del fichero binario
+        """
+        columnas = list(self.encabezados)
+        # Las columnas filtrables que falten en el CSV se indexan vacías, como hace IndiceCentros
+        columnas += [columna for columna in COLUMNAS_FILTRO.values() if columna not in columnas]
+        ids, secciones = codificar_textos({columna: [fila.get(columna) or "" for fila in self.filas] for columna in columnas})
+        secciones["columnas"] = np.stack([ids[columna] for columna in columnas]) if columnas else np.empty((0, 0), dtype=np.int32)
+        secciones.update(IndiceMapeado.secciones(self.indice, {parametro: ids[columna] for parametro, columna in COLUMNAS_FILTRO.items()}))
+        secciones["json"] = self.json
+        secciones["json_gzip"] = self.json_gzip
+        metadatos = {"contenido_hash": self.contenido_hash, "encabezados": self.encabezados, "columnas": columnas, "filas": len(self.filas)}
+        escribir_secciones(ruta, metadatos, secciones)
+
+    def coincide_etag(self, if_none_match):
+        """
+        Comprueba si la cabecera If-None-Match del cliente corresponde a esta versión.
+
+        Args:
+            if_none_match (str): Valor de la cabecera If-None-Match (puede contener varias etiquetas)
+
+        Returns:
+            bool: True si el cliente ya tiene esta versión
+        """
+        if not if_none_match:
+            return False
+        etiquetas = [etiqueta.strip() for etiqueta in if_none_match.split(",")]
+        for etiqueta in etiquetas:
+            # Las etiquetas débiles (W/) también valen para una petición GET condicional
+            if etiqueta.startswith("W/"):
+                etiqueta = etiqueta[2:]
+            if etiqueta in ("*", self.etag, self.etag_gzip):
+                return True
+        return False
+
+
+class FilasMapeadas:
+    """
+    Filas de una instantánea binaria, indexables como la lista de diccionarios de
+    InstantaneaCentros. Cada fila se construye cuando se pide.
+    """
+
+    def __init__(self, columnas, encabezados, tabla):
+        """
+        Args:
+            columnas (np.ndarray): Identificadores de cada columna (una fila del array por columna)
+            encabezados (list): Nombre de las columnas de cada fila, en el orden de columnas
+            tabla (TablaCadenas): Tabla de cadenas de la instantánea
+        """
+        self.columnas = columnas
+        self.encabezados = encabezados
+        self.tabla = tabla
+
+    def __len__(self):
+        return self.columnas.shape[1] if len(self.encabezados) else 0
+
+    def __getitem__(self, posicion):
+        return {encabezado: self.tabla[identificador]
+                for encabezado, identificador in zip(self.encabezados, self.columnas[:len(self.encabezados), posicion].tolist())}
+
+    def __iter__(self):
+        return (self[posicion] for posicion in range(len(self)))
+
+
+class InstantaneaMapeada(InstantaneaCentros):
+    """
+    InstantaneaCentros leída de su fichero binario mapeado en memoria: no se parsea el CSV
+    ni se reconstruyen los índices, y los datos los comparten todos los procesos que la mapean.
+    """
+
+    def __init__(self, archivo, mtime_ns):
+        """
+        Args:
+            archivo (ArchivoMapeado): Fichero escrito por InstantaneaCentros.guardar_binario
+            mtime_ns (int): Fecha de modificación del CSV al que corresponde
+        """
+        metadatos = archivo.metadatos
+        tabla = TablaCadenas(archivo)
+        self.archivo = archivo
+        self.contenido_hash = metadatos["contenido_hash"]
+        self.encabezados = metadatos["encabezados"]
+        self.filas = FilasMapeadas(archivo.array("columnas"), self.encabezados, tabla)
+        # Las respuestas se envían directamente desde el mapa, sin copiar el JSON
+        self.json = archivo.bytes("json")
+        self.json_gzip = archivo.bytes("json_gzip")
+        self.indice = IndiceMapeado(archivo, tabla, self.filas)
+        self.etag = f'"{self.contenido_hash[:32]}"'
+        self.etag_gzip = f'"{self.contenido_hash[:32]}-gzip"'
+        self.mtime_ns = mtime_ns
+        self.mtime_binaria = archivo.mtime_ns
+        self.cargado_en = time.time()
+
+
+class AlmacenCentros:
+    """
+    Almacén en memoria del CSV de centros exportados.
+
+    Lee y serializa el fichero una sola vez y lo mantiene en memoria. Cada vez que se pide
+    la instantánea se comprueba (como mucho una vez por intervalo) si el fichero ha cambiado
+    en disco; si su fecha de modificación y su hash de contenido han cambiado se recarga y se
+    sustituye la instantánea de forma atómica, de modo que las peticiones en curso siguen
+    usando la versión anterior hasta terminar.
+
+    Si existe una instantánea binaria del mismo contenido (ver escribir_binario_centros) se
+    mapea en lugar de parsear el CSV; una instantánea binaria nueva se detecta igual que un
+    CSV nuevo, sin reiniciar el proceso.
+    """
+
+    def __init__(self, ruta_csv, intervalo_comprobacion=1.0, ruta_binaria=None):
+        """
+        Args:
+            ruta_csv (str): Ruta al CSV exportado (UTF-8, delimitador ',')
+            intervalo_comprobacion (float): Segundos mínimos entre dos comprobaciones del fichero
+            ruta_binaria (str, optional): Ruta de la instantánea binaria del CSV, si se usa
+        """
+        self.ruta_csv = ruta_csv
+        self.ruta_binaria = ruta_binaria
+        self.intervalo_comprobacion = intervalo_comprobacion
+        self.recargas = 0
+        self._cerrojo = threading.Lock()
+        self._ultima_comprobacion = 0.0
+        self._instantanea = None
+        self.recargar(forzar=True)
+
+    def obtener(self):
+        """
+        Devuelve la instantánea vigente, recargándola antes si el fichero ha cambiado.
+
+        Returns:
+            InstantaneaCentros: Versión actual del dataset
+        """
+        ahora = time.monotonic()
+        if ahora - self._ultima_comprobacion >= self.intervalo_comprobacion:
+            self.recargar()
+        return self._instantanea
+
+    def recargar(self, forzar=False):
+        """
+        Recarga el fichero si ha cambiado desde la última carga.
+
+        Args:
+            forzar (bool): Si es True se vuelve a leer aunque la fecha de modificación no haya cambiado
+
+        Returns:
+            bool: True si se ha sustituido la instantánea
+        """
+        with self._cerrojo:
+            self._ultima_comprobacion = time.monotonic()
+            try:
+                mtime_ns = os.stat(self.ruta_csv).st_mtime_ns
+            except OSError as e:
+                # Si el fichero desaparece momentáneamente (p.ej. durante una sustitución) se sigue sirviendo la versión anterior
+                if self._instantanea is None:
+                    raise
+                print(f"No se pudo comprobar el fichero de centros: {e}")
+                return False
+
+            mtime_binaria = self._mtime_binaria()
+
+            actual = self._instantanea
+            if not forzar and actual is not None and actual.mtime_ns == mtime_ns and actual.mtime_binaria == mtime_binaria:
+                return False
+
+            with open(self.ruta_csv, mode="rb") as file:
+                contenido = file.read()
+            contenido_hash = hashlib.sha256(contenido).hexdigest()
+            nueva = self._mapear(contenido_hash, mtime_ns) if mtime_binaria is not None else None
+
+            # Fecha distinta pero mismo contenido: sólo se actualizan las fechas
+            # (salvo que aparezca su instantánea binaria y se esté sirviendo la leída del CSV)
+            if actual is not None and actual.etag == f'"{contenido_hash[:32]}"' and (
+                    nueva is None or isinstance(actual, InstantaneaMapeada)):
+                actual.mtime_ns = mtime_ns
+                actual.mtime_binaria = mtime_binaria
+                return False
+
+            if nueva is None:
+                nueva = InstantaneaCentros(self._parsear(contenido), contenido_hash, mtime_ns)
+                nueva.mtime_binaria = mtime_binaria
+            self._instantanea = nueva
+            self.recargas += 1
+            return True
+
+    def _mtime_binaria(self):
+        if not self.ruta_binaria:
+            return None
+        try:
+            return os.stat(self.ruta_binaria).st_mtime_ns
+        except OSError:
+            return None
+
+    def _mapear(self, contenido_hash, mtime_ns):
+        """
+        Mapea la instantánea binaria si corresponde al contenido actual del CSV.
+
+        Args:
+            contenido_hash (str): Hash del CSV
+            mtime_ns (int): Fecha de modificación del CSV
+
+        Returns:
+            InstantaneaMapeada: Instantánea mapeada, o None si no existe, no es válida o es de otro CSV
+        """
+        try:
+            archivo = ArchivoMapeado(self.ruta_binaria)
+        except (OSError, ValueError) as e:
+            print(f"No se pudo mapear la instantánea binaria: {e}")
+            return None
+        if archivo.metadatos.get("contenido_hash") != contenido_hash:
+            print(f"La instantánea binaria '{self.ruta_binaria}' no corresponde al CSV actual: se lee el CSV")
+            return None
+        return InstantaneaMapeada(archivo, mtime_ns)
+
+    @staticmethod
+    def _parsear(contenido):
+        """
+        Convierte el contenido del CSV exportado en una lista de diccionarios.
+
+        Args:
+            contenido (bytes): Contenido del fichero en UTF-8
+
+        Returns:
+            list: Lista de diccionarios con los datos de cada centro
+        """
+        # utf-8-sig tolera el BOM que añade Excel al guardar el CSV
+        texto = contenido.decode("utf-8-sig")
+        return list(csv.DictReader(io.StringIO(texto, newline="")))
+
+
+def escribir_binario_centros(ruta_csv, ruta_binaria):
+    """
+    Escribe la instantánea binaria de un CSV exportado para que la API la mapee en memoria.
+
+    Args:
+        ruta_csv (str): Ruta al CSV exportado
+        ruta_binaria (str): Ruta del fichero binario (se sustituye de una vez)
+    """
+    with open(ruta_csv, mode="rb") as file:
+        contenido = file.read()
+    instantanea = InstantaneaCentros(AlmacenCentros._parsear(contenido), hashlib.sha256(contenido).hexdigest(),
+                                     os.stat(ruta_csv).st_mtime_ns)
+    instantanea.guardar_binario(ruta_binaria)
+    print(f"Instantánea binaria de {len(instantanea.filas)} centros en '{ruta_binaria}'.")
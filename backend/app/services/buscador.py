@@ -0,0 +1,293 @@
+import re
+import unicodedata
+
+import numpy as np
+
+from services.instantanea_binaria import Postings
+
+# Campos indexados del registro y peso de una coincidencia en cada uno
+CAMPOS_BUSQUEDA = {"nombres": 3.0, "municipios": 2.0, "localidades": 2.0, "tipos": 1.0}
+
+# Proporción mínima de trigramas de la consulta que debe compartir un resultado aproximado
+SIMILITUD_MINIMA = 0.5
+
+# Secuencias típicas de un texto UTF-8 leído como ISO-8859-1 o cp1252 ("Ã¡" en lugar de "á")
+_PATRON_MOJIBAKE = re.compile("[ÂÃ][\x80-\xbfŒœŠšŸŽžƒˆ˜–-›€™]")
+_NO_ALFANUMERICO = re.compile(r"[^0-9a-zñ]+")
+
+# Palabras que no cuentan para las siglas de un tipo de centro ("Instituto de Educación Secundaria" -> "ies")
+_PALABRAS_VACIAS = {"de", "del", "la", "las", "el", "los", "y", "e", "en", "para", "a"}
+
+
+def reparar_mojibake(texto):
+    """
+    Deshace la doble codificación de un texto UTF-8 que se leyó como ISO-8859-1 o cp1252.
+
+    Args:
+        texto (str): Texto posiblemente dañado ('Ã\x81ngel de Haro')
+
+    Returns:
+        str: Texto reparado ('Ángel de Haro'), o el original si no tiene ese daño
+
+    Example:
+        >>> reparar_mojibake('VÃ­car')
+        'Vícar'
+    """
+    if not _PATRON_MOJIBAKE.search(texto):
+        return texto
+    for codificacion in ("latin-1", "cp1252"):
+        try:
+            return texto.encode(codificacion).decode("utf-8")
+        except UnicodeError:
+            continue
+    return texto
+
+
+def plegar(texto):
+    """
+    Normaliza un texto para buscar: repara el mojibake, pasa a minúsculas, quita las tildes
+    (la ñ se conserva) y sustituye lo que no es letra o número por espacios.
+
+    Args:
+        texto (str): Texto original
+
+    Returns:
+        str: Texto plegado
+
+    Example:
+        >>> plegar('C.E.I.P. Ángel de Haro')
+        'c e i p angel de haro'
+    """
+    texto = reparar_mojibake(texto or "").casefold().replace("ñ", "\0")
+    sin_tildes = "".join(caracter for caracter in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(caracter))
+    return _NO_ALFANUMERICO.sub(" ", sin_tildes.replace("\0", "ñ")).strip()
+
+
+def ngramas_palabra(palabra):
+    """
+    N-gramas que se indexan de una palabra: el inicio de palabra (' v', ' vi'...) y los trigramas
+    de la palabra rodeada de espacios, de modo que un fragmento del principio de una palabra
+    encuentra sus n-gramas con espacio inicial.
+
+    Args:
+        palabra (str): Palabra plegada
+
+    Returns:
+        set: N-gramas de la palabra
+    """
+    rellena = f" {palabra} "
+    ngramas = {rellena[:2]}
+    ngramas.update(rellena[posicion:posicion + 3] for posicion in range(len(rellena) - 2))
+    return ngramas
+
+
+def ngramas_consulta(fragmento, desde_inicio=True):
+    """
+    N-gramas que debe contener una palabra para incluir el fragmento buscado.
+
+    Args:
+        fragmento (str): Palabra de la consulta, ya plegada
+        desde_inicio (bool): Si es True el fragmento debe ser el principio de una palabra;
+                             si es False puede aparecer en cualquier posición (fragmentos de 3 o más letras)
+
+    Returns:
+        set: N-gramas requeridos (vacío si el fragmento es demasiado corto para buscarlo en medio)
+    """
+    if desde_inicio:
+        rellena = f" {fragmento}"
+        if len(rellena) == 2:
+            return {rellena}
+        return {rellena[posicion:posicion + 3] for posicion in range(len(rellena) - 2)}
+    return {fragmento[posicion:posicion + 3] for posicion in range(len(fragmento) - 2)}
+
+
+def siglas(texto_plegado):
+    """
+    Siglas de un texto plegado, sin las palabras vacías.
+
+    Example:
+        >>> siglas('colegio de educacion infantil y primaria')
+        'ceip'
+    """
+    return "".join(palabra[0] for palabra in texto_plegado.split() if palabra not in _PALABRAS_VACIAS)
+
+
+class IndiceBusqueda:
+    """
+    Índice invertido de n-gramas sobre los nombres, tipos, localidades y municipios del registro.
+
+    Se construye una vez al cargar. Cada n-grama apunta a un array ordenado de identificadores
+    (centro, campo), codificados como posición * número de campos + campo, así que cada palabra
+    de la consulta se resuelve con una sola intersección de listas para todos los campos, sin
+    recorrer los textos. Se puntúa por campo (el nombre pesa más que el tipo) y por si la palabra
+    coincide desde su inicio. Si no hay bastantes coincidencias exactas se completan con
+    resultados aproximados por similitud de trigramas, que toleran erratas.
+    """
+
+    def __init__(self, campos):
+        """
+        Args:
+            campos (dict): Campo de CAMPOS_BUSQUEDA -> lista de textos, uno por centro
+        """
+        self.campos = list(campos)
+        self.total = len(next(iter(campos.values()))) if campos else 0
+        self.pesos = np.array([CAMPOS_BUSQUEDA.get(campo, 1.0) for campo in self.campos], dtype=np.float32)
+        self.longitudes = np.zeros(self.total, dtype=np.int32)
+
+        postings = {}
+        aproximados = {}
+        for numero_campo, (campo, textos) in enumerate(campos.items()):
+            for posicion, texto in enumerate(textos):
+                plegado = plegar(texto)
+                if campo == "nombres":
+                    self.longitudes[posicion] = len(plegado)
+                palabras = plegado.split()
+                if campo == "tipos" and len(palabras) > 1:
+                    # Los tipos se buscan también por sus siglas (IES, CEIP...)
+                    palabras.append(siglas(plegado))
+                identificador = posicion * len(self.campos) + numero_campo
+                for palabra in palabras:
+                    for ngrama in ngramas_palabra(palabra):
+                        postings.setdefault(ngrama, []).append(identificador)
+                        if campo != "tipos":
+                            # Los tipos son pocos y muy repetidos: no ayudan a distinguir erratas
+                            aproximados.setdefault(ngrama, []).append(posicion)
+        self.ngramas = {ngrama: np.unique(np.array(lista, dtype=np.int32)) for ngrama, lista in postings.items()}
+        self.aproximados = {ngrama: np.unique(np.array(lista, dtype=np.int32)) for ngrama, lista in aproximados.items()}
+
+    @classmethod
+    def desde_registro(cls, registro):
+        """
+        Construye el índice sobre los campos de texto de un RegistroCentros.
+
+        Args:
+            registro (RegistroCentros): Registro completo de centros
+
+        Returns:
+            IndiceBusqueda: Índice sobre nombres, municipios, localidades y tipos
+        """
+        return cls({campo: getattr(registro, campo) for campo in CAMPOS_BUSQUEDA})
+
+    @classmethod
+    def desde_binario(cls, archivo):
+        """
+        Construye el índice sobre una instantánea binaria mapeada, sin recorrer los textos.
+
+        Args:
+            archivo (ArchivoMapeado): Fichero con las secciones de IndiceBusqueda.secciones
+
+        Returns:
+            IndiceBusqueda: Índice cuyas listas son vistas sobre el mapa
+        """
+        indice = cls.__new__(cls)
+        indice.campos = archivo.array("busqueda.campos").tolist()
+        indice.pesos = archivo.array("busqueda.pesos")
+        indice.longitudes = archivo.array("busqueda.longitudes")
+        indice.total = len(indice.longitudes)
+        indice.ngramas = Postings.desde_archivo(archivo, "busqueda.ngramas")
+        indice.aproximados = Postings.desde_archivo(archivo, "busqueda.aproximados")
+        return indice
+
+    def secciones(self):
+        """
+        Secciones de la instantánea binaria con el índice.
+
+        Returns:
+            dict: Nombre de sección -> array
+        """
+        secciones = {
+            "busqueda.campos": np.array(self.campos, dtype=str),
+            "busqueda.pesos": self.pesos,
+            "busqueda.longitudes": self.longitudes,
+        }
+        secciones.update(Postings.secciones(self.ngramas, "busqueda.ngramas"))
+        secciones.update(Postings.secciones(self.aproximados, "busqueda.aproximados"))
+        return secciones
+
+    def _contiene(self, ngramas, dentro_de=None):
+        # Identificadores (centro, campo) con todos los n-gramas, intersecando desde la lista más corta
+        listas = [self.ngramas.get(ngrama) for ngrama in ngramas]
+        if any(lista is None for lista in listas):
+            return np.empty(0, dtype=np.int32)
+        listas.sort(key=len)
+        resultado = listas[0] if dentro_de is None else dentro_de
+        for lista in listas if dentro_de is not None else listas[1:]:
+            if not len(resultado):
+                break
+            presentes = np.zeros(self.total * len(self.campos), dtype=bool)
+            presentes[lista] = True
+            resultado = resultado[presentes[resultado]]
+        return resultado
+
+    def buscar(self, consulta, limit=10, mascara=None):
+        """
+        Busca centros cuyo nombre, tipo, localidad o municipio contenga las palabras de la consulta.
+
+        Cada palabra puede ser el principio de una palabra del centro ('vic' -> 'Vícar') o, con
+        tres letras o más, un fragmento interior; todas las palabras deben aparecer en algún campo.
+
+        Args:
+            consulta (str): Texto escrito por el usuario
+            limit (int): Número máximo de resultados
+            mascara (np.ndarray, optional): Sólo se buscan los centros a True
+
+        Returns:
+            tuple: (total de coincidencias exactas, lista de (posición, puntuación) de mayor a menor)
+        """
+        palabras = plegar(consulta).split()
+        if not palabras or not self.total:
+            return 0, []
+
+        numero_campos = len(self.campos)
+        puntuacion = np.zeros(self.total, dtype=np.float32)
+        coinciden = np.ones(self.total, dtype=bool) if mascara is None else mascara.copy()
+        for palabra in palabras:
+            mejor = np.zeros(self.total, dtype=np.float32)
+            if len(palabra) >= 3:
+                # Un fragmento en medio de la palabra vale la mitad que uno al principio;
+                # los que además están al principio tienen el n-grama ' ab'
+                en_medio = self._contiene(ngramas_consulta(palabra, desde_inicio=False))
+                np.maximum.at(mejor, en_medio // numero_campos, self.pesos[en_medio % numero_campos] / 2)
+                al_inicio = self._contiene((f" {palabra[:2]}",), dentro_de=en_medio)
+            else:
+                al_inicio = self._contiene(ngramas_consulta(palabra))
+            np.maximum.at(mejor, al_inicio // numero_campos, self.pesos[al_inicio % numero_campos])
+            coinciden &= mejor > 0
+            puntuacion += mejor
+
+        posiciones = np.flatnonzero(coinciden)
+        total = len(posiciones)
+        # A igual puntuación, los nombres más cortos se parecen más a lo buscado
+        clave = puntuacion[posiciones] - self.longitudes[posiciones] / 1000
+        resultados = _mejores(posiciones, clave, limit)
+
+        if len(resultados) < limit:
+            excluir = set(posicion for posicion, _ in resultados)
+            resultados += [(posicion, valor) for posicion, valor in self._aproximados(palabras, limit, mascara)
+                           if posicion not in excluir][:limit - len(resultados)]
+        return total, resultados
+
+    def _aproximados(self, palabras, limit, mascara):
+        # Centros que comparten la mayoría de los trigramas de la consulta, con erratas incluidas
+        ngramas = set()
+        for palabra in palabras:
+            if palabra not in _PALABRAS_VACIAS:
+                ngramas |= ngramas_palabra(palabra)
+        listas = [self.aproximados[ngrama] for ngrama in ngramas if ngrama in self.aproximados]
+        if not listas:
+            return []
+        similitud = np.bincount(np.concatenate(listas), minlength=self.total) / len(ngramas)
+        if mascara is not None:
+            similitud[~mascara] = 0
+        posiciones = np.flatnonzero(similitud >= SIMILITUD_MINIMA)
+        # Las coincidencias aproximadas puntúan siempre por debajo de las exactas
+        return _mejores(posiciones, similitud[posiciones] - self.longitudes[posiciones] / 1000, limit, escala=0.5)
+
+
+def _mejores(posiciones, clave, limit, escala=1.0):
+    # Los 'limit' de mayor clave, ordenados, sin ordenar el resto
+    if len(posiciones) > limit:
+        seleccion = np.argpartition(-clave, limit - 1)[:limit]
+        posiciones, clave = posiciones[seleccion], clave[seleccion]
+    orden = np.argsort(-clave, kind="stable")
+    return [(int(posicion), round(float(valor) * escala, 3)) for posicion, valor in zip(posiciones[orden], clave[orden])]
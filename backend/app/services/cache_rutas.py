@@ -0,0 +1,242 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+# Valores por defecto: las direcciones de los centros casi nunca cambian entre ejecuciones
+RUTA_CACHE = os.getenv("CACHE_RUTAS_PATH", "data/cache_rutas.sqlite3")
+TTL_SEGUNDOS = int(os.getenv("CACHE_RUTAS_TTL", 90 * 24 * 3600))
+MAX_ENTRADAS = int(os.getenv("CACHE_RUTAS_MAX_ENTRADAS", 200000))
+
+
+def normalizar_direccion(direccion):
+    """
+    Normaliza una dirección para usarla como parte de la clave de la caché.
+    Se ignoran mayúsculas, tildes, espacios repetidos y espacios junto a las comas,
+    de modo que "C/ San Miguel,  s/n" y "c/ san miguel, S/N" comparten entrada.
+
+    Args:
+        direccion (str | tuple): Dirección postal o par (latitud, longitud)
+
+    Returns:
+        str: Dirección normalizada
+    """
+    if isinstance(direccion, (tuple, list)):
+        return f"{float(direccion[0]):.6f},{float(direccion[1]):.6f}"
+    texto = unicodedata.normalize("NFKD", str(direccion).casefold())
+    texto = "".join(caracter for caracter in texto if not unicodedata.combining(caracter))
+    texto = re.sub(r"\s*,\s*", ",", texto)
+    return re.sub(r"\s+", " ", texto).strip(" ,")
+
+
+class CacheRutas:
+    """
+    Caché persistente en SQLite de resultados de geocodificación y de tiempos de viaje.
+
+    Cada entrada caduca al cumplir su TTL y, cuando se supera el número máximo de entradas,
+    se eliminan las usadas hace más tiempo. El fichero sobrevive entre ejecuciones, de modo
+    que una nueva ejecución sólo consulta a Google los pares origen/destino que no conoce.
+
+    Attributes:
+        aciertos (int): Consultas resueltas desde la caché
+        fallos (int): Consultas que no estaban en la caché (o habían caducado)
+    """
+
+    def __init__(self, ruta=RUTA_CACHE, ttl=TTL_SEGUNDOS, max_entradas=MAX_ENTRADAS):
+        """
+        Args:
+            ruta (str): Fichero SQLite (':memory:' para una caché en memoria)
+            ttl (int): Segundos de validez de cada entrada
+            max_entradas (int): Número máximo de entradas antes de desalojar las menos usadas
+        """
+        self.ruta = ruta
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self.aciertos = 0
+        self.fallos = 0
+        self._cerrojo = threading.Lock()
+
+        if ruta != ":memory:" and os.path.dirname(ruta):
+            os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        # Una única conexión compartida y protegida por el cerrojo
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=NORMAL")
+        self._conexion.execute(
+            "CREATE TABLE IF NOT EXISTS entradas ("
+            " clave TEXT PRIMARY KEY,"
+            " valor TEXT NOT NULL,"
+            " creada REAL NOT NULL,"
+            " usada REAL NOT NULL)"
+        )
+        self._conexion.execute("CREATE INDEX IF NOT EXISTS entradas_usada ON entradas (usada)")
+
+    @staticmethod
+    def clave_ruta(origen, destino, modo="driving"):
+        """
+        Construye la clave de un trayecto origen/destino.
+
+        Args:
+            origen (str | tuple): Dirección o coordenadas de origen
+            destino (str | tuple): Dirección o coordenadas de destino
+            modo (str): Modo de transporte
+
+        Returns:
+            str: Clave normalizada
+        """
+        return f"ruta|{modo}|{normalizar_direccion(origen)}|{normalizar_direccion(destino)}"
+
+    @staticmethod
+    def clave_geocodigo(direccion, espacio=None):
+        """
+        Construye la clave de una geocodificación.
+
+        Args:
+            direccion (str): Dirección a geocodificar
+            espacio (str, optional): Motor que la geocodifica, si no es Google
+
+        Returns:
+            str: Clave normalizada
+        """
+        if espacio:
+            return f"geo|{espacio}|{normalizar_direccion(direccion)}"
+        return f"geo|{normalizar_direccion(direccion)}"
+
+    def obtener_varios(self, claves):
+        """
+        Busca varias claves en una sola consulta.
+
+        Args:
+            claves (list): Claves a buscar
+
+        Returns:
+            dict: Clave -> valor de las claves encontradas y vigentes
+        """
+        if not claves:
+            return {}
+        ahora = time.time()
+        encontrados = {}
+        with self._cerrojo:
+            # SQLite limita el número de parámetros por consulta
+            for inicio in range(0, len(claves), 500):
+                trozo = claves[inicio:inicio + 500]
+                marcas = ",".join("?" * len(trozo))
+                filas = self._conexion.execute(
+                    f"SELECT clave, valor FROM entradas WHERE clave IN ({marcas}) AND creada > ?",
+                    (*trozo, ahora - self.ttl),
+                ).fetchall()
+                for clave, valor in filas:
+                    encontrados[clave] = json.loads(valor)
+                if filas:
+                    self._conexion.executemany(
+                        "UPDATE entradas SET usada = ? WHERE clave = ?",
+                        [(ahora, clave) for clave, _ in filas],
+                    )
+            self.aciertos += len(encontrados)
+            self.fallos += len(set(claves)) - len(encontrados)
+        return encontrados
+
+    def obtener(self, clave):
+        """
+        Busca una clave en la caché.
+
+        Args:
+            clave (str): Clave a buscar
+
+        Returns:
+            Valor guardado, o None si no existe o ha caducado
+        """
+        return self.obtener_varios([clave]).get(clave)
+
+    def guardar_varios(self, valores):
+        """
+        Guarda varias entradas en una sola transacción y desaloja las sobrantes.
+
+        Args:
+            valores (dict): Clave -> valor serializable a JSON
+        """
+        if not valores:
+            return
+        ahora = time.time()
+        with self._cerrojo:
+            self._conexion.execute("BEGIN")
+            try:
+                self._conexion.executemany(
+                    "INSERT OR REPLACE INTO entradas (clave, valor, creada, usada) VALUES (?, ?, ?, ?)",
+                    [(clave, json.dumps(valor, ensure_ascii=False), ahora, ahora) for clave, valor in valores.items()],
+                )
+                self._desalojar(ahora)
+            except Exception:
+                self._conexion.execute("ROLLBACK")
+                raise
+            self._conexion.execute("COMMIT")
+
+    def guardar(self, clave, valor):
+        """
+        Guarda una entrada en la caché.
+
+        Args:
+            clave (str): Clave de la entrada
+            valor: Valor serializable a JSON
+        """
+        self.guardar_varios({clave: valor})
+
+    def vaciar(self):
+        """
+        Elimina todas las entradas y pone a cero los contadores.
+        """
+        with self._cerrojo:
+            self._conexion.execute("DELETE FROM entradas")
+            self.aciertos = 0
+            self.fallos = 0
+
+    def _desalojar(self, ahora):
+        # Primero las caducadas; después, si aún sobran, las usadas hace más tiempo
+        self._conexion.execute("DELETE FROM entradas WHERE creada <= ?", (ahora - self.ttl,))
+        total = self._conexion.execute("SELECT COUNT(*) FROM entradas").fetchone()[0]
+        sobrantes = total - self.max_entradas
+        if sobrantes > 0:
+            self._conexion.execute(
+                "DELETE FROM entradas WHERE clave IN (SELECT clave FROM entradas ORDER BY usada LIMIT ?)",
+                (sobrantes,),
+            )
+
+    def estadisticas(self):
+        """
+        Devuelve los contadores de uso de la caché.
+
+        Returns:
+            dict: Aciertos, fallos, ratio de aciertos y número de entradas guardadas
+        """
+        with self._cerrojo:
+            entradas = self._conexion.execute("SELECT COUNT(*) FROM entradas").fetchone()[0]
+        consultas = self.aciertos + self.fallos
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "ratio_aciertos": self.aciertos / consultas if consultas else 0.0,
+            "entradas": entradas,
+        }
+
+
+# Caché compartida por todo el proceso, creada la primera vez que se usa
+_cache = None
+_cerrojo_cache = threading.Lock()
+
+
+def obtener_cache():
+    """
+    Devuelve la caché de rutas compartida, creándola la primera vez.
+
+    Returns:
+        CacheRutas: Caché configurada con las variables de entorno CACHE_RUTAS_*
+    """
+    global _cache
+    if _cache is None:
+        with _cerrojo_cache:
+            if _cache is None:
+                _cache = CacheRutas()
+    return _cache
@@ -0,0 +1,42 @@
+from urllib.parse import parse_qs
+
+from fastapi.middleware.gzip import GZipMiddleware
+
+# Respuestas que ya van comprimidas, en las que gzip gasta CPU sin apenas reducir el tamaño
+# (el Excel es un fichero ZIP). Ruta -> parámetros que tienen que coincidir. Los recursos del
+# frontend no hace falta incluirlos: se precomprimen al arrancar y llevan su Content-Encoding
+RUTAS_SIN_COMPRESION = {
+    "/api/export": {"format": "xlsx"},
+}
+
+
+class MiddlewareGZip:
+    """
+    Middleware ASGI que comprime con gzip como GZipMiddleware, salvo las respuestas de
+    RUTAS_SIN_COMPRESION, que se envían tal cual.
+    """
+
+    def __init__(self, app, sin_compresion=None, **opciones):
+        """
+        Args:
+            app (ASGIApp): Aplicación a envolver
+            sin_compresion (dict, optional): Ruta -> parámetros de las respuestas que no se comprimen.
+                                             Por defecto RUTAS_SIN_COMPRESION
+            **opciones: Opciones de GZipMiddleware (minimum_size, compresslevel)
+        """
+        self.app = app
+        self.gzip = GZipMiddleware(app, **opciones)
+        self.sin_compresion = RUTAS_SIN_COMPRESION if sin_compresion is None else sin_compresion
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self._sin_compresion(scope):
+            await self.app(scope, receive, send)
+            return
+        await self.gzip(scope, receive, send)
+
+    def _sin_compresion(self, scope):
+        parametros = self.sin_compresion.get(scope["path"])
+        if parametros is None:
+            return False
+        consulta = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        return all(consulta.get(nombre, [None])[-1] == valor for nombre, valor in parametros.items())
@@ -1,12 +1,27 @@
 
+from models.CentroCollection import CentroCollection
 from models.CentroEducativo import CentroEducativo
+from services.cache_rutas import obtener_cache
+from services.ejecutor_distancias import ESTADO_CANCELADO
+from services.enriquecimiento import ETAPAS_BILINGUES, indexar_bilingues, indexar_compensatorios, normalizar_codigo
+from services.geo import distancias_haversine_km, parsear_decimales, seleccionar_cercanos
+from services.googleConnect import obtener_coordenadas
+from services.ingesta import leer_columnas, normalizar_codigos
+from services.metricas import medir_etapa
 
 import csv 
-import pandas as pd
-import re
+import numpy as np
+import os
 
+# Columnas de coincidencias.csv con las que se crean los centros
+COLUMNAS_CENTROS = ("D_DOMICILIO", "C_POSTAL", "D_MUNICIPIO", "D_PROVINCIA", "D_DENOMINA", "D_ESPECIFICA", "codigo", "D_TIPO",
+                    "N_LATITUD", "N_LONGITUD")
 
-def cargar_csv_centros(csv_cargado,direccion_origen):
+# Encabezados del CSV exportado, en orden
+ENCABEZADOS_EXPORTACION = ["Dirección", "Código Postal", "Municipio", "Provincia", "Tipo Centro", "Nombre Centro", "Código Centro", "Público/Privado", "Idiomas", "Distancia (Km)", "Duración","Centro Compensatorio", "Distancia en línea (Km)"] + [f"Bilingüe {etapa}" for etapa in ETAPAS_BILINGUES]
+
+
+def cargar_csv_centros(csv_cargado,direccion_origen,fallidos=None,radio_km=None,top_k=None,codigos=None,**opciones):
     """
     Carga y procesa los datos de centros educativos desde un archivo CSV.
     Esta función lee un archivo CSV que contiene información sobre centros educativos,
@@ -16,11 +31,27 @@ def cargar_csv_centros(csv_cargado,direccion_origen):
         csv_cargado (str): Ruta al archivo CSV que contiene los datos de los centros educativos.
                         El CSV debe contener las columnas: D_DOMICILIO, C_POSTAL, D_MUNICIPIO,
                         D_PROVINCIA, D_DENOMINA, D_ESPECIFICA, codigo, D_TIPO
+        direccion_origen (str): Dirección desde la que se calculan los trayectos
+        fallidos (list, optional): Si se indica, se le añaden las tuplas (centro, estado) de los centros
+                                   cuya distancia no se pudo calcular, para poder reintentarlos
+                                   (no los que quedaron sin enviar porque se canceló el cálculo)
+        radio_km (float, optional): Sólo se calcula el trayecto por carretera de los centros a menos
+                                    de esta distancia en línea recta del origen
+        top_k (int, optional): Sólo se calcula el trayecto por carretera de los K centros más
+                               cercanos en línea recta
+        codigos (set, optional): Si se indica, sólo se cargan los centros con estos códigos
+                                 (normalizados con normalizar_codigo)
+        **opciones: Opciones del cálculo concurrente (max_hilos, peticiones_por_segundo,
+                    max_reintentos, progreso, cancelado)
+    Returns:
         list: Lista ordenada de objetos CentroEducativo, ordenados por la duración del
               trayecto desde la dirección de origen. Los centros para los que no se pudo
-              calcular la distancia se excluyen del resultado.
+              calcular la distancia, o que no se enviaron por una cancelación, se excluyen
+              del resultado.
+    Raises:
+        ValueError: Si se pide radio_km o top_k y el origen no se puede geocodificar
     Requires:
-        - Clase CentroEducativo con método calcula_distancia_clase()
+        - Clase CentroEducativo con método calcula_distancias_lote()
         - Variable global direccion_origen definida
         - Módulo csv importado
     Example:
@@ -29,33 +60,111 @@ def cargar_csv_centros(csv_cargado,direccion_origen):
         >>>     print(f"{centro.nombre_centro}: {centro.duracion}")
     """
     
-    # Lista para almacenar los objetos de tipo CentroEducativo
-    centros_educativos_completo = []
-
-    # Leer el archivo CSV y crear objetos de tipo CentroEducativo
-    with open(csv_cargado, mode='r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            centro = CentroEducativo(
-                direccion=row["D_DOMICILIO"],
-                codigo_postal = row["C_POSTAL"],
-                municipio=row["D_MUNICIPIO"],
-                provincia=row["D_PROVINCIA"],
-                tipo_centro=row["D_DENOMINA"],
-                nombre_centro=row["D_ESPECIFICA"],
-                codigo_centro = row["codigo"],
-                publico_privado = row["D_TIPO"],
-                bil = "Empty",
+    # Leer de una vez las columnas que se usan y crear objetos de tipo CentroEducativo
+    with medir_etapa("lectura"):
+        datos = leer_columnas(csv_cargado, COLUMNAS_CENTROS, encoding='utf-8', delimitador=',')
+        if codigos is not None:
+            datos = datos[normalizar_codigos(datos["codigo"]).isin(codigos)]
+        centros_leidos = [
+            CentroEducativo(
+                direccion=direccion,
+                codigo_postal=codigo_postal,
+                municipio=municipio,
+                provincia=provincia,
+                tipo_centro=tipo_centro,
+                nombre_centro=nombre_centro,
+                codigo_centro=codigo,
+                publico_privado=publico_privado,
+                bil="Empty",
                 compensatoria="Empty"
             )
-
-            # Calcular la distancia desde la dirección de origen
-            if centro.calcula_distancia_clase(direccion_origen):
-                centros_educativos_completo.append(centro)
+            for direccion, codigo_postal, municipio, provincia, tipo_centro, nombre_centro, codigo, publico_privado in zip(
+                datos["D_DOMICILIO"], datos["C_POSTAL"], datos["D_MUNICIPIO"], datos["D_PROVINCIA"],
+                datos["D_DENOMINA"], datos["D_ESPECIFICA"], datos["codigo"], datos["D_TIPO"])
+        ]
+        # Coordenadas del propio registro, en grados (NaN si faltan o el fichero no las tiene)
+        sin_coordenadas = np.full(len(datos), np.nan)
+        latitudes = parsear_decimales(datos["N_LATITUD"]) if "N_LATITUD" in datos else sin_coordenadas
+        longitudes = parsear_decimales(datos["N_LONGITUD"]) if "N_LONGITUD" in datos else sin_coordenadas
+
+    # Distancia en línea recta a todos los centros de una vez, con las coordenadas del propio registro
+    with medir_etapa("distancia_linea"):
+        centros_leidos = asignar_distancia_linea(centros_leidos, latitudes, longitudes, direccion_origen, radio_km, top_k)
+
+    # Calcular la distancia desde la dirección de origen agrupando los destinos en lotes
+    with medir_etapa("distancias"):
+        centros_sin_distancia = CentroEducativo.calcula_distancias_lote(centros_leidos, direccion_origen, **opciones)
+    # Los centros que no llegaron a enviarse por una cancelación no han fallado: quien cancela decide qué hacer
+    cancelados = [centro for centro, estado in centros_sin_distancia if estado == ESTADO_CANCELADO]
+    centros_sin_distancia = [(centro, estado) for centro, estado in centros_sin_distancia if estado != ESTADO_CANCELADO]
+    for centro, estado in centros_sin_distancia:
+        print(f"No se pudo calcular la distancia para el destino: {centro.direccion_destino()} ({estado})")
+    if cancelados:
+        print(f"Cálculo cancelado: {len(cancelados)} centros sin enviar al motor de trayectos.")
+    if fallidos is not None:
+        fallidos.extend(centros_sin_distancia)
+
+    estadisticas = obtener_cache().estadisticas()
+    print(f"Caché de rutas: {estadisticas['aciertos']} aciertos, {estadisticas['fallos']} fallos ({estadisticas['entradas']} entradas)")
+
+    centros_fallidos = {id(centro) for centro, _ in centros_sin_distancia} | {id(centro) for centro in cancelados}
+    centros_educativos_completo = [centro for centro in centros_leidos if id(centro) not in centros_fallidos]
 
     return centros_educativos_completo
 
 
+def asignar_distancia_linea(centros, latitudes, longitudes, direccion_origen, radio_km=None, top_k=None):
+    """
+    Calcula de una vez la distancia en línea recta desde el origen a todos los centros y,
+    si se pide, descarta los que quedan fuera del radio o de los K más cercanos, para no
+    pagar su consulta de trayecto por carretera.
+    Args:
+        centros (list): Lista de objetos CentroEducativo
+        latitudes (np.ndarray): Latitud de cada centro en grados (NaN si falta)
+        longitudes (np.ndarray): Longitud de cada centro en grados (NaN si falta)
+        direccion_origen (str): Dirección de origen (se geocodifica una vez, con caché)
+        radio_km (float, optional): Distancia máxima en línea recta
+        top_k (int, optional): Número máximo de centros a conservar
+    Returns:
+        list: Centros conservados. Los centros sin coordenadas nunca se descartan
+    Raises:
+        ValueError: Si se pide radio_km o top_k y el origen no se puede geocodificar
+    """
+    if not centros:
+        return centros
+    lats = np.asarray(latitudes, dtype=np.float64)
+    lngs = np.asarray(longitudes, dtype=np.float64)
+    con_coordenadas = ~(np.isnan(lats) | np.isnan(lngs))
+    if not con_coordenadas.any():
+        return centros
+
+    for centro, lat, lng, valido in zip(centros, lats.tolist(), lngs.tolist(), con_coordenadas.tolist()):
+        if valido:
+            centro.latitud, centro.longitud = lat, lng
+
+    lat_origen, lng_origen = obtener_coordenadas(direccion_origen)
+    if lat_origen is None:
+        if radio_km is not None or top_k is not None:
+            # Sin prefiltro se pediría el trayecto de todos los centros, justo lo que se quería evitar
+            raise ValueError(f"No se pudo geocodificar el origen '{direccion_origen}': no se puede aplicar el prefiltro en línea recta")
+        print("No se pudo geocodificar el origen: no se calcula la distancia en línea recta.")
+        return centros
+
+    distancias = distancias_haversine_km(lat_origen, lng_origen, lats, lngs)
+    for centro, distancia in zip(centros, distancias.tolist()):
+        if distancia == distancia:  # NaN si el centro no tiene coordenadas
+            centro.distancia_linea_km = round(distancia, 3)
+
+    if radio_km is None and top_k is None:
+        return centros
+
+    seleccionados = set(seleccionar_cercanos(distancias, radio_km, top_k).tolist())
+    conservados = [centro for posicion, centro in enumerate(centros)
+                   if posicion in seleccionados or not con_coordenadas[posicion]]
+    print(f"Prefiltro en línea recta: {len(conservados)} de {len(centros)} centros pasan al cálculo por carretera")
+    return conservados
+
+
 def ordenar_centros_duracion(centros_educativos_completo):
     """
     Ordena los centros educativos por duración estimada de viaje.
@@ -64,8 +173,9 @@ def ordenar_centros_duracion(centros_educativos_completo):
     Returns:
         list: Lista de objetos CentroEducativo ordenados por duración
     """
-    # Ordenar los centros por duración estimada (convertida a minutos)
-    centros_educativos_ordenados = sorted(centros_educativos_completo, key=lambda x: CentroEducativo.convertir_duracion_a_minutos(x.duracion) if x.duracion is not None else float('inf'))
+    # Ordenar los centros por duración en segundos, guardada como entero al calcular el trayecto
+    with medir_etapa("ordenacion"):
+        centros_educativos_ordenados = sorted(centros_educativos_completo, key=lambda x: x.duracion_s if x.duracion_s is not None else float('inf'))
     return centros_educativos_ordenados
 
 
@@ -78,6 +188,7 @@ def exportar_csv_centros(nombre_csv_exportar,csv_cargado):
     de cada centro.
     Args:
         nombre_csv_exportar (str): Ruta del archivo CSV donde se exportarán los datos.
+        csv_cargado (list | CentroCollection): Centros a exportar, en el orden de salida
     Returns:
         None
     Example:
@@ -96,189 +207,127 @@ def exportar_csv_centros(nombre_csv_exportar,csv_cargado):
             * Idiomas
             * Distancia (Km)
             * Duración
+            * Distancia en línea (Km)
+            * Bilingüe Infantil, Primaria, ESO, Bachillerato y FP (modalidad por etapa)
+        - Los centros deben estar ya marcados con enriquecer_centros
+        - El fichero se sustituye de una vez, sin dejarlo a medias mientras se escribe
     """
 
-    # Definir los encabezados para el nuevo CSV
-    headers = ["Dirección", "Código Postal", "Municipio", "Provincia", "Tipo Centro", "Nombre Centro", "Código Centro", "Público/Privado", "Idiomas", "Distancia (Km)", "Duración","Centro Compensatorio"]
+    # Los textos de distancia y duración se generan aquí, a partir de los metros y segundos
+    coleccion = csv_cargado if isinstance(csv_cargado, CentroCollection) else CentroCollection.desde_centros(csv_cargado)
+    filas = coleccion.filas_exportacion()
+
+    with medir_etapa("exportacion"):
+        escribir_csv_atomico(nombre_csv_exportar, ENCABEZADOS_EXPORTACION, filas)
 
-    # Exportar la lista de objetos CentroEducativo a un nuevo CSV
-    with open(nombre_csv_exportar, mode='w', newline='', encoding='utf-8') as file:
+
+def escribir_csv_atomico(nombre_csv, headers, filas):
+    """
+    Escribe un CSV en un fichero temporal y lo sustituye de una vez con os.replace,
+    para que la API, que recarga la exportación en caliente, nunca lea un fichero a medias.
+    """
+    temporal = f"{nombre_csv}.tmp"
+    with open(temporal, mode='w', newline='', encoding='utf-8') as file:
         writer = csv.DictWriter(file, fieldnames=headers)
         writer.writeheader()
-        
-        for centro in csv_cargado:
-            writer.writerow({
-                "Código Centro": centro.codigo_centro,
-                "Tipo Centro": centro.tipo_centro,
-                "Nombre Centro": centro.nombre_centro,
-                "Público/Privado": centro.publico_privado,
-                "Dirección": centro.direccion,
-                "Código Postal": centro.codigo_postal,
-                "Municipio": centro.municipio,
-                "Provincia": centro.provincia,
-                "Distancia (Km)": centro.distancia_km,
-                "Duración": centro.duracion,
-                "Idiomas": centro.bil,
-                "Centro Compensatorio": centro.compensatoria
-            })
-
-
-def coincidencias(csv1, csv2):
+        writer.writerows(filas)
+    os.replace(temporal, nombre_csv)
+
+
+@medir_etapa("coincidencias")
+def coincidencias(csv1, csv2, csv_salida='coincidencias.csv'):
     """
     Compara dos archivos CSV y encuentra registros coincidentes por código de centro.
-    
+
+    Los dos ficheros se leen por columnas y el cruce se hace de una vez sobre los códigos
+    normalizados; del segundo sólo se lee la columna de códigos.
+
     Args:
         csv1 (str): Ruta al primer CSV (iso-8859-1, delimitador ';')
         csv2 (str): Ruta al segundo CSV (utf-8)
+        csv_salida (str, optional): Ruta del CSV con las coincidencias
     """
-    # Diccionario para almacenar datos del primer CSV
-    datos_csv1 = {}
-
-    # Leer primer CSV (utf-8)
-    with open(csv2, mode='r', encoding='utf-8') as file1:
-        reader1 = csv.DictReader(file1)   
-        for row in reader1:
-            # Limpiar y extraer código numérico del centro
-            codigo_centro = row['codigo'].strip()
-            # Usar regex para extraer solo dígitos del código
-            match = re.search(r'\d+', codigo_centro)
-            # Si hay coincidencia usar dígitos, sino código completo
-            codigo_numerico = match.group() if match else codigo_centro
-            datos_csv1[codigo_numerico] = row
-
-    # Debug: mostrar códigos encontrados
-    print(datos_csv1.keys())
-
-    # Lista para almacenar datos del segundo CSV
-    datos_csv2 = []
-
-    # Leer segundo CSV (iso-8859-1)
-    with open(csv1, mode='r', encoding='iso-8859-1') as file2:
-        reader2 = csv.DictReader(file2, delimiter=';')
-        for row in reader2:
-            datos_csv2.append(row)
-
-    # Lista para almacenar coincidencias encontradas
-    coincidencias = []
-
-    # Buscar coincidencias entre ambos CSVs
-    for row in datos_csv2:
-        codigo_centro = row["codigo"].strip()
-        # Si el código existe en el primer CSV, guardar coincidencia
-        if codigo_centro in datos_csv1:
-            coincidencias.append(row)
-
-    # Obtener headers del primer registro para el CSV de salida
-    headers = datos_csv2[0].keys()
-
-    # Crear nuevo CSV con las coincidencias encontradas
-    with open('coincidencias.csv', mode='w', newline='', encoding='utf-8') as output_file:
-        writer = csv.DictWriter(output_file, fieldnames=headers)
-        writer.writeheader()  # Escribir headers
-        writer.writerows(coincidencias)  # Escribir coincidencias
-
-    print("Se han encontrado y exportado las coincidencias en 'coincidencias.csv'.")
-    
+    # Códigos del segundo CSV, de 8 dígitos y sin la "C" final que añade este fichero
+    codigos = normalizar_codigos(leer_columnas(csv2, ["codigo"], encoding='utf-8', delimitador=',')["codigo"])
+    print(f"{codigos.nunique()} códigos distintos en '{csv2}'")
 
-def cotejar_compensatorios(nombre_csv_exportar,csv_compensatorios):
-    # Leer el primer CSV y almacenar sus registros en un diccionario utilizando "codigo_centro" como clave
-    datos_csv1 = {}
-
-    with open(nombre_csv_exportar, mode='r', encoding='utf-8') as file1:
-        reader1 = csv.DictReader(file1)   
-        for row in reader1:
-            # Almacenar cada fila usando el "codigo_centro" como clave
-            codigo_centro = row['Código Centro'].strip()
-            match = re.search(r'\d+', codigo_centro)
-            codigo_numerico = match.group() if match else codigo_centro  # Extraer solo los dígitos si hay coincidencia
-            datos_csv1[codigo_numerico] = row
-
-    # Leer el segundo CSV y almacenar en una lista los registros
-    datos_csv2 = []
-
-    with open(csv_compensatorios, mode='r', encoding='utf-8') as file2:
-        reader2 = csv.DictReader(file2)
-        for row in reader2:
-            datos_csv2.append(row)
-
-
-    # Crear una lista para almacenar los registros coincidentes
-    coincidencias_compensatorios = []
-    # Actualizar el valor bil en datos_csv1 cuando hay coincidencia
-    for row in datos_csv2:
-        codigo_centro = row["Código Centro"].strip()
-        if codigo_centro in datos_csv1:
-            datos_csv1[codigo_centro]["Centro Compensatorio"] = "Es compensatorio"
-            coincidencias_compensatorios.append(row)
-
-    # Escribir los datos actualizados al CSV
-    headers = datos_csv1[next(iter(datos_csv1))].keys()  # Get headers from first item
-    with open(nombre_csv_exportar, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=headers)
-        writer.writeheader()
-        for row in datos_csv1.values():
-            writer.writerow(row)
+    # Filas del registro cuyo código aparece en el segundo CSV, en el orden del registro
+    registro = leer_columnas(csv1)
+    seleccion = registro[normalizar_codigos(registro["codigo"]).isin(set(codigos))]
 
+    # Mismo formato que csv.DictWriter: utf-8, comillas sólo donde hacen falta y fin de línea \r\n
+    seleccion.to_csv(csv_salida, index=False, encoding='utf-8', lineterminator='\r\n')
 
-    print("Se han encontrado y exportado las coincidencias en 'coincidencias.csv'.")
+    print(f"Se han encontrado y exportado {len(seleccion)} coincidencias en '{csv_salida}'.")
+
+
+@medir_etapa("cotejar_compensatorios")
+def cotejar_compensatorios(nombre_csv_exportar,csv_compensatorios):
+    """
+    Marca los centros compensatorios en un CSV ya exportado.
+    Para el pipeline completo se usa enriquecer_centros antes de exportar, que no reescribe
+    el fichero; esta función queda para actualizar una exportación existente.
+    Args:
+        nombre_csv_exportar (str): Ruta al CSV exportado (utf-8)
+        csv_compensatorios (str): Ruta al CSV de centros compensatorios (utf-8)
+    Returns:
+        int: Número de centros marcados como compensatorios
+    """
+    compensatorios = indexar_compensatorios(csv_compensatorios)
+    return _actualizar_exportacion(nombre_csv_exportar, lambda row, codigo: _marcar_compensatorio(row, compensatorios.get(codigo)))
 
 
 
+@medir_etapa("cotejar_bilingues")
 def cotejar_bilingues(nombre_csv_exportar,csv_bilingues):
     """
-    Coteja los centros bilingües de un archivo CSV con los centros de otro archivo CSV.
-    Esta función toma dos archivos CSV, uno con centros educativos y otro con centros bilingües,
-    y actualiza el campo 'Idiomas' en el primer archivo si un centro es bilingüe.
+    Marca los centros bilingües en un CSV ya exportado, con el detalle por etapa.
+    Para el pipeline completo se usa enriquecer_centros antes de exportar, que no reescribe
+    el fichero; esta función queda para actualizar una exportación existente.
     Args:
-        csv_coincidencias (str): Ruta al archivo CSV con los centros educativos (codificación utf-8)
-        csv_bilingues (str): Ruta al archivo CSV con los centros bilingües (codificación iso-8859-1, delimitador ';')
+        nombre_csv_exportar (str): Ruta al CSV exportado (utf-8)
+        csv_bilingues (str): Ruta al CSV de centros bilingües (codificación iso-8859-1, delimitador ';')
     Returns:
-        None. Actualiza el archivo 'csv_coincidencias' con los centros bilingües.
-    Notas:
-        - El archivo 'csv_coincidencias' se actualiza con el campo 'Idiomas' si un centro es bilingüe.
-        - Ambos archivos deben tener una columna llamada 'codigo' para cotejar los centros.
+        int: Número de centros marcados como bilingües
     Ejemplo:
         cotejar_bilingues('centros.csv', 'centros_bilingues.csv')
     """
-    # Leer el primer CSV y almacenar sus registros en un diccionario utilizando "codigo_centro" como clave
-    datos_csv1 = {}
-
-    with open(nombre_csv_exportar, mode='r', encoding='utf-8') as file1:
-        reader1 = csv.DictReader(file1)   
-        for row in reader1:
-            # Almacenar cada fila usando el "codigo_centro" como clave
-            codigo_centro = row['Código Centro'].strip()
-            match = re.search(r'\d+', codigo_centro)
-            codigo_numerico = match.group() if match else codigo_centro  # Extraer solo los dígitos si hay coincidencia
-            datos_csv1[codigo_numerico] = row
-
-    # Leer el segundo CSV y almacenar en una lista los registros
-    datos_csv2 = []
-
-    with open(csv_bilingues, mode='r', encoding='iso-8859-1') as file2:
-        reader2 = csv.DictReader(file2,delimiter=';')
-        for row in reader2:
-            datos_csv2.append(row)
-
-
-    # Crear una lista para almacenar los registros coincidentes
-    coincidencias_bilingues = []
-    # Actualizar el valor bil en datos_csv1 cuando hay coincidencia
-    for row in datos_csv2:
-        codigo_centro = row["codigo"].strip()
-        if codigo_centro in datos_csv1:
-            datos_csv1[codigo_centro]["Idiomas"] = "Es bilingüe"
-            coincidencias_bilingues.append(row)
-
-    # Escribir los datos actualizados al CSV
-    headers = datos_csv1[next(iter(datos_csv1))].keys()  # Get headers from first item
-    with open(nombre_csv_exportar, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=headers)
-        writer.writeheader()
-        for row in datos_csv1.values():
-            writer.writerow(row)
+    bilingues = indexar_bilingues(csv_bilingues)
+    return _actualizar_exportacion(nombre_csv_exportar, lambda row, codigo: _marcar_bilingue(row, bilingues.get(codigo)))
+
 
+def _marcar_compensatorio(row, programas):
+    if programas is None:
+        return False
+    row["Centro Compensatorio"] = "Es compensatorio"
+    return True
 
-    print("Se han encontrado y exportado las coincidencias en 'coincidencias.csv'.")
 
+def _marcar_bilingue(row, etapas):
+    if etapas is None:
+        return False
+    row["Idiomas"] = "Es bilingüe"
+    for etapa, valor in etapas.items():
+        row[f"Bilingüe {etapa}"] = valor
+    return True
 
+
+def _actualizar_exportacion(nombre_csv_exportar, marcar):
+    """
+    Lee una vez un CSV exportado, aplica marcar(row, codigo) a cada fila y lo reescribe.
+    Las filas se conservan todas y en su orden: no se agrupan por código.
+    """
+    with open(nombre_csv_exportar, mode='r', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
+        headers = list(reader.fieldnames)
+        filas = list(reader)
+
+    # Las exportaciones antiguas no tienen las columnas de detalle bilingüe
+    for header in ENCABEZADOS_EXPORTACION:
+        if header not in headers:
+            headers.append(header)
+
+    marcados = sum(1 for row in filas if marcar(row, normalizar_codigo(row["Código Centro"])))
+    escribir_csv_atomico(nombre_csv_exportar, headers, filas)
+    print(f"Se han marcado {marcados} centros en '{nombre_csv_exportar}'.")
+    return marcados
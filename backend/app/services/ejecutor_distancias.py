@@ -0,0 +1,210 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Estados de elemento que merece la pena reintentar más tarde
+ESTADOS_TRANSITORIOS = ("OVER_QUERY_LIMIT", "UNKNOWN_ERROR")
+
+# Estado de los elementos que no se llegaron a consultar porque se canceló la ejecución
+ESTADO_CANCELADO = "CANCELADO"
+
+
+class ErrorTransitorio(Exception):
+    """
+    Error de una petición que puede tener éxito si se repite más tarde
+    (límite de cuota superado, error desconocido del servidor, timeout, error de red...).
+
+    Attributes:
+        estado (str): Código de estado que se asignará a los elementos si se agotan los reintentos
+    """
+
+    def __init__(self, estado, mensaje=""):
+        super().__init__(mensaje or estado)
+        self.estado = estado
+
+
+class LimitadorTasa:
+    """
+    Limitador de tasa por cubo de fichas (token bucket), seguro entre hilos.
+
+    El cubo se rellena a razón de `tasa` fichas por segundo hasta `capacidad`. Cada petición
+    consume una ficha; si no quedan, el hilo espera lo justo hasta que se genere la siguiente.
+    """
+
+    def __init__(self, tasa, capacidad=None):
+        """
+        Args:
+            tasa (float): Peticiones por segundo permitidas de media
+            capacidad (int, optional): Ráfaga máxima permitida. Por defecto igual a la tasa
+        """
+        self.tasa = tasa
+        self.capacidad = capacidad or max(1, tasa)
+        self._fichas = self.capacidad
+        self._ultima = time.monotonic()
+        self._cerrojo = threading.Lock()
+
+    def adquirir(self, cancelado=None):
+        """
+        Bloquea hasta que haya una ficha disponible y la consume.
+
+        Args:
+            cancelado (threading.Event, optional): Si se activa, se deja de esperar sin consumir la ficha
+
+        Returns:
+            bool: True si se ha consumido una ficha, False si se ha cancelado antes
+        """
+        while True:
+            if cancelado is not None and cancelado.is_set():
+                return False
+            with self._cerrojo:
+                ahora = time.monotonic()
+                self._fichas = min(self.capacidad, self._fichas + (ahora - self._ultima) * self.tasa)
+                self._ultima = ahora
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return True
+                espera = (1 - self._fichas) / self.tasa
+            if cancelado is None:
+                time.sleep(espera)
+            else:
+                cancelado.wait(espera)
+
+
+class EjecutorDistancias:
+    """
+    Ejecuta en paralelo las peticiones por lotes de la Distance Matrix API.
+
+    Los lotes se reparten entre un número acotado de hilos. Cada petición pasa por el
+    limitador de tasa; las que fallan por un error transitorio (o los elementos que vuelven
+    con un estado transitorio) se reintentan con espera exponencial con variación aleatoria.
+    Al terminar, los elementos que siguen sin calcularse conservan su último estado de error
+    para que el llamador pueda reintentarlos más adelante.
+
+    Si se cancela la ejecución, los lotes que aún no se han enviado terminan sin consultarse,
+    con el estado CANCELADO. La cancelación interrumpe también las esperas entre reintentos y
+    las del limitador de tasa.
+    """
+
+    def __init__(self, consulta_lote, max_hilos=8, peticiones_por_segundo=10, max_reintentos=5,
+                 espera_base=1.0, espera_maxima=32.0, progreso=None, cancelado=None):
+        """
+        Args:
+            consulta_lote (callable): Función (lote) -> lista de resultados, uno por elemento, con la
+                                      clave "estado". Debe lanzar ErrorTransitorio si la petición
+                                      entera puede repetirse
+            max_hilos (int): Número máximo de peticiones simultáneas
+            peticiones_por_segundo (float): Tasa máxima de peticiones
+            max_reintentos (int): Reintentos por lote antes de darlo por fallido
+            espera_base (float): Segundos de espera antes del primer reintento
+            espera_maxima (float): Tope de la espera entre reintentos
+            progreso (callable, optional): Función (completados, total) llamada al terminar cada lote.
+                                           Por defecto se imprime el avance por consola
+            cancelado (threading.Event, optional): Si se activa, no se envían más peticiones
+        """
+        self.consulta_lote = consulta_lote
+        self.max_hilos = max_hilos
+        self.limitador = LimitadorTasa(peticiones_por_segundo)
+        self.max_reintentos = max_reintentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.progreso = progreso or imprimir_progreso
+        self.cancelado = cancelado
+
+    def ejecutar(self, lotes, al_completar_lote=None):
+        """
+        Resuelve todos los lotes.
+
+        Args:
+            lotes (list): Lista de lotes; cada lote es una lista de elementos a consultar
+            al_completar_lote (callable, optional): Función (posición del lote, resultados) llamada
+                                                    en cuanto termina cada lote, p.ej. para guardarlo
+
+        Returns:
+            list: Para cada lote, la lista de resultados de sus elementos en el mismo orden
+        """
+        total = sum(len(lote) for lote in lotes)
+        completados = 0
+        resultados = [None] * len(lotes)
+        if not lotes:
+            return resultados
+
+        with ThreadPoolExecutor(max_workers=self.max_hilos) as pool:
+            futuros = {pool.submit(self._resolver_lote, lote): posicion for posicion, lote in enumerate(lotes)}
+            for futuro in as_completed(futuros):
+                posicion = futuros[futuro]
+                resultados[posicion] = futuro.result()
+                if al_completar_lote:
+                    al_completar_lote(posicion, resultados[posicion])
+                completados += len(lotes[posicion])
+                self.progreso(completados, total)
+        return resultados
+
+    def _resolver_lote(self, lote):
+        """
+        Consulta un lote reintentando los errores transitorios.
+
+        Args:
+            lote (list): Elementos del lote
+
+        Returns:
+            list: Resultado de cada elemento
+        """
+        resultados = [{"estado": "SIN_RESPUESTA"} for _ in lote]
+        pendientes = list(range(len(lote)))
+
+        for intento in range(self.max_reintentos + 1):
+            if intento and not self._cancelado():
+                self._esperar(intento)
+            if self._cancelado() or not self.limitador.adquirir(self.cancelado):
+                for posicion in pendientes:
+                    resultados[posicion] = {"estado": ESTADO_CANCELADO}
+                break
+            try:
+                parciales = self.consulta_lote([lote[posicion] for posicion in pendientes])
+            except ErrorTransitorio as e:
+                print(f"Error transitorio en un lote ({e.estado}), intento {intento + 1}")
+                for posicion in pendientes:
+                    resultados[posicion] = {"estado": e.estado}
+                continue
+            except Exception as e:
+                print(f"Error al calcular las distancias del lote: {e}")
+                for posicion in pendientes:
+                    resultados[posicion] = {"estado": getattr(e, "status", None) or "ERROR"}
+                break
+
+            # Sólo se vuelven a pedir los elementos con un estado transitorio
+            siguientes = []
+            for posicion, resultado in zip(pendientes, parciales):
+                resultados[posicion] = resultado
+                if resultado.get("estado") in ESTADOS_TRANSITORIOS:
+                    siguientes.append(posicion)
+            pendientes = siguientes
+            if not pendientes:
+                break
+
+        return resultados
+
+    def _cancelado(self):
+        return self.cancelado is not None and self.cancelado.is_set()
+
+    def _esperar(self, intento):
+        # Espera exponencial con variación aleatoria para no sincronizar los reintentos de todos los hilos
+        espera = min(self.espera_maxima, self.espera_base * 2 ** (intento - 1)) * random.uniform(0.5, 1.0)
+        if self.cancelado is None:
+            time.sleep(espera)
+        else:
+            # Una cancelación despierta al hilo en vez de esperar a que acabe la espera
+            self.cancelado.wait(espera)
+
+
+def imprimir_progreso(completados, total):
+    """
+    Imprime el avance del cálculo de distancias.
+
+    Args:
+        completados (int): Elementos resueltos hasta ahora
+        total (int): Elementos totales
+    """
+    porcentaje = 100 * completados / total if total else 100
+    print(f"Distancias calculadas: {completados}/{total} ({porcentaje:.0f}%)")
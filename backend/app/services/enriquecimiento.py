@@ -0,0 +1,122 @@
+import csv
+import re
+
+from services.metricas import medir_etapa
+
+# Los códigos de centro son 8 dígitos; centros_todos.csv les añade una "C" final
+_PATRON_CODIGO = re.compile(r"(\d{1,8})C?", re.IGNORECASE)
+
+# Etapa que se exporta y columnas de da_centros_bilingues.csv que la componen
+ETAPAS_BILINGUES = {
+    "Infantil": ("Infantil_2_ciclo",),
+    "Primaria": ("Primaria",),
+    "ESO": ("ESO",),
+    "Bachillerato": ("Bachillerato",),
+    "FP": ("CCFF_Grado_Básico", "CCFF_Grado_Medio", "CCFF_Grado_Superior", "Cur_Especialización_FP_Grado_Superior"),
+}
+
+
+def normalizar_codigo(codigo):
+    """
+    Normaliza un código de centro para cruzar ficheros distintos.
+
+    Acepta el código con o sin la "C" final y con los ceros a la izquierda perdidos
+    (p. ej. al pasar por una hoja de cálculo). Cualquier otro texto se devuelve tal cual,
+    sin extraer sus dígitos, para que dos códigos distintos nunca acaben con la misma clave.
+
+    Args:
+        codigo (str): Código tal como aparece en el fichero
+
+    Returns:
+        str: Código de 8 dígitos, o el texto original sin espacios si no tiene ese formato
+
+    Example:
+        >>> normalizar_codigo('04000110C')
+        '04000110'
+    """
+    codigo = (codigo or "").strip()
+    coincidencia = _PATRON_CODIGO.fullmatch(codigo)
+    return coincidencia.group(1).zfill(8) if coincidencia else codigo
+
+
+def indexar_bilingues(csv_bilingues):
+    """
+    Lee una vez el fichero de centros bilingües y lo indexa por código.
+
+    Args:
+        csv_bilingues (str): Ruta a da_centros_bilingues.csv (iso-8859-1, delimitador ';')
+
+    Returns:
+        dict: Código normalizado -> {etapa: modalidad} con todas las etapas de ETAPAS_BILINGUES
+              ('BIL ING', 'PLURIL FRA/ING'...; cadena vacía si la etapa no es bilingüe)
+    """
+    indice = {}
+    with open(csv_bilingues, mode='r', encoding='iso-8859-1') as file:
+        for row in csv.DictReader(file, delimiter=';'):
+            etapas = {}
+            for etapa, columnas in ETAPAS_BILINGUES.items():
+                valores = [row.get(columna, "").strip() for columna in columnas]
+                # En FP se juntan los ciclos sin repetir la misma modalidad
+                etapas[etapa] = " / ".join(dict.fromkeys(valor for valor in valores if valor))
+            indice[normalizar_codigo(row["codigo"])] = etapas
+    return indice
+
+
+def indexar_compensatorios(csv_compensatorios):
+    """
+    Lee una vez el fichero de centros compensatorios y lo indexa por código.
+
+    Args:
+        csv_compensatorios (str): Ruta a centros_compensatoria.csv (utf-8)
+
+    Returns:
+        dict: Código normalizado -> programas del centro (p. ej. 'CAEP')
+    """
+    indice = {}
+    with open(csv_compensatorios, mode='r', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            indice[normalizar_codigo(row["Código Centro"])] = (row.get("Programas") or "").strip()
+    return indice
+
+
+@medir_etapa("enriquecimiento")
+def enriquecer_centros(centros, csv_bilingues=None, csv_compensatorios=None):
+    """
+    Marca en memoria los centros bilingües y compensatorios, antes de exportar.
+
+    Cada fichero fuente se lee una sola vez y se cruza con los centros por su código
+    normalizado, de modo que la exportación se escribe una única vez ya completa.
+
+    Args:
+        centros (list): Objetos CentroEducativo
+        csv_bilingues (str | dict, optional): Ruta a da_centros_bilingues.csv, o su índice ya
+                                              construido con indexar_bilingues
+        csv_compensatorios (str | dict, optional): Ruta a centros_compensatoria.csv, o su índice
+                                                   ya construido con indexar_compensatorios
+
+    Returns:
+        tuple: (número de centros bilingües, número de centros compensatorios)
+    """
+    bilingues = _indice(csv_bilingues, indexar_bilingues)
+    compensatorios = _indice(csv_compensatorios, indexar_compensatorios)
+
+    total_bilingues = total_compensatorios = 0
+    for centro in centros:
+        codigo = normalizar_codigo(centro.codigo_centro)
+        etapas = bilingues.get(codigo)
+        if etapas is not None:
+            centro.bil = "Es bilingüe"
+            centro.etapas_bilingues = etapas
+            total_bilingues += 1
+        if codigo in compensatorios:
+            centro.compensatoria = "Es compensatorio"
+            total_compensatorios += 1
+
+    print(f"Enriquecimiento: {total_bilingues} centros bilingües y {total_compensatorios} compensatorios de {len(centros)}")
+    return total_bilingues, total_compensatorios
+
+
+def _indice(fuente, indexar):
+    if not fuente:
+        return {}
+    return fuente if isinstance(fuente, dict) else indexar(fuente)
@@ -0,0 +1,366 @@
+# Motores de cálculo de trayectos intercambiables detrás de googleConnect.
+#
+#   google        Distance Matrix y Geocoding de Google Maps (de pago, necesita clave y red)
+#   google_local  El mismo cliente contra servidor_google_falso, arrancado en este proceso (pruebas)
+#   estimado      Sin red: tiempo derivado de la distancia en línea recta con un factor de rodeo
+#
+# El motor se elige con la variable de entorno MOTOR_RUTAS o con configurar_motor().
+
+import os
+import re
+import threading
+
+import googlemaps
+import googlemaps.distance_matrix
+import googlemaps.exceptions
+import googlemaps.geocoding
+import numpy as np
+from dotenv import load_dotenv
+
+from services.cache_rutas import CacheRutas, obtener_cache
+from services.ejecutor_distancias import ErrorTransitorio
+from services.geo import distancias_haversine_km
+from services.unidades import formatear_distancia, formatear_duracion
+
+# Cargar las variables de entorno desde el archivo .env
+load_dotenv()
+
+MOTOR_RUTAS = os.getenv("MOTOR_RUTAS", "google")
+
+GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
+# Permite apuntar el cliente a un servidor local que imite la API (pruebas y benchmarks)
+GOOGLE_MAPS_BASE_URL = os.getenv("GOOGLE_MAPS_BASE_URL", "https://maps.googleapis.com")
+
+# Parámetros del motor estimado: rodeo de la carretera frente a la línea recta y velocidad media
+FACTOR_CARRETERA = float(os.getenv("RUTAS_FACTOR_CARRETERA", 1.3))
+VELOCIDAD_KMH = float(os.getenv("RUTAS_VELOCIDAD_KMH", 60))
+
+# Límites de la Distance Matrix API por petición
+MAX_ORIGENES_POR_PETICION = 25
+MAX_DESTINOS_POR_PETICION = 25
+MAX_ELEMENTOS_POR_PETICION = 100
+
+_PATRON_COORDENADAS = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+def parsear_coordenadas(lugar):
+    """
+    Devuelve las coordenadas de un lugar dado como par (lat, lng) o como texto "lat,lng".
+
+    Args:
+        lugar (str | tuple): Dirección, texto "lat,lng" o par de coordenadas
+
+    Returns:
+        tuple: (latitud, longitud), o None si el lugar es una dirección postal
+    """
+    if isinstance(lugar, (tuple, list)):
+        return float(lugar[0]), float(lugar[1])
+    coincidencia = _PATRON_COORDENADAS.match(str(lugar))
+    if coincidencia:
+        return float(coincidencia.group(1)), float(coincidencia.group(2))
+    return None
+
+
+class MotorRutas:
+    """
+    Interfaz de un motor de trayectos.
+
+    Attributes:
+        nombre (str): Nombre con el que se selecciona el motor
+        modo (str): Modo que se usa en las claves de la caché de trayectos; motores distintos
+                    usan modos distintos para no mezclar sus resultados
+        destinos_por_peticion (int): Destinos por llamada a consultar_lote (None: todos a la vez)
+        elementos_por_peticion (int): Orígenes × destinos por llamada a consultar_matriz (None: sin límite)
+        espacio_geocodigo (str): Prefijo de sus geocodificaciones en la caché (None: las de Google)
+        cachear (bool): Si sus resultados merecen guardarse en la caché persistente
+        usa_coordenadas (bool): Si prefiere recibir los destinos como (lat, lng) en vez de dirección
+    """
+
+    nombre = None
+    modo = "driving"
+    destinos_por_peticion = None
+    elementos_por_peticion = None
+    espacio_geocodigo = None
+    cachear = True
+    usa_coordenadas = False
+
+    def consultar_lote(self, origen, destinos):
+        """
+        Calcula los trayectos desde un origen a un lote de destinos.
+
+        Args:
+            origen (str | tuple): Dirección o coordenadas de origen
+            destinos (list): Direcciones o coordenadas de destino
+
+        Returns:
+            list: Un diccionario por destino con la clave "estado" y, si es "OK", las claves
+                  "distancia en Km", "distancia en m", "duracion" y "duracion en s"
+
+        Raises:
+            ErrorTransitorio: Si la petición puede tener éxito repitiéndola más tarde
+        """
+        raise NotImplementedError
+
+    def consultar_matriz(self, origenes, destinos):
+        """
+        Calcula los trayectos desde varios orígenes a un lote de destinos. Por defecto
+        consulta un lote por origen; los motores que admiten varios orígenes por petición
+        lo sustituyen.
+
+        Args:
+            origenes (list): Direcciones o coordenadas de origen
+            destinos (list): Direcciones o coordenadas de destino
+
+        Returns:
+            list: Por cada origen, la lista de resultados de sus destinos como en consultar_lote
+
+        Raises:
+            ErrorTransitorio: Si la petición puede tener éxito repitiéndola más tarde
+        """
+        return [self.consultar_lote(origen, destinos) for origen in origenes]
+
+    def geocodificar(self, direccion):
+        """
+        Convierte una dirección en coordenadas.
+
+        Args:
+            direccion (str): Dirección postal
+
+        Returns:
+            tuple: (latitud, longitud), o None si no se encuentra
+        """
+        raise NotImplementedError
+
+
+class MotorGoogle(MotorRutas):
+    """
+    Motor sobre la Distance Matrix API de Google Maps, con un cliente HTTP compartido.
+    """
+
+    nombre = "google"
+    destinos_por_peticion = min(MAX_DESTINOS_POR_PETICION, MAX_ELEMENTOS_POR_PETICION)
+    elementos_por_peticion = MAX_ELEMENTOS_POR_PETICION
+
+    def __init__(self, base_url=GOOGLE_MAPS_BASE_URL, clave=GOOGLE_MAPS_API_KEY):
+        """
+        Args:
+            base_url (str): URL base de la API
+            clave (str): Clave de la API de Google Maps
+        """
+        self.base_url = base_url
+        self.clave = clave
+        self._cliente = None
+        self._cerrojo = threading.Lock()
+
+    def cliente(self):
+        """
+        Devuelve el cliente de Google Maps del motor, creándolo la primera vez.
+        Reutiliza la sesión HTTP (y sus conexiones) entre llamadas.
+
+        Returns:
+            googlemaps.Client: Cliente con la clave API configurada
+        """
+        if self._cliente is None:
+            with self._cerrojo:
+                if self._cliente is None:
+                    # Los reintentos por cuota los gestiona EjecutorDistancias con su propia espera exponencial
+                    self._cliente = googlemaps.Client(
+                        self.clave,
+                        retry_over_query_limit=False,
+                        base_url=self.base_url,
+                    )
+        return self._cliente
+
+    def consultar_lote(self, origen, destinos):
+        return self.consultar_matriz([origen], destinos)[0]
+
+    def consultar_matriz(self, origenes, destinos):
+        try:
+            result = googlemaps.distance_matrix.distance_matrix(
+                self.cliente(),
+                origins=list(origenes),
+                destinations=destinos,
+                language="ES",
+                mode="driving"
+            )
+        except googlemaps.exceptions.ApiError as e:
+            if e.status in ("OVER_QUERY_LIMIT", "UNKNOWN_ERROR"):
+                raise ErrorTransitorio(e.status, str(e))
+            print(f"Error al calcular las distancias del lote: {e}")
+            return [[{"estado": e.status} for _ in destinos] for _ in origenes]
+        except (googlemaps.exceptions.Timeout, googlemaps.exceptions.TransportError,
+                googlemaps.exceptions.HTTPError) as e:
+            raise ErrorTransitorio("ERROR_TRANSPORTE", str(e))
+
+        filas = result.get('rows') or []
+        return [self._resultados_fila(filas[posicion]['elements'] if posicion < len(filas) else [], len(destinos))
+                for posicion in range(len(origenes))]
+
+    @staticmethod
+    def _resultados_fila(elementos, numero_destinos):
+        # Resultados de un origen de la respuesta, uno por destino y en el mismo orden
+        resultados = []
+        for posicion in range(numero_destinos):
+            if posicion >= len(elementos):
+                resultados.append({"estado": "SIN_RESPUESTA"})
+                continue
+            elemento = elementos[posicion]
+            if elemento['status'] != 'OK':
+                resultados.append({"estado": elemento['status']})
+                continue
+            resultados.append({
+                "estado": "OK",
+                "distancia en Km": elemento['distance']['text'],
+                "distancia en m": elemento['distance']['value'],
+                "duracion": elemento['duration']['text'],
+                "duracion en s": elemento['duration']['value'],
+            })
+        return resultados
+
+    def geocodificar(self, direccion):
+        geocode_result = googlemaps.geocoding.geocode(self.cliente(), direccion)
+        if not geocode_result:
+            return None
+        # Google Maps puede devolver múltiples resultados, tomamos el primero
+        ubicacion = geocode_result[0]['geometry']['location']
+        return ubicacion['lat'], ubicacion['lng']
+
+
+class MotorGoogleLocal(MotorGoogle):
+    """
+    El motor de Google contra el servidor falso de servidor_google_falso, que imita el JSON
+    de la Distance Matrix sin clave ni red. Si no se indica URL, arranca uno en este proceso.
+    """
+
+    nombre = "google_local"
+    # Sus respuestas son inventadas: nunca deben servirse como si fueran de Google
+    modo = "driving-local"
+    espacio_geocodigo = "local"
+
+    def __init__(self, base_url=None, probabilidad_sobrecuota=0.0):
+        """
+        Args:
+            base_url (str, optional): URL de un servidor falso ya arrancado
+            probabilidad_sobrecuota (float): Si se arranca el servidor, fracción de peticiones
+                                             que responderán OVER_QUERY_LIMIT
+        """
+        if base_url is None:
+            from services.servidor_google_falso import iniciar_servidor
+            self.servidor, base_url = iniciar_servidor(probabilidad_sobrecuota=probabilidad_sobrecuota)
+        super().__init__(base_url=base_url, clave="AIzaServidorLocal")
+
+
+class MotorEstimado(MotorRutas):
+    """
+    Motor sin red: estima el trayecto por carretera a partir de la distancia en línea recta.
+
+    distancia = línea recta × factor de rodeo; duración = distancia / velocidad media.
+    No geocodifica: necesita coordenadas, ya sea como (lat, lng), como texto "lat,lng" o una
+    dirección cuya geocodificación esté en la caché. Todo un lote se calcula a la vez con NumPy,
+    así que ordenar miles de centros es instantáneo; el motor de pago queda para afinar.
+    """
+
+    nombre = "estimado"
+    modo = "estimado"
+    cachear = False
+    usa_coordenadas = True
+
+    def __init__(self, factor_carretera=FACTOR_CARRETERA, velocidad_kmh=VELOCIDAD_KMH):
+        """
+        Args:
+            factor_carretera (float): Cociente entre la distancia por carretera y la línea recta
+            velocidad_kmh (float): Velocidad media del trayecto
+        """
+        self.factor_carretera = factor_carretera
+        self.velocidad_kmh = velocidad_kmh
+
+    def consultar_lote(self, origen, destinos):
+        coordenadas_origen = self._coordenadas(origen)
+        if coordenadas_origen is None:
+            return [{"estado": "SIN_COORDENADAS"} for _ in destinos]
+
+        coordenadas = [self._coordenadas(destino) or (np.nan, np.nan) for destino in destinos]
+        lats, lngs = np.array(coordenadas, dtype=np.float64).reshape(-1, 2).T
+        metros = distancias_haversine_km(*coordenadas_origen, lats, lngs) * self.factor_carretera * 1000
+        segundos = metros / 1000 / self.velocidad_kmh * 3600
+
+        resultados = []
+        for distancia, duracion in zip(metros.tolist(), segundos.tolist()):
+            if distancia != distancia:  # NaN: destino sin coordenadas
+                resultados.append({"estado": "SIN_COORDENADAS"})
+                continue
+            resultados.append({
+                "estado": "OK",
+                "distancia en Km": formatear_distancia(int(distancia)),
+                "distancia en m": int(distancia),
+                "duracion": formatear_duracion(int(duracion)),
+                "duracion en s": int(duracion),
+            })
+        return resultados
+
+    def geocodificar(self, direccion):
+        return self._coordenadas(direccion)
+
+    @staticmethod
+    def _coordenadas(lugar):
+        coordenadas = parsear_coordenadas(lugar)
+        if coordenadas is None:
+            # Sin red sólo se conocen las direcciones que ya geocodificó otro motor
+            guardadas = obtener_cache().obtener(CacheRutas.clave_geocodigo(lugar))
+            coordenadas = tuple(guardadas) if guardadas else None
+        return coordenadas
+
+
+MOTORES = {motor.nombre: motor for motor in (MotorGoogle, MotorGoogleLocal, MotorEstimado)}
+
+_motor = None
+_cerrojo_motor = threading.Lock()
+
+
+def obtener_motor():
+    """
+    Devuelve el motor de trayectos compartido, creando el de MOTOR_RUTAS la primera vez.
+
+    Returns:
+        MotorRutas: Motor en uso
+    """
+    global _motor
+    if _motor is None:
+        with _cerrojo_motor:
+            if _motor is None:
+                _motor = crear_motor(MOTOR_RUTAS)
+    return _motor
+
+
+def configurar_motor(motor):
+    """
+    Cambia el motor de trayectos compartido.
+
+    Args:
+        motor (str | MotorRutas): Nombre de un motor de MOTORES o una instancia ya creada
+
+    Returns:
+        MotorRutas: Motor en uso
+    """
+    global _motor
+    with _cerrojo_motor:
+        _motor = crear_motor(motor) if isinstance(motor, str) else motor
+    return _motor
+
+
+def crear_motor(nombre):
+    """
+    Crea un motor de trayectos por su nombre.
+
+    Args:
+        nombre (str): 'google', 'google_local' o 'estimado'
+
+    Returns:
+        MotorRutas: Motor nuevo
+
+    Raises:
+        ValueError: Si el nombre no corresponde a ningún motor
+    """
+    if nombre not in MOTORES:
+        raise ValueError(f"Motor de rutas desconocido: {nombre!r} (disponibles: {', '.join(MOTORES)})")
+    return MOTORES[nombre]()
@@ -0,0 +1,175 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él los recursos se sirven sólo con gzip
+    brotli = None
+
+# Carpetas del frontend cuyos ficheros se sirven con huella de contenido bajo PREFIJO_ESTATICOS
+CARPETAS_ESTATICAS = ("css", "js")
+PREFIJO_ESTATICOS = "/static"
+
+# Los recursos con huella no cambian nunca: si cambia el contenido cambia el nombre
+CACHE_INMUTABLE = "public, max-age=31536000, immutable"
+# El HTML y los recursos sin huella se guardan en el navegador, pero se revalidan con su ETag
+CACHE_REVALIDAR = "no-cache"
+
+# Por debajo de este tamaño comprimir no compensa la cabecera extra
+TAMANO_MINIMO_COMPRESION = 256
+
+# Referencias relativas del index.html a las carpetas estáticas (href="css/style.css", src="js/main.js")
+_PATRON_REFERENCIA = re.compile(r'(?P<atributo>href|src)=(?P<comilla>["\'])(?P<ruta>(?:%s)/[^"\']+)(?P=comilla)'
+                                % "|".join(CARPETAS_ESTATICAS))
+
+
+class RecursoEstatico:
+    """
+    Fichero del frontend cargado en memoria con sus versiones precomprimidas.
+
+    Attributes:
+        contenido (bytes): Contenido original
+        comprimidos (dict): Codificación ('br', 'gzip') -> contenido comprimido, sólo las que ahorran bytes
+        tipo_mime (str): Content-Type del recurso
+        huella (str): Primeros caracteres del SHA-256 del contenido
+        etag (str): ETag del contenido original
+    """
+
+    def __init__(self, contenido, tipo_mime):
+        """
+        Args:
+            contenido (bytes): Contenido del fichero
+            tipo_mime (str): Content-Type del recurso
+        """
+        self.contenido = contenido
+        self.tipo_mime = tipo_mime
+        self.huella = hashlib.sha256(contenido).hexdigest()[:12]
+        self.etag = f'"{self.huella}"'
+        self.comprimidos = {}
+        if len(contenido) >= TAMANO_MINIMO_COMPRESION:
+            # Se comprime una sola vez al arrancar, así que se usa el nivel máximo
+            candidatos = {"gzip": gzip.compress(contenido, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                candidatos["br"] = brotli.compress(contenido, quality=11)
+            self.comprimidos = {codificacion: datos for codificacion, datos in candidatos.items() if len(datos) < len(contenido)}
+
+    def version(self, accept_encoding):
+        """
+        Elige la versión que se envía según lo que acepta el cliente (brotli antes que gzip).
+
+        Args:
+            accept_encoding (str): Cabecera Accept-Encoding de la petición
+
+        Returns:
+            tuple: (contenido, codificación o None si se envía sin comprimir, ETag de esa versión)
+        """
+        aceptadas = {codificacion.split(";")[0].strip() for codificacion in (accept_encoding or "").split(",")}
+        for codificacion in ("br", "gzip"):
+            if codificacion in aceptadas and codificacion in self.comprimidos:
+                return self.comprimidos[codificacion], codificacion, f'"{self.huella}-{codificacion}"'
+        return self.contenido, None, self.etag
+
+    def coincide_etag(self, if_none_match):
+        """
+        Comprueba si la cabecera If-None-Match corresponde a este contenido, en cualquiera de sus versiones.
+
+        Args:
+            if_none_match (str): Valor de la cabecera If-None-Match
+
+        Returns:
+            bool: True si el cliente ya tiene este contenido
+        """
+        if not if_none_match:
+            return False
+        for etiqueta in if_none_match.split(","):
+            etiqueta = etiqueta.strip()
+            if etiqueta.startswith("W/"):
+                etiqueta = etiqueta[2:]
+            if etiqueta == "*" or etiqueta.strip('"').split("-")[0] == self.huella:
+                return True
+        return False
+
+
+class RecursosEstaticos:
+    """
+    Frontend servido desde memoria: el index.html, los CSS y JS con huella de contenido y las imágenes.
+
+    Al arrancar se leen los ficheros de CARPETAS_ESTATICAS, se les pone en el nombre una huella
+    de su contenido (css/style.css -> css/style.3f2a9c1b4d5e.css) y se precomprimen. Las
+    referencias del index.html se reescriben a esos nombres, así que el navegador puede guardar
+    los recursos para siempre y una recarga de la página sólo pide el HTML, que se revalida con
+    su ETag. Los ficheros del disco no se modifican.
+
+    Attributes:
+        html (RecursoEstatico): index.html con las referencias reescritas
+        recursos (dict): Ruta con huella ('css/style.3f2a9c1b4d5e.css') -> RecursoEstatico
+        rutas (dict): Ruta original ('css/style.css') -> ruta con huella
+    """
+
+    def __init__(self, directorio):
+        """
+        Args:
+            directorio (str): Carpeta del frontend (la que contiene index.html)
+        """
+        self.directorio = directorio
+        self.recursos = {}
+        self.rutas = {}
+        self._sin_huella = {}
+        for carpeta in CARPETAS_ESTATICAS:
+            raiz = os.path.join(directorio, carpeta)
+            for actual, _, ficheros in os.walk(raiz):
+                for fichero in sorted(ficheros):
+                    ruta = os.path.relpath(os.path.join(actual, fichero), directorio).replace(os.sep, "/")
+                    recurso = self.cargar(ruta)
+                    base, extension = os.path.splitext(ruta)
+                    con_huella = f"{base}.{recurso.huella}{extension}"
+                    self.recursos[con_huella] = recurso
+                    self._sin_huella[ruta] = recurso
+                    self.rutas[ruta] = con_huella
+
+        with open(os.path.join(directorio, "index.html"), mode="r", encoding="utf-8") as file:
+            html = _PATRON_REFERENCIA.sub(self._reescribir, file.read())
+        self.html = RecursoEstatico(html.encode("utf-8"), "text/html; charset=utf-8")
+
+    def cargar(self, ruta):
+        """
+        Carga en memoria un fichero del frontend.
+
+        Args:
+            ruta (str): Ruta relativa a la carpeta del frontend ('assets/images/risa.png')
+
+        Returns:
+            RecursoEstatico: Fichero con sus versiones comprimidas
+        """
+        tipo_mime = mimetypes.guess_type(ruta)[0] or "application/octet-stream"
+        if tipo_mime.startswith("text/") or tipo_mime in ("application/javascript", "text/javascript"):
+            tipo_mime += "; charset=utf-8"
+        with open(os.path.join(self.directorio, ruta), mode="rb") as file:
+            return RecursoEstatico(file.read(), tipo_mime)
+
+    def buscar(self, ruta):
+        """
+        Busca un recurso por su ruta bajo PREFIJO_ESTATICOS.
+
+        Args:
+            ruta (str): Ruta con huella ('css/style.3f2a9c1b4d5e.css') u original ('css/style.css')
+
+        Returns:
+            tuple: (RecursoEstatico, True si la ruta lleva huella y se puede guardar para siempre),
+                   o (None, False) si no existe
+        """
+        if ruta in self.recursos:
+            return self.recursos[ruta], True
+        if ruta in self._sin_huella:
+            return self._sin_huella[ruta], False
+        return None, False
+
+    def _reescribir(self, coincidencia):
+        ruta = coincidencia.group("ruta")
+        if ruta not in self.rutas:
+            return coincidencia.group(0)
+        comilla = coincidencia.group("comilla")
+        return f'{coincidencia.group("atributo")}={comilla}{PREFIJO_ESTATICOS}/{self.rutas[ruta]}{comilla}'
@@ -0,0 +1,165 @@
+import csv
+import io
+import json
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+# Filas que se acumulan antes de entregar un bloque al servidor
+FILAS_POR_BLOQUE = 500
+
+# Formatos de /api/export: tipo MIME y extensión del fichero descargado
+FORMATOS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+# Caracteres de control que no admite XML 1.0 (los tabuladores y saltos de línea sí)
+_CONTROL_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def generar_exportacion(formato, encabezados, filas, filas_por_bloque=FILAS_POR_BLOQUE):
+    """
+    Genera una exportación por bloques de bytes a partir de un iterable de filas.
+
+    Las filas se consumen a medida que se escriben, así que la memoria no depende del número
+    de centros exportados y el primer bloque sale antes de haber recorrido el resultado.
+
+    Args:
+        formato (str): 'csv', 'ndjson' o 'xlsx'
+        encabezados (list): Columnas a exportar, en orden
+        filas (iterable): Diccionarios con los datos de cada centro
+        filas_por_bloque (int): Filas que se escriben antes de entregar cada bloque
+
+    Returns:
+        generator: Bloques de bytes del fichero
+
+    Raises:
+        ValueError: Si el formato no está en FORMATOS
+    """
+    generadores = {"csv": _generar_csv, "ndjson": _generar_ndjson, "xlsx": _generar_xlsx}
+    if formato not in generadores:
+        raise ValueError(f"Formato desconocido: {formato!r} (disponibles: {', '.join(FORMATOS)})")
+    return generadores[formato](encabezados, filas, filas_por_bloque)
+
+
+def _generar_csv(encabezados, filas, filas_por_bloque):
+    buffer = io.StringIO(newline="")
+    escritor = csv.DictWriter(buffer, fieldnames=encabezados, extrasaction="ignore")
+    escritor.writeheader()
+    for numero, fila in enumerate(filas, start=1):
+        escritor.writerow(fila)
+        if numero % filas_por_bloque == 0:
+            yield _vaciar(buffer).encode("utf-8")
+    yield _vaciar(buffer).encode("utf-8")
+
+
+def _generar_ndjson(encabezados, filas, filas_por_bloque):
+    lineas = []
+    for fila in filas:
+        lineas.append(json.dumps({columna: fila.get(columna, "") for columna in encabezados},
+                                 ensure_ascii=False, separators=(",", ":")))
+        if len(lineas) == filas_por_bloque:
+            yield ("\n".join(lineas) + "\n").encode("utf-8")
+            lineas.clear()
+    if lineas:
+        yield ("\n".join(lineas) + "\n").encode("utf-8")
+
+
+class _SalidaPorBloques(io.RawIOBase):
+    """
+    Destino de escritura no posicionable para zipfile: acumula lo escrito hasta que se recoge.
+    zipfile detecta que no se puede hacer seek y escribe los tamaños tras cada miembro.
+    """
+
+    def __init__(self):
+        self._partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def recoger(self):
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+# Partes fijas de un libro de Excel con una sola hoja
+_XLSX_FIJOS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Centros" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _generar_xlsx(encabezados, filas, filas_por_bloque):
+    # Las celdas van como texto en línea (inlineStr): una tabla de cadenas compartidas
+    # obligaría a recorrer todas las filas antes de escribir la hoja
+    salida = _SalidaPorBloques()
+    with zipfile.ZipFile(salida, mode="w", compression=zipfile.ZIP_DEFLATED) as libro:
+        for nombre, contenido in _XLSX_FIJOS.items():
+            libro.writestr(nombre, contenido)
+        yield salida.recoger()
+
+        with libro.open("xl/worksheets/sheet1.xml", mode="w") as hoja:
+            hoja.write(
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>'.encode("utf-8")
+            )
+            hoja.write(_fila_xlsx(encabezados).encode("utf-8"))
+            for numero, fila in enumerate(filas, start=1):
+                hoja.write(_fila_xlsx(fila.get(columna, "") for columna in encabezados).encode("utf-8"))
+                if numero % filas_por_bloque == 0:
+                    datos = salida.recoger()
+                    if datos:
+                        yield datos
+            hoja.write(b"</sheetData></worksheet>")
+    yield salida.recoger()
+
+
+def _fila_xlsx(valores):
+    celdas = "".join(f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_CONTROL_XML.sub("", str(valor)))}</t></is></c>'
+                     for valor in valores)
+    return f"<row>{celdas}</row>"
+
+
+def _vaciar(buffer):
+    texto = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return texto
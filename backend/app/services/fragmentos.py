@@ -0,0 +1,226 @@
+import csv
+import heapq
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from services.enriquecimiento import ETAPAS_BILINGUES, indexar_bilingues, indexar_compensatorios
+from services.geo import distancias_haversine_km, parsear_decimales
+from services.googleConnect import obtener_coordenadas
+from services.ingesta import COLUMNAS_REGISTRO, leer_columnas, normalizar_codigos
+from services.metricas import medir_etapa
+from services.unidades import formatear_distancia
+
+# Encabezados del registro enriquecido, en orden
+ENCABEZADOS_REGISTRO_ENRIQUECIDO = ["Código Centro", "Nombre Centro", "Tipo Centro", "Público/Privado", "Dirección",
+                                    "Localidad", "Municipio", "Provincia", "Código Postal", "Latitud", "Longitud",
+                                    "Idiomas", "Centro Compensatorio", "Distancia en línea (Km)"] + [
+                                    f"Bilingüe {etapa}" for etapa in ETAPAS_BILINGUES]
+
+# Por debajo de este tamaño un fichero no se parte: el coste de arrancar el fragmento no compensa
+TAMANO_MINIMO_FRAGMENTO = 1 << 20
+
+# Datos comunes a todos los fragmentos, que cada proceso recibe una sola vez al arrancar
+_CONTEXTO = {}
+
+
+def planificar_fragmentos(rutas, procesos, tamano_minimo=TAMANO_MINIMO_FRAGMENTO):
+    """
+    Reparte los ficheros del registro (uno por comunidad) en fragmentos de tamaño parecido,
+    uno por proceso aproximadamente.
+
+    Cada fichero se parte en rangos de bytes que empiezan y acaban en un salto de línea,
+    sin leerlo: basta con buscar el primer salto de línea tras cada corte. Los ficheros de
+    la Junta no tienen saltos de línea dentro de los campos, así que cada rango contiene
+    filas completas. Cada fragmento lleva la fila de encabezados de su fichero.
+
+    Args:
+        rutas (list): Ficheros del registro con el formato de da_centros.csv
+        procesos (int): Procesos entre los que se reparten los fragmentos
+        tamano_minimo (int): Tamaño mínimo en bytes de un fragmento
+
+    Returns:
+        list: Tuplas (ruta, encabezados en bytes, inicio, fin), de mayor a menor tamaño
+    """
+    tamanos = {ruta: os.path.getsize(ruta) for ruta in rutas}
+    total = sum(tamanos.values()) or 1
+    fragmentos = []
+    for ruta in rutas:
+        with open(ruta, mode="rb") as file:
+            cabecera = file.readline()
+            inicio_datos = file.tell()
+            tamano = tamanos[ruta]
+            # Los ficheros grandes reciben más fragmentos, en proporción a su tamaño
+            partes = max(1, min(round(procesos * tamano / total), (tamano - inicio_datos) // tamano_minimo))
+            cortes = [inicio_datos]
+            for parte in range(1, partes):
+                file.seek(inicio_datos + (tamano - inicio_datos) * parte // partes)
+                file.readline()
+                if file.tell() > cortes[-1]:
+                    cortes.append(file.tell())
+            cortes.append(tamano)
+        fragmentos += [(ruta, cabecera, inicio, fin) for inicio, fin in zip(cortes, cortes[1:]) if fin > inicio]
+    # Los más grandes primero, para que el último en acabar no sea uno grande que empezó tarde
+    fragmentos.sort(key=lambda fragmento: fragmento[3] - fragmento[2], reverse=True)
+    return fragmentos
+
+
+def procesar_fragmento(fragmento):
+    """
+    Lee un fragmento del registro y lo deja listo para fusionar: normaliza los códigos, se
+    queda con los centros pedidos, los cruza con los bilingües y compensatorios y calcula
+    su distancia en línea recta al origen. Se ejecuta en los procesos de trabajo con el
+    contexto que reciben al arrancar (ver _iniciar_proceso).
+
+    Args:
+        fragmento (tuple): (ruta, encabezados en bytes, inicio, fin), de planificar_fragmentos
+
+    Returns:
+        dict: 'distancias' (metros, infinito si no hay coordenadas), 'codigos' y 'lineas' (filas
+              ya escritas como CSV), los tres en orden de distancia y código; 'leidas',
+              'bilingues' y 'compensatorios'
+    """
+    ruta, cabecera, inicio, fin = fragmento
+    with open(ruta, mode="rb") as file:
+        file.seek(inicio)
+        datos = file.read(fin - inicio)
+    tabla = leer_columnas(io.BytesIO(cabecera + datos), COLUMNAS_REGISTRO)
+    leidas = len(tabla)
+
+    codigos = normalizar_codigos(tabla["codigo"])
+    if _CONTEXTO["codigos"] is not None:
+        seleccion = codigos.isin(_CONTEXTO["codigos"]).to_numpy()
+        tabla, codigos = tabla[seleccion], codigos[seleccion]
+
+    sin_coordenadas = np.full(len(tabla), np.nan)
+    latitudes = parsear_decimales(tabla["N_LATITUD"]) if "N_LATITUD" in tabla else sin_coordenadas
+    longitudes = parsear_decimales(tabla["N_LONGITUD"]) if "N_LONGITUD" in tabla else sin_coordenadas
+    origen = _CONTEXTO["origen"]
+    if origen is not None:
+        distancias = distancias_haversine_km(origen[0], origen[1], latitudes, longitudes)
+    else:
+        distancias = sin_coordenadas
+    # Metros enteros, como el resto de distancias; sin dato se ordenan al final
+    distancias_m = np.where(np.isnan(distancias), np.inf, np.round(distancias * 1000))
+
+    orden = np.lexsort((codigos.to_numpy(dtype=str), distancias_m))
+    codigos = codigos.to_numpy(dtype=object)[orden].tolist()
+    distancias_m = distancias_m[orden]
+
+    def columna(nombre):
+        return tabla[nombre].to_numpy(dtype=object)[orden].tolist() if nombre in tabla else [""] * len(orden)
+
+    def coordenada(valores):
+        return ["" if valor != valor else repr(valor) for valor in valores[orden].tolist()]
+
+    etapas = [_CONTEXTO["bilingues"].get(codigo) for codigo in codigos]
+    compensatorios = [codigo in _CONTEXTO["compensatorios"] for codigo in codigos]
+    columnas = [
+        codigos, columna("D_ESPECIFICA"), columna("D_DENOMINA"), columna("D_TIPO"), columna("D_DOMICILIO"),
+        columna("D_LOCALIDAD"), columna("D_MUNICIPIO"), columna("D_PROVINCIA"), columna("C_POSTAL"),
+        coordenada(latitudes), coordenada(longitudes),
+        ["Empty" if etapa is None else "Es bilingüe" for etapa in etapas],
+        ["Es compensatorio" if compensatorio else "Empty" for compensatorio in compensatorios],
+        ["" if distancia == np.inf else formatear_distancia(int(distancia)) for distancia in distancias_m.tolist()],
+    ] + [[(etapa or {}).get(nombre, "") for etapa in etapas] for nombre in ETAPAS_BILINGUES]
+
+    # Las filas se devuelven ya escritas como CSV: el proceso principal sólo tiene que intercalarlas.
+    # Ningún campo trae saltos de línea (ver planificar_fragmentos), así que cada fila es una línea
+    texto = io.StringIO()
+    csv.writer(texto, lineterminator="\r\n").writerows(zip(*columnas))
+    lineas = texto.getvalue().split("\r\n")[:-1]
+    return {"distancias": distancias_m.tolist(), "codigos": codigos, "lineas": lineas, "leidas": leidas,
+            "bilingues": sum(etapa is not None for etapa in etapas), "compensatorios": sum(compensatorios)}
+
+
+def procesar_registros_fragmentados(rutas, csv_salida, direccion_origen=None, csv_codigos=None, csv_bilingues=None,
+                                    csv_compensatorios=None, procesos=None):
+    """
+    Procesa registros de centros de varias comunidades repartiendo el trabajo entre procesos.
+
+    Los ficheros se parten en fragmentos (planificar_fragmentos) y cada proceso lee el suyo,
+    normaliza los códigos, lo cruza con los bilingües y compensatorios y calcula la distancia
+    en línea recta, sin compartir nada con los demás, así que el tiempo baja casi en
+    proporción a los núcleos. Cada fragmento vuelve ordenado por distancia y código; el
+    proceso principal los fusiona con heapq.merge, sin reordenar el conjunto, y escribe el
+    resultado conforme sale de la fusión. El trayecto por carretera no se calcula aquí: lo
+    limitan las peticiones al motor, no la CPU.
+
+    Args:
+        rutas (list): Ficheros del registro con el formato de da_centros.csv (iso-8859-1, ';')
+        csv_salida (str): Ruta del CSV del registro enriquecido (se sustituye de una vez)
+        direccion_origen (str, optional): Dirección desde la que se mide la distancia en línea recta;
+                                          sin ella los centros se ordenan sólo por código
+        csv_codigos (str, optional): CSV con la columna 'codigo' (centros_todos.csv); si se indica,
+                                     sólo se conservan esos centros, como en coincidencias
+        csv_bilingues (str, optional): Ruta a da_centros_bilingues.csv
+        csv_compensatorios (str, optional): Ruta a centros_compensatoria.csv
+        procesos (int, optional): Procesos de trabajo (por defecto, uno por núcleo)
+
+    Returns:
+        dict: Número de 'fragmentos', filas 'leidas', 'centros' escritos, 'bilingues' y 'compensatorios'
+    """
+    procesos = procesos or os.cpu_count() or 1
+    contexto = {
+        "codigos": None,
+        "bilingues": indexar_bilingues(csv_bilingues) if csv_bilingues else {},
+        "compensatorios": indexar_compensatorios(csv_compensatorios) if csv_compensatorios else {},
+        "origen": None,
+    }
+    if csv_codigos:
+        contexto["codigos"] = set(normalizar_codigos(leer_columnas(csv_codigos, ["codigo"], encoding='utf-8', delimitador=',')["codigo"]))
+    if direccion_origen:
+        lat_origen, lng_origen = obtener_coordenadas(direccion_origen)
+        if lat_origen is None:
+            print("No se pudo geocodificar el origen: los centros se ordenan por código.")
+        else:
+            contexto["origen"] = (lat_origen, lng_origen)
+
+    fragmentos = planificar_fragmentos(rutas, procesos)
+    print(f"{len(fragmentos)} fragmentos de {len(rutas)} ficheros en {procesos} procesos")
+    with medir_etapa("fragmentos"):
+        if procesos == 1:
+            _iniciar_proceso(contexto)
+            resultados = [procesar_fragmento(fragmento) for fragmento in fragmentos]
+        else:
+            with ProcessPoolExecutor(max_workers=min(procesos, len(fragmentos)) or 1, initializer=_iniciar_proceso,
+                                     initargs=(contexto,)) as pool:
+                resultados = list(pool.map(procesar_fragmento, fragmentos))
+
+    with medir_etapa("fusion"):
+        # Fusión de k listas ordenadas: O(n log k), y las filas se escriben según salen
+        fusion = heapq.merge(*(zip(resultado["distancias"], resultado["codigos"], resultado["lineas"]) for resultado in resultados))
+        centros = _escribir_lineas_atomico(csv_salida, ENCABEZADOS_REGISTRO_ENRIQUECIDO, (linea for _, _, linea in fusion))
+
+    resumen = {
+        "fragmentos": len(fragmentos),
+        "leidas": sum(resultado["leidas"] for resultado in resultados),
+        "centros": centros,
+        "bilingues": sum(resultado["bilingues"] for resultado in resultados),
+        "compensatorios": sum(resultado["compensatorios"] for resultado in resultados),
+    }
+    print(f"Se han exportado {centros} de {resumen['leidas']} centros a '{csv_salida}' "
+          f"({resumen['bilingues']} bilingües, {resumen['compensatorios']} compensatorios).")
+    return resumen
+
+
+def _iniciar_proceso(contexto):
+    # Cada proceso de trabajo recibe una vez los índices comunes, no con cada fragmento
+    _CONTEXTO.clear()
+    _CONTEXTO.update(contexto)
+
+
+def _escribir_lineas_atomico(nombre_csv, headers, lineas):
+    # Como escribir_csv_atomico, pero con las filas ya escritas como líneas CSV que llegan de un generador
+    temporal = f"{nombre_csv}.tmp"
+    escritas = 0
+    with open(temporal, mode='w', newline='', encoding='utf-8') as file:
+        csv.writer(file).writerow(headers)
+        for linea in lineas:
+            file.write(linea)
+            file.write("\r\n")
+            escritas += 1
+    os.replace(temporal, nombre_csv)
+    return escritas
@@ -0,0 +1,73 @@
+import numpy as np
+
+# Radio medio de la Tierra en km
+RADIO_TIERRA_KM = 6371.0088
+
+
+def parsear_decimales(valores):
+    """
+    Convierte de una vez una secuencia de números con coma decimal ("37,3861") a un array.
+
+    Args:
+        valores (list): Textos con coma (o punto) decimal; los vacíos o no numéricos quedan como NaN
+
+    Returns:
+        np.ndarray: Array float64 con los valores
+    """
+    textos = np.asarray(valores, dtype=str)
+    textos = np.char.replace(np.char.strip(textos), ",", ".")
+    resultado = np.full(textos.shape, np.nan)
+    validos = textos != ""
+    try:
+        resultado[validos] = textos[validos].astype(np.float64)
+    except ValueError:
+        # Algún valor no es numérico: se convierten uno a uno y los erróneos quedan como NaN
+        for posicion in np.flatnonzero(validos):
+            try:
+                resultado[posicion] = float(textos[posicion])
+            except ValueError:
+                pass
+    return resultado
+
+
+def distancias_haversine_km(lat_origen, lng_origen, latitudes, longitudes):
+    """
+    Calcula la distancia en línea recta (ortodrómica) desde un origen a todos los puntos a la vez.
+
+    Args:
+        lat_origen (float): Latitud del origen en grados
+        lng_origen (float): Longitud del origen en grados
+        latitudes (np.ndarray): Latitudes de los destinos en grados
+        longitudes (np.ndarray): Longitudes de los destinos en grados
+
+    Returns:
+        np.ndarray: Distancias en km (NaN para los destinos sin coordenadas)
+    """
+    lat1 = np.radians(lat_origen)
+    lat2 = np.radians(np.asarray(latitudes, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlng = np.radians(np.asarray(longitudes, dtype=np.float64) - lng_origen)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def seleccionar_cercanos(distancias_km, radio_km=None, top_k=None):
+    """
+    Selecciona los puntos a menos de un radio y/o los K más cercanos.
+
+    Args:
+        distancias_km (np.ndarray): Distancia de cada punto al origen (NaN si se desconoce)
+        radio_km (float, optional): Distancia máxima
+        top_k (int, optional): Número máximo de puntos a devolver
+
+    Returns:
+        np.ndarray: Posiciones de los puntos seleccionados, ordenadas de menor a mayor distancia
+    """
+    distancias_km = np.asarray(distancias_km, dtype=np.float64)
+    candidatos = np.flatnonzero(~np.isnan(distancias_km))
+    if radio_km is not None:
+        candidatos = candidatos[distancias_km[candidatos] <= radio_km]
+    if top_k is not None and top_k < len(candidatos):
+        # argpartition separa los K menores en O(n) sin ordenar el resto
+        candidatos = candidatos[np.argpartition(distancias_km[candidatos], top_k - 1)[:top_k]]
+    return candidatos[np.argsort(distancias_km[candidatos], kind="stable")]
@@ -1,17 +1,25 @@
 # Geocodificación del Origen (si el usuario introduce una dirección): 
 # Utiliza la API de geocodificación de Google Maps para convertir la dirección del usuario en coordenadas. 
 # Esta conversión es necesaria si el usuario introduce una dirección en lugar de coordenadas.
+#
+# Las consultas las resuelve el motor de trayectos configurado (ver services/enrutamiento.py):
+# Google Maps por defecto, el servidor falso local o el estimador sin red.
 
-import googlemaps
-import googlemaps.distance_matrix
-import googlemaps.geocoding
-from dotenv import load_dotenv
 import os
+import time
 
-# Cargar las variables de entorno desde el archivo .env
-load_dotenv()
+from services.cache_rutas import CacheRutas, obtener_cache
+from services.ejecutor_distancias import EjecutorDistancias, ErrorTransitorio
+from services.enrutamiento import MAX_ORIGENES_POR_PETICION, obtener_motor, parsear_coordenadas
+from services.metricas import registrar_peticion_rutas
 
-GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
+# Concurrencia y cuota por defecto del cálculo de distancias por lotes
+MAX_HILOS = int(os.getenv("DISTANCIAS_MAX_HILOS", 8))
+PETICIONES_POR_SEGUNDO = float(os.getenv("DISTANCIAS_PETICIONES_POR_SEGUNDO", 10))
+MAX_REINTENTOS = int(os.getenv("DISTANCIAS_MAX_REINTENTOS", 5))
+
+# Estados de elemento que no cambian al repetir la consulta y por tanto se guardan en caché
+ESTADOS_DEFINITIVOS = ("OK", "NOT_FOUND", "ZERO_RESULTS")
 
 
 def obtener_coordenadas(direccion_usuario: str) -> tuple:
@@ -27,19 +35,34 @@ def obtener_coordenadas(direccion_usuario: str) -> tuple:
     Raises:
         Exception: Si hay error en la comunicación con la API de Google Maps
     """
+    # Un origen dado como "lat,lng" no necesita geocodificarse
+    coordenadas = parsear_coordenadas(direccion_usuario)
+    if coordenadas:
+        return coordenadas
+
+    # Las direcciones ya geocodificadas se sirven desde la caché persistente
+    motor = obtener_motor()
+    cache = obtener_cache()
+    clave = CacheRutas.clave_geocodigo(direccion_usuario, motor.espacio_geocodigo)
+    coordenadas = cache.obtener(clave)
+    if coordenadas:
+        return tuple(coordenadas)
+
     try:
-        # Inicializar cliente de Google Maps con la clave API
-        gmaps = googlemaps.Client(GOOGLE_MAPS_API_KEY)
-        
-        # Geocodificar la dirección para obtener coordenadas
-        geocode_result = googlemaps.geocoding.geocode(gmaps, direccion_usuario)
+        # Geocodificar la dirección con el motor configurado
+        inicio = time.perf_counter()
+        try:
+            coordenadas = motor.geocodificar(direccion_usuario)
+        except Exception:
+            registrar_peticion_rutas(motor.modo, "geocodigo", "ERROR", time.perf_counter() - inicio)
+            raise
+        registrar_peticion_rutas(motor.modo, "geocodigo", "OK" if coordenadas else "ZERO_RESULTS", time.perf_counter() - inicio)
         
-        if geocode_result:
-            # Extraer coordenadas del primer resultado
-            # Google Maps puede devolver múltiples resultados, tomamos el primero
-            lat = geocode_result[0]['geometry']['location']['lat']
-            lng = geocode_result[0]['geometry']['location']['lng']
+        if coordenadas:
+            lat, lng = coordenadas
             print(f"Coordenadas obtenidas: {lat}, {lng}")
+            if motor.cachear:
+                cache.guardar(clave, [lat, lng])
             return lat, lng
         else:
             print("No se pudieron obtener coordenadas para la dirección proporcionada.")
@@ -51,7 +74,7 @@ def obtener_coordenadas(direccion_usuario: str) -> tuple:
 
 def calcular_distancias(direccion_origen: str, direccion_destino: str) -> dict:
     """
-    Calcula la distancia y tiempo de viaje entre dos direcciones usando Google Maps.
+    Calcula la distancia y tiempo de viaje entre dos direcciones con el motor de trayectos configurado.
     
     Args:
         direccion_origen (str): Dirección del punto de partida
@@ -68,37 +91,25 @@ def calcular_distancias(direccion_origen: str, direccion_destino: str) -> dict:
             "duracion": "15 mins"
         }
     """
+    # Los trayectos ya calculados se sirven desde la caché persistente
+    motor = obtener_motor()
+    cache = obtener_cache()
+    clave = CacheRutas.clave_ruta(direccion_origen, direccion_destino, motor.modo)
+    resultado = cache.obtener(clave) if motor.cachear else None
+    if resultado and resultado.get("estado") == "OK":
+        return {campo: valor for campo, valor in resultado.items() if campo != "estado"}
+
     try:
-        # Inicializar cliente de Google Maps
-        gmaps = googlemaps.Client(GOOGLE_MAPS_API_KEY)
-
-        # Consultar matriz de distancia
-        # mode="driving" indica cálculo para vehículos
-        # language="ES" obtiene resultados en español
-        result = googlemaps.distance_matrix.distance_matrix(
-            gmaps,
-            origins=direccion_origen, 
-            destinations=direccion_destino,
-            language="ES", 
-            mode="driving"
-        )
+        # Consultar el trayecto como un lote de un solo destino
+        resultado = consultar_lote_medido(motor, direccion_origen, [direccion_destino])[0]
         
         # Verificar si hay resultados válidos
-        if (result['rows'] and 
-            result['rows'][0]['elements'] and 
-            result['rows'][0]['elements'][0]['status'] == 'OK'):
-            
-            # Extraer datos del resultado
-            distancia_km = result['rows'][0]['elements'][0]['distance']['text']
-            distancia_value = result['rows'][0]['elements'][0]['distance']['value']
-            duracion = result['rows'][0]['elements'][0]['duration']['text']
+        if resultado["estado"] == "OK":
+            if motor.cachear:
+                cache.guardar(clave, resultado)
             
             # Retornar diccionario con los datos
-            return {
-                "distancia en Km": distancia_km,
-                "distancia en m": distancia_value,
-                "duracion": duracion
-            }
+            return {campo: valor for campo, valor in resultado.items() if campo != "estado"}
         else:
             print("No se pudo calcular la distancia para las direcciones proporcionadas.")
     except Exception as e:
@@ -107,6 +118,191 @@ def calcular_distancias(direccion_origen: str, direccion_destino: str) -> dict:
     return {}
 
 
+def calcular_distancias_lote(direccion_origen: str, direcciones_destino: list, max_hilos: int = MAX_HILOS,
+                             peticiones_por_segundo: float = PETICIONES_POR_SEGUNDO,
+                             max_reintentos: int = MAX_REINTENTOS, progreso=None, cancelado=None) -> list:
+    """
+    Calcula la distancia y tiempo de viaje desde un origen a muchos destinos agrupando
+    los destinos en el menor número posible de peticiones al motor de trayectos.
+    Las peticiones se lanzan en paralelo, limitadas en tasa y con reintentos (ver EjecutorDistancias).
+
+    Args:
+        direccion_origen (str): Dirección del punto de partida
+        direcciones_destino (list): Direcciones (o pares (lat, lng)) de los puntos de llegada
+        max_hilos (int): Número máximo de peticiones simultáneas
+        peticiones_por_segundo (float): Tasa máxima de peticiones
+        max_reintentos (int): Reintentos por lote ante errores transitorios
+        progreso (callable, optional): Función (completados, total) para informar del avance
+        cancelado (threading.Event, optional): Si se activa, no se envían más peticiones
+
+    Returns:
+        list: Un diccionario por destino, en el mismo orden. Todos llevan la clave "estado"
+              ("OK" o el código de error del elemento o de la petición); los correctos llevan
+              además las mismas claves que devuelve calcular_distancias.
+
+    Ejemplo de retorno:
+        [
+            {"estado": "OK", "distancia en Km": "10 km", "distancia en m": 10000, "duracion": "15 mins", "duracion en s": 900},
+            {"estado": "NOT_FOUND"}
+        ]
+    """
+    # Sólo se consultan al motor los destinos que no están en la caché persistente
+    motor = obtener_motor()
+    cache = obtener_cache()
+    claves = [CacheRutas.clave_ruta(direccion_origen, destino, motor.modo) for destino in direcciones_destino]
+    en_cache = cache.obtener_varios(claves) if motor.cachear else {}
+    pendientes = [posicion for posicion, clave in enumerate(claves) if clave not in en_cache]
+
+    # Los motores sin límite por petición reciben todos los destinos en un solo lote
+    tam_lote = motor.destinos_por_peticion or max(1, len(pendientes))
+    posiciones_lotes = [pendientes[inicio:inicio + tam_lote] for inicio in range(0, len(pendientes), tam_lote)]
+    lotes = [[direcciones_destino[posicion] for posicion in posiciones] for posiciones in posiciones_lotes]
+
+    def guardar_lote(numero_lote, resultados_lote):
+        if not motor.cachear:
+            return
+        # Cada lote se guarda en cuanto llega: si la ejecución se interrumpe no se pierde lo ya pagado
+        cache.guardar_varios({
+            claves[posicion]: resultado
+            for posicion, resultado in zip(posiciones_lotes[numero_lote], resultados_lote)
+            if resultado["estado"] in ESTADOS_DEFINITIVOS
+        })
+
+    ejecutor = EjecutorDistancias(
+        lambda lote: consultar_lote_medido(motor, direccion_origen, lote),
+        max_hilos=max_hilos,
+        peticiones_por_segundo=peticiones_por_segundo,
+        max_reintentos=max_reintentos,
+        progreso=progreso,
+        cancelado=cancelado,
+    )
+    calculados = {}
+    for posiciones, resultados_lote in zip(posiciones_lotes, ejecutor.ejecutar(lotes, guardar_lote)):
+        calculados.update(zip(posiciones, resultados_lote))
+
+    return [calculados[posicion] if posicion in calculados else en_cache[clave] for posicion, clave in enumerate(claves)]
+
+
+def calcular_matriz_lote(origenes: list, destinos: list, max_hilos: int = MAX_HILOS,
+                         peticiones_por_segundo: float = PETICIONES_POR_SEGUNDO,
+                         max_reintentos: int = MAX_REINTENTOS, progreso=None, cancelado=None) -> list:
+    """
+    Calcula los trayectos de varios orígenes a muchos destinos. La matriz se trocea en bloques
+    de orígenes × destinos que caben en una petición al motor (4 × 25 con Google) y sólo se
+    consultan los pares que no están en la caché persistente, que comparte con calcular_distancias_lote.
+
+    Args:
+        origenes (list): Direcciones (o pares (lat, lng)) de los puntos de partida
+        destinos (list): Direcciones (o pares (lat, lng)) de los puntos de llegada
+        max_hilos (int): Número máximo de peticiones simultáneas
+        peticiones_por_segundo (float): Tasa máxima de peticiones
+        max_reintentos (int): Reintentos por bloque ante errores transitorios
+        progreso (callable, optional): Función (completados, total) para informar del avance
+        cancelado (threading.Event, optional): Si se activa, no se envían más peticiones
+
+    Returns:
+        list: Por cada origen, la lista de resultados de sus destinos en el mismo orden,
+              con el formato de calcular_distancias_lote
+    """
+    motor = obtener_motor()
+    cache = obtener_cache()
+    claves = {(fila, columna): CacheRutas.clave_ruta(origen, destino, motor.modo)
+              for fila, origen in enumerate(origenes) for columna, destino in enumerate(destinos)}
+    en_cache = cache.obtener_varios(list(claves.values())) if motor.cachear else {}
+
+    # Bloques con tantos destinos como admite una petición y los orígenes que quepan con ellos
+    tam_destinos = motor.destinos_por_peticion or max(1, len(destinos))
+    if motor.elementos_por_peticion:
+        tam_origenes = max(1, min(MAX_ORIGENES_POR_PETICION, motor.elementos_por_peticion // tam_destinos))
+    else:
+        tam_origenes = max(1, len(origenes))
+    lotes = []
+    for inicio_filas in range(0, len(origenes), tam_origenes):
+        for inicio_columnas in range(0, len(destinos), tam_destinos):
+            lote = [(fila, columna)
+                    for fila in range(inicio_filas, min(inicio_filas + tam_origenes, len(origenes)))
+                    for columna in range(inicio_columnas, min(inicio_columnas + tam_destinos, len(destinos)))
+                    if claves[fila, columna] not in en_cache]
+            if lote:
+                lotes.append(lote)
+
+    def consultar_bloque(pares):
+        # Los reintentos pueden pedir sólo parte del bloque: se consulta el rectángulo que la cubre
+        filas = sorted({fila for fila, _ in pares})
+        columnas = sorted({columna for _, columna in pares})
+        respuesta = consultar_matriz_medida(motor, [origenes[fila] for fila in filas],
+                                            [destinos[columna] for columna in columnas])
+        fila_de = {fila: posicion for posicion, fila in enumerate(filas)}
+        columna_de = {columna: posicion for posicion, columna in enumerate(columnas)}
+        return [respuesta[fila_de[fila]][columna_de[columna]] for fila, columna in pares]
+
+    def guardar_lote(numero_lote, resultados_lote):
+        if not motor.cachear:
+            return
+        cache.guardar_varios({
+            claves[par]: resultado
+            for par, resultado in zip(lotes[numero_lote], resultados_lote)
+            if resultado["estado"] in ESTADOS_DEFINITIVOS
+        })
+
+    ejecutor = EjecutorDistancias(
+        consultar_bloque,
+        max_hilos=max_hilos,
+        peticiones_por_segundo=peticiones_por_segundo,
+        max_reintentos=max_reintentos,
+        progreso=progreso,
+        cancelado=cancelado,
+    )
+    calculados = {}
+    for lote, resultados_lote in zip(lotes, ejecutor.ejecutar(lotes, guardar_lote)):
+        calculados.update(zip(lote, resultados_lote))
+
+    return [[calculados[fila, columna] if (fila, columna) in calculados else en_cache[claves[fila, columna]]
+             for columna in range(len(destinos))] for fila in range(len(origenes))]
+
+
+def consultar_lote_medido(motor, direccion_origen, destinos):
+    """
+    Consulta un lote al motor de trayectos anotando la petición en las métricas
+    (número de peticiones por resultado, latencia y estado de cada destino).
+
+    Args:
+        motor (MotorRutas): Motor de trayectos
+        direccion_origen (str): Dirección del punto de partida
+        destinos (list): Destinos del lote
+
+    Returns:
+        list: Resultados del motor, uno por destino
+    """
+    return consultar_matriz_medida(motor, [direccion_origen], destinos)[0]
+
+
+def consultar_matriz_medida(motor, origenes, destinos):
+    """
+    Igual que consultar_lote_medido, pero con varios orígenes en la misma petición.
+
+    Args:
+        motor (MotorRutas): Motor de trayectos
+        origenes (list): Puntos de partida
+        destinos (list): Destinos del bloque
+
+    Returns:
+        list: Por cada origen, los resultados del motor, uno por destino
+    """
+    inicio = time.perf_counter()
+    try:
+        resultados = motor.consultar_matriz(origenes, destinos)
+    except ErrorTransitorio as e:
+        registrar_peticion_rutas(motor.modo, "distancias", e.estado, time.perf_counter() - inicio)
+        raise
+    except Exception as e:
+        registrar_peticion_rutas(motor.modo, "distancias", getattr(e, "status", None) or "ERROR", time.perf_counter() - inicio)
+        raise
+    registrar_peticion_rutas(motor.modo, "distancias", "OK", time.perf_counter() - inicio,
+                             (resultado.get("estado") for fila in resultados for resultado in fila))
+    return resultados
+
+
 #-- PRUEBA DE LAS FUNCIONES --#
 
 """direccion_origen = "Calle Costa Rica 49, 18194, Churriana de la Vega, Granada"
@@ -0,0 +1,242 @@
+import csv
+import json
+import os
+import time
+
+from models.CentroCollection import CentroCollection
+from services.csv_service import ENCABEZADOS_EXPORTACION, cargar_csv_centros, escribir_csv_atomico
+from services.enriquecimiento import enriquecer_centros, normalizar_codigo
+from services.enrutamiento import obtener_motor
+
+# Columnas de coincidencias.csv que, si cambian, obligan a recalcular el trayecto
+CAMPOS_DIRECCION = ("D_DOMICILIO", "C_POSTAL", "D_MUNICIPIO", "D_PROVINCIA", "N_LATITUD", "N_LONGITUD")
+
+# Columnas descriptivas y su columna en la exportación: se corrigen sin recalcular nada
+CAMPOS_DESCRIPTIVOS = {
+    "D_DENOMINA": "Tipo Centro",
+    "D_ESPECIFICA": "Nombre Centro",
+    "D_TIPO": "Público/Privado",
+}
+
+
+def leer_coincidencias(csv_coincidencias):
+    """
+    Lee un CSV con el formato de coincidencias.csv indexado por código de centro.
+
+    Args:
+        csv_coincidencias (str): Ruta al CSV (utf-8, delimitador ',')
+
+    Returns:
+        tuple: (encabezados, dict código normalizado -> fila)
+    """
+    with open(csv_coincidencias, mode='r', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
+        filas = {normalizar_codigo(row["codigo"]): row for row in reader}
+        return list(reader.fieldnames or []), filas
+
+
+def comparar_ediciones(anteriores, nuevas, pendientes=()):
+    """
+    Compara dos ediciones del registro de centros por código.
+
+    Args:
+        anteriores (dict): Código -> fila de la edición ya procesada
+        nuevas (dict): Código -> fila de la edición nueva
+        pendientes (iterable): Códigos cuyo trayecto falló en la edición ya procesada
+
+    Returns:
+        dict: Listas de códigos 'anadidos', 'eliminados', 'direccion_cambiada' (hay que
+              recalcular el trayecto), 'reintentados' (pendientes que siguen igual: se vuelve a
+              pedir su trayecto) y 'datos_cambiados' (sólo cambian nombre, tipo o titularidad)
+    """
+    pendientes = set(pendientes)
+    cambios = {"anadidos": [], "eliminados": [], "direccion_cambiada": [], "reintentados": [], "datos_cambiados": []}
+    for codigo, fila in nuevas.items():
+        anterior = anteriores.get(codigo)
+        if anterior is None:
+            cambios["anadidos"].append(codigo)
+        elif _distintos(anterior, fila, CAMPOS_DIRECCION):
+            cambios["direccion_cambiada"].append(codigo)
+        elif codigo in pendientes:
+            cambios["reintentados"].append(codigo)
+        elif _distintos(anterior, fila, CAMPOS_DESCRIPTIVOS):
+            cambios["datos_cambiados"].append(codigo)
+    cambios["eliminados"] = [codigo for codigo in anteriores if codigo not in nuevas]
+    return cambios
+
+
+def guardar_instantanea(csv_coincidencias, csv_instantanea, origen, radio_km=None, top_k=None, pendientes=(), duraciones=None):
+    """
+    Guarda las coincidencias con las que se acaba de calcular la exportación, para que la
+    siguiente actualización incremental sepa qué ha cambiado.
+
+    Args:
+        csv_coincidencias (str): Coincidencias usadas en el cálculo
+        csv_instantanea (str): Ruta donde guardar la copia
+        origen (str): Dirección de origen de los trayectos
+        radio_km (float, optional): Radio del prefiltro en línea recta usado
+        top_k (int, optional): Número de centros del prefiltro usado
+        pendientes (iterable): Códigos cuyo trayecto falló, que se reintentan la próxima vez
+        duraciones (dict, optional): Código -> duración en segundos de cada centro exportado, con la
+                                     que la actualización incremental ordena sin releer los textos
+    """
+    encabezados, filas = leer_coincidencias(csv_coincidencias)
+    escribir_csv_atomico(csv_instantanea, encabezados, filas.values())
+    metadatos = {"origen": origen, "motor": obtener_motor().modo, "radio_km": radio_km, "top_k": top_k,
+                 "pendientes": sorted(set(pendientes)), "duraciones": duraciones or {}}
+    _escribir_json_atomico(_ruta_metadatos(csv_instantanea), metadatos)
+
+
+def actualizar_incremental(csv_coincidencias, csv_instantanea, csv_exportado, csv_bilingues=None,
+                           csv_compensatorios=None, csv_informe=None, **opciones):
+    """
+    Actualiza la exportación con una edición nueva del registro recalculando sólo lo que cambia.
+
+    Compara las coincidencias nuevas con la instantánea de la última exportación, calcula el
+    trayecto de los centros añadidos, con otra dirección o que se quedaron sin él, quita los eliminados, corrige los
+    datos descriptivos del resto y sustituye la exportación de una vez. Después guarda la
+    instantánea nueva y, si se indica, un informe JSON con los cambios.
+
+    Args:
+        csv_coincidencias (str): Coincidencias de la edición nueva
+        csv_instantanea (str): Instantánea guardada por guardar_instantanea
+        csv_exportado (str): Exportación a actualizar
+        csv_bilingues (str, optional): Ruta a da_centros_bilingues.csv
+        csv_compensatorios (str, optional): Ruta a centros_compensatoria.csv
+        csv_informe (str, optional): Ruta del informe de cambios
+        **opciones: Opciones del cálculo de distancias (max_hilos, progreso...)
+
+    Returns:
+        dict: Informe de cambios
+
+    Raises:
+        FileNotFoundError: Si no hay instantánea (hay que hacer antes una exportación completa)
+        ValueError: Si la exportación se hizo con otro motor de trayectos, con top_k o con una
+                    versión anterior que no guardaba las duraciones
+    """
+    inicio = time.perf_counter()
+    if not os.path.exists(csv_instantanea):
+        raise FileNotFoundError(f"No existe la instantánea '{csv_instantanea}': ejecuta antes una exportación completa")
+    with open(_ruta_metadatos(csv_instantanea), mode='r', encoding='utf-8') as file:
+        metadatos = json.load(file)
+    if metadatos["motor"] != obtener_motor().modo:
+        raise ValueError(f"La exportación se calculó con el motor '{metadatos['motor']}': hay que rehacerla completa")
+    if metadatos["top_k"] is not None:
+        # Los K más cercanos dependen de todos los centros: no se pueden recalcular por separado
+        raise ValueError("La exportación se calculó con top_k: hay que rehacerla completa")
+    if "duraciones" not in metadatos:
+        raise ValueError("La instantánea no guarda las duraciones de los trayectos: hay que rehacer la exportación completa")
+
+    _, anteriores = leer_coincidencias(csv_instantanea)
+    _, nuevas = leer_coincidencias(csv_coincidencias)
+    cambios = comparar_ediciones(anteriores, nuevas, metadatos["pendientes"])
+    a_calcular = set(cambios["anadidos"]) | set(cambios["direccion_cambiada"]) | set(cambios["reintentados"])
+    print(f"Cambios: {len(cambios['anadidos'])} añadidos, {len(cambios['eliminados'])} eliminados, "
+          f"{len(cambios['direccion_cambiada'])} con otra dirección, {len(cambios['reintentados'])} sin trayecto la última vez, "
+          f"{len(cambios['datos_cambiados'])} con otros datos")
+
+    fallidos = []
+    centros = cargar_csv_centros(csv_coincidencias, metadatos["origen"], fallidos=fallidos,
+                                 radio_km=metadatos["radio_km"], codigos=a_calcular, **opciones)
+    enriquecer_centros(centros, csv_bilingues, csv_compensatorios)
+    recalculadas = {normalizar_codigo(fila["Código Centro"]): fila
+                    for fila in CentroCollection.desde_centros(centros).filas_exportacion()}
+
+    # Parche de la exportación: se conservan las filas que no cambian
+    with open(csv_exportado, mode='r', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
+        encabezados = list(reader.fieldnames)
+        existentes = list(reader)
+    for encabezado in ENCABEZADOS_EXPORTACION:
+        if encabezado not in encabezados:
+            encabezados.append(encabezado)
+
+    descartar = a_calcular | set(cambios["eliminados"])
+    duraciones_anteriores = {}
+    filas = []
+    for fila in existentes:
+        codigo = normalizar_codigo(fila["Código Centro"])
+        if codigo in descartar:
+            duraciones_anteriores[codigo] = fila.get("Duración", "")
+            continue
+        if codigo in nuevas:
+            for campo, columna in CAMPOS_DESCRIPTIVOS.items():
+                fila[columna] = nuevas[codigo][campo]
+        filas.append(fila)
+    filas.extend(recalculadas.values())
+    # Mismo orden que la exportación completa: por la duración en segundos, con los desconocidos al final
+    duraciones = {codigo: segundos for codigo, segundos in metadatos["duraciones"].items() if codigo not in descartar}
+    duraciones.update(duraciones_centros(centros))
+    filas.sort(key=lambda fila: duraciones.get(normalizar_codigo(fila["Código Centro"]), float('inf')))
+    escribir_csv_atomico(csv_exportado, encabezados, filas)
+
+    codigos_fallidos = {normalizar_codigo(centro.codigo_centro) for centro, _ in fallidos}
+    guardar_instantanea(csv_coincidencias, csv_instantanea, metadatos["origen"], metadatos["radio_km"],
+                        pendientes=codigos_fallidos, duraciones=duraciones)
+
+    informe = {
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "origen": metadatos["origen"],
+        "motor": metadatos["motor"],
+        "centros": len(filas),
+        "trayectos_recalculados": len(a_calcular),
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "anadidos": [_resumen(nuevas[codigo], recalculadas.get(codigo)) for codigo in cambios["anadidos"]],
+        "eliminados": [_resumen(anteriores[codigo], duracion_anterior=duraciones_anteriores.get(codigo))
+                       for codigo in cambios["eliminados"]],
+        "direccion_cambiada": [_resumen(nuevas[codigo], recalculadas.get(codigo), duraciones_anteriores.get(codigo),
+                                        anteriores[codigo]) for codigo in cambios["direccion_cambiada"]],
+        "reintentados": [_resumen(nuevas[codigo], recalculadas.get(codigo)) for codigo in cambios["reintentados"]],
+        "datos_cambiados": [_resumen(nuevas[codigo], anterior=anteriores[codigo]) for codigo in cambios["datos_cambiados"]],
+        "sin_trayecto": [{"codigo": normalizar_codigo(centro.codigo_centro), "estado": estado} for centro, estado in fallidos],
+    }
+    if csv_informe:
+        _escribir_json_atomico(csv_informe, informe)
+    print(f"Exportación actualizada: {len(filas)} centros, {len(a_calcular)} trayectos recalculados en {informe['segundos']} s.")
+    return informe
+
+
+def duraciones_centros(centros):
+    """
+    Duración en segundos del trayecto de cada centro, para guardar_instantanea.
+
+    Args:
+        centros (list): Objetos CentroEducativo ya calculados
+
+    Returns:
+        dict: Código normalizado -> segundos (sólo los centros con trayecto)
+    """
+    return {normalizar_codigo(centro.codigo_centro): centro.duracion_s for centro in centros if centro.duracion_s is not None}
+
+
+def _distintos(anterior, nueva, campos):
+    return any((anterior.get(campo) or "").strip() != (nueva.get(campo) or "").strip() for campo in campos)
+
+
+def _resumen(fila, exportada=None, duracion_anterior=None, anterior=None):
+    # Entrada del informe de cambios para un centro
+    resumen = {
+        "codigo": normalizar_codigo(fila["codigo"]),
+        "nombre": f"{fila.get('D_DENOMINA', '')} {fila.get('D_ESPECIFICA', '')}".strip(),
+        "municipio": fila.get("D_MUNICIPIO", ""),
+    }
+    if anterior is not None:
+        resumen["antes"] = {campo: anterior.get(campo, "") for campo in (*CAMPOS_DIRECCION, *CAMPOS_DESCRIPTIVOS)
+                            if anterior.get(campo, "") != fila.get(campo, "")}
+        resumen["despues"] = {campo: fila.get(campo, "") for campo in resumen["antes"]}
+    if duracion_anterior is not None:
+        resumen["duracion_anterior"] = duracion_anterior
+    if exportada is not None:
+        resumen["duracion"] = exportada["Duración"]
+    return resumen
+
+
+def _ruta_metadatos(csv_instantanea):
+    return f"{os.path.splitext(csv_instantanea)[0]}.json"
+
+
+def _escribir_json_atomico(ruta, datos):
+    temporal = f"{ruta}.tmp"
+    with open(temporal, mode='w', encoding='utf-8') as file:
+        json.dump(datos, file, ensure_ascii=False, indent=2)
+    os.replace(temporal, ruta)
@@ -0,0 +1,310 @@
+import heapq
+import unicodedata
+
+import numpy as np
+
+from services.unidades import distancia_a_metros, duracion_a_segundos
+
+# Parámetro de la API -> columna del CSV exportado sobre la que se filtra
+COLUMNAS_FILTRO = {
+    "municipio": "Municipio",
+    "provincia": "Provincia",
+    "compensatorio": "Centro Compensatorio",
+    "idiomas": "Idiomas",
+    "tipo": "Tipo Centro",
+    "publico_privado": "Público/Privado",
+}
+
+# Claves de ordenación admitidas por la API
+ORDENACIONES = ("duracion", "distancia", "linea", "nombre")
+
+
+class IndiceCentros:
+    """
+    Índices invertidos y de ordenación sobre las filas del dataset de centros.
+
+    Se construye una sola vez por instantánea del dataset. Para cada columna filtrable guarda
+    el conjunto de posiciones de fila que tienen cada valor, de modo que una combinación de
+    filtros se resuelve intersecando conjuntos (empezando por el más pequeño) sin recorrer
+    todas las filas. Para cada clave de ordenación guarda el rango de cada fila, con lo que
+    ordenar un resultado sólo requiere comparar enteros.
+    """
+
+    def __init__(self, filas):
+        """
+        Args:
+            filas (list): Lista de diccionarios con los datos de cada centro
+        """
+        self.filas = filas
+        self.todas = frozenset(range(len(filas)))
+
+        # columna -> valor -> conjunto de posiciones de fila
+        self.invertido = {}
+        for columna in COLUMNAS_FILTRO.values():
+            valores = {}
+            for posicion, fila in enumerate(filas):
+                valores.setdefault(fila.get(columna, ""), set()).add(posicion)
+            self.invertido[columna] = {valor: frozenset(posiciones) for valor, posiciones in valores.items()}
+
+        # clave de ordenación -> rango de cada fila (posición que ocupa en el orden ascendente)
+        infinito = float('inf')
+        claves = {
+            "duracion": lambda i: _o_infinito(duracion_a_segundos(filas[i].get("Duración")), infinito),
+            "distancia": lambda i: _o_infinito(distancia_a_metros(filas[i].get("Distancia (Km)")), infinito),
+            "linea": lambda i: _o_infinito(distancia_a_metros(filas[i].get("Distancia en línea (Km)")), infinito),
+            "nombre": lambda i: _clave_texto(filas[i].get("Nombre Centro", "")),
+        }
+        self.rangos = {}
+        for orden, clave in claves.items():
+            permutacion = sorted(range(len(filas)), key=clave)
+            rango = [0] * len(filas)
+            for posicion_ordenada, posicion in enumerate(permutacion):
+                rango[posicion] = posicion_ordenada
+            self.rangos[orden] = rango
+
+    def filtrar(self, filtros, excluir=None):
+        """
+        Devuelve las posiciones de fila que cumplen todos los filtros.
+
+        Args:
+            filtros (dict): Parámetro de la API -> valor exacto buscado (los valores vacíos se ignoran)
+            excluir (str, optional): Parámetro a ignorar (se usa al calcular las facetas)
+
+        Returns:
+            frozenset: Posiciones de las filas que cumplen los filtros
+        """
+        conjuntos = []
+        for parametro, valor in filtros.items():
+            if not valor or parametro == excluir:
+                continue
+            columna = COLUMNAS_FILTRO[parametro]
+            conjuntos.append(self.invertido[columna].get(valor, frozenset()))
+
+        if not conjuntos:
+            return self.todas
+        # Intersecar empezando por el conjunto más pequeño minimiza el trabajo
+        conjuntos.sort(key=len)
+        resultado = conjuntos[0]
+        for conjunto in conjuntos[1:]:
+            if not resultado:
+                break
+            resultado = resultado.intersection(conjunto)
+        return resultado
+
+    def buscar(self, filtros, orden=None, descendente=False, limit=None, offset=0):
+        """
+        Filtra, ordena y pagina las filas del dataset.
+
+        Args:
+            filtros (dict): Parámetro de la API -> valor exacto buscado
+            orden (str, optional): 'duracion', 'distancia', 'linea' o 'nombre'. Sin orden se respeta el del fichero
+            descendente (bool): Invierte el orden
+            limit (int, optional): Número máximo de filas a devolver
+            offset (int): Número de filas a saltar
+
+        Returns:
+            tuple: (total de filas que cumplen los filtros, lista de filas de la página pedida)
+        """
+        posiciones = self.filtrar(filtros)
+        total = len(posiciones)
+        rango = self.rangos[orden] if orden else None
+        clave = rango.__getitem__ if rango else None
+
+        if limit is not None and offset + limit < total // 4:
+            # Para páginas pequeñas basta con seleccionar los primeros elementos con un montículo
+            seleccion = heapq.nlargest if descendente else heapq.nsmallest
+            pagina = seleccion(offset + limit, posiciones, key=clave)[offset:]
+        else:
+            pagina = sorted(posiciones, key=clave, reverse=descendente)
+            fin = None if limit is None else offset + limit
+            pagina = pagina[offset:fin]
+
+        return total, [self.filas[posicion] for posicion in pagina]
+
+    def iterar(self, filtros, orden=None, descendente=False):
+        """
+        Recorre las filas que cumplen los filtros en el orden pedido, sin copiarlas.
+
+        Sólo se ordenan las posiciones (enteros); cada fila se entrega al consumidor cuando la
+        pide, de modo que una exportación puede empezar a enviarse antes de terminar de recorrerlas.
+
+        Args:
+            filtros (dict): Parámetro de la API -> valor exacto buscado
+            orden (str, optional): 'duracion', 'distancia', 'linea' o 'nombre'. Sin orden se respeta el del fichero
+            descendente (bool): Invierte el orden
+
+        Yields:
+            dict: Fila del dataset
+        """
+        posiciones = self.filtrar(filtros)
+        rango = self.rangos[orden] if orden else None
+        for posicion in sorted(posiciones, key=rango.__getitem__ if rango else None, reverse=descendente):
+            yield self.filas[posicion]
+
+    def facetas(self, filtros):
+        """
+        Cuenta, para cada columna filtrable, cuántos centros hay de cada valor.
+
+        Los recuentos de una columna se calculan aplicando el resto de filtros pero no el de
+        esa misma columna, para que el desplegable siga ofreciendo las demás alternativas.
+
+        Args:
+            filtros (dict): Parámetro de la API -> valor exacto buscado
+
+        Returns:
+            dict: Columna -> {valor: número de centros}
+        """
+        resultado = {}
+        for parametro, columna in COLUMNAS_FILTRO.items():
+            posiciones = self.filtrar(filtros, excluir=parametro)
+            recuentos = {}
+            for valor, conjunto in self.invertido[columna].items():
+                # La intersección de conjuntos recorre siempre el más pequeño de los dos
+                cantidad = len(conjunto & posiciones)
+                if cantidad:
+                    recuentos[valor] = cantidad
+            resultado[columna] = dict(sorted(recuentos.items()))
+        return resultado
+
+
+def _o_infinito(valor, infinito):
+    # Los centros sin dato se colocan al final del orden ascendente
+    return infinito if valor is None else valor
+
+
+def _clave_texto(texto):
+    # Orden alfabético sin distinguir mayúsculas ni tildes ("Ángel" junto a "Angel")
+    descompuesto = unicodedata.normalize("NFKD", texto.casefold())
+    return "".join(caracter for caracter in descompuesto if not unicodedata.combining(caracter))
+
+
+class IndiceMapeado:
+    """
+    Los mismos índices que IndiceCentros, leídos de una instantánea binaria sin reconstruirlos.
+
+    Cada columna filtrable es un array de identificadores de la tabla de cadenas con sus listas
+    de posiciones por valor, y cada clave de ordenación un array con el rango de cada fila, así
+    que filtrar y ordenar son operaciones de NumPy sobre memoria compartida entre procesos.
+    """
+
+    def __init__(self, archivo, tabla, filas):
+        """
+        Args:
+            archivo (ArchivoMapeado): Instantánea escrita por InstantaneaCentros.guardar_binario
+            tabla (TablaCadenas): Tabla de cadenas de la instantánea
+            filas (FilasMapeadas): Filas del dataset
+        """
+        self.filas = filas
+        self.tabla = tabla
+        self.todas = np.arange(len(filas), dtype=np.int32)
+        self.columnas = {parametro: archivo.array(f"filtro.{parametro}") for parametro in COLUMNAS_FILTRO}
+        self.postings = {parametro: (archivo.array(f"filtro.{parametro}.valores"), archivo.array(f"filtro.{parametro}.inicios"),
+                                     archivo.array(f"filtro.{parametro}.posiciones"))
+                         for parametro in COLUMNAS_FILTRO}
+        self.rangos = {orden: archivo.array(f"rango.{orden}") for orden in ORDENACIONES}
+
+    @staticmethod
+    def secciones(indice, ids_filtro):
+        """
+        Secciones de la instantánea binaria con los índices de un IndiceCentros.
+
+        Args:
+            indice (IndiceCentros): Índices construidos sobre las filas
+            ids_filtro (dict): Parámetro de la API -> identificadores de su columna en la tabla de cadenas
+
+        Returns:
+            dict: Nombre de sección -> array
+        """
+        secciones = {}
+        for parametro, ids in ids_filtro.items():
+            # Posiciones agrupadas por valor y, dentro de cada valor, en el orden del fichero
+            posiciones = np.argsort(ids, kind="stable").astype(np.int32)
+            valores, recuentos = np.unique(ids, return_counts=True)
+            inicios = np.zeros(len(valores) + 1, dtype=np.int64)
+            np.cumsum(recuentos, out=inicios[1:])
+            secciones[f"filtro.{parametro}"] = ids
+            secciones[f"filtro.{parametro}.valores"] = valores.astype(np.int32)
+            secciones[f"filtro.{parametro}.inicios"] = inicios
+            secciones[f"filtro.{parametro}.posiciones"] = posiciones
+        for orden, rango in indice.rangos.items():
+            secciones[f"rango.{orden}"] = np.array(rango, dtype=np.int32)
+        return secciones
+
+    def _posiciones_valor(self, parametro, valor):
+        valores, inicios, posiciones = self.postings[parametro]
+        identificador = self.tabla.buscar(valor)
+        numero = int(np.searchsorted(valores, identificador))
+        if identificador < 0 or numero >= len(valores) or valores[numero] != identificador:
+            return posiciones[:0]
+        return posiciones[inicios[numero]:inicios[numero + 1]]
+
+    def filtrar(self, filtros, excluir=None):
+        """
+        Devuelve las posiciones de fila que cumplen todos los filtros, como IndiceCentros.filtrar.
+
+        Returns:
+            np.ndarray: Posiciones ordenadas de las filas que cumplen los filtros
+        """
+        activos = [(parametro, valor) for parametro, valor in filtros.items() if valor and parametro != excluir]
+        if not activos:
+            return self.todas
+        listas = sorted(((self._posiciones_valor(parametro, valor), parametro, valor) for parametro, valor in activos),
+                        key=lambda lista: len(lista[0]))
+        resultado = listas[0][0]
+        # La lista más corta se comprueba contra las columnas del resto de filtros
+        for _, parametro, valor in listas[1:]:
+            if not len(resultado):
+                break
+            resultado = resultado[self.columnas[parametro][resultado] == self.tabla.buscar(valor)]
+        return resultado
+
+    def _ordenar(self, posiciones, orden, descendente, cuantas=None):
+        # Posiciones en el orden pedido; con 'cuantas' sólo se ordenan las primeras
+        if orden is None:
+            return posiciones[::-1] if descendente else posiciones
+        clave = self.rangos[orden][posiciones].astype(np.int64)
+        if descendente:
+            clave = -clave
+        if cuantas is not None and cuantas < len(posiciones):
+            seleccion = np.argpartition(clave, cuantas - 1)[:cuantas]
+            posiciones, clave = posiciones[seleccion], clave[seleccion]
+        return posiciones[np.argsort(clave)]
+
+    def buscar(self, filtros, orden=None, descendente=False, limit=None, offset=0):
+        """
+        Filtra, ordena y pagina las filas del dataset, como IndiceCentros.buscar.
+
+        Returns:
+            tuple: (total de filas que cumplen los filtros, lista de filas de la página pedida)
+        """
+        posiciones = self.filtrar(filtros)
+        total = len(posiciones)
+        fin = None if limit is None else offset + limit
+        pagina = self._ordenar(posiciones, orden, descendente, fin)[offset:fin]
+        return total, [self.filas[posicion] for posicion in pagina.tolist()]
+
+    def iterar(self, filtros, orden=None, descendente=False):
+        """
+        Recorre las filas que cumplen los filtros en el orden pedido, como IndiceCentros.iterar.
+
+        Yields:
+            dict: Fila del dataset
+        """
+        for posicion in self._ordenar(self.filtrar(filtros), orden, descendente).tolist():
+            yield self.filas[posicion]
+
+    def facetas(self, filtros):
+        """
+        Cuenta, para cada columna filtrable, cuántos centros hay de cada valor, como IndiceCentros.facetas.
+
+        Returns:
+            dict: Columna -> {valor: número de centros}
+        """
+        resultado = {}
+        for parametro, columna in COLUMNAS_FILTRO.items():
+            posiciones = self.filtrar(filtros, excluir=parametro)
+            # La tabla de cadenas está ordenada: los identificadores salen ya en orden alfabético
+            identificadores, recuentos = np.unique(self.columnas[parametro][posiciones], return_counts=True)
+            resultado[columna] = {self.tabla[identificador]: int(cantidad)
+                                  for identificador, cantidad in zip(identificadores.tolist(), recuentos.tolist())}
+        return resultado
@@ -0,0 +1,144 @@
+import math
+
+import numpy as np
+
+from services.geo import RADIO_TIERRA_KM, distancias_haversine_km
+
+# Kilómetros por grado de latitud
+KM_POR_GRADO = math.pi * RADIO_TIERRA_KM / 180
+
+
+class IndiceEspacial:
+    """
+    Índice espacial de rejilla regular sobre latitud/longitud.
+
+    Los puntos se ordenan por celda (fila de latitud, columna de longitud) y se guarda dónde
+    empieza cada celda, al estilo de una matriz dispersa CSR. Como las celdas de una misma
+    fila son contiguas, las celdas que cubren un rectángulo se leen con un solo corte por
+    fila, y sólo los puntos de esos cortes se comparan con la distancia exacta.
+    El coste de una consulta depende del número de puntos cercanos, no del tamaño del registro.
+    """
+
+    def __init__(self, latitudes, longitudes, tam_celda_grados=0.05):
+        """
+        Args:
+            latitudes (np.ndarray): Latitud de cada punto en grados (NaN si se desconoce)
+            longitudes (np.ndarray): Longitud de cada punto en grados (NaN si se desconoce)
+            tam_celda_grados (float): Lado de la celda en grados (0,05º son unos 5 km)
+        """
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.tam_celda = tam_celda_grados
+
+        validos = np.flatnonzero(~(np.isnan(self.latitudes) | np.isnan(self.longitudes)))
+        if len(validos):
+            self.lat_min = float(self.latitudes[validos].min())
+            self.lng_min = float(self.longitudes[validos].min())
+            self.filas = int((self.latitudes[validos].max() - self.lat_min) // self.tam_celda) + 1
+            self.columnas = int((self.longitudes[validos].max() - self.lng_min) // self.tam_celda) + 1
+        else:
+            self.lat_min = self.lng_min = 0.0
+            self.filas = self.columnas = 1
+
+        fila = ((self.latitudes[validos] - self.lat_min) // self.tam_celda).astype(np.int64)
+        columna = ((self.longitudes[validos] - self.lng_min) // self.tam_celda).astype(np.int64)
+        celdas = fila * self.columnas + columna
+
+        orden = np.argsort(celdas, kind="stable")
+        # Posiciones de los puntos agrupadas por celda e inicio de cada celda en ese orden
+        self.puntos = validos[orden]
+        self.inicios = np.searchsorted(celdas[orden], np.arange(self.filas * self.columnas + 1))
+
+    def _candidatos_caja(self, lat_min, lng_min, lat_max, lng_max):
+        """
+        Devuelve las posiciones de los puntos de las celdas que tocan un rectángulo.
+        """
+        fila_ini = max(0, int((lat_min - self.lat_min) // self.tam_celda))
+        fila_fin = min(self.filas - 1, int((lat_max - self.lat_min) // self.tam_celda))
+        col_ini = max(0, int((lng_min - self.lng_min) // self.tam_celda))
+        col_fin = min(self.columnas - 1, int((lng_max - self.lng_min) // self.tam_celda))
+        if fila_ini > fila_fin or col_ini > col_fin:
+            return np.empty(0, dtype=np.int64)
+
+        cortes = []
+        for fila in range(fila_ini, fila_fin + 1):
+            base = fila * self.columnas
+            inicio, fin = self.inicios[base + col_ini], self.inicios[base + col_fin + 1]
+            if fin > inicio:
+                cortes.append(self.puntos[inicio:fin])
+        return np.concatenate(cortes) if cortes else np.empty(0, dtype=np.int64)
+
+    def en_caja(self, lat_min, lng_min, lat_max, lng_max, mascara=None):
+        """
+        Busca los puntos dentro de un rectángulo de coordenadas.
+
+        Args:
+            lat_min, lng_min, lat_max, lng_max (float): Esquinas del rectángulo en grados
+            mascara (np.ndarray, optional): Máscara booleana de los puntos admisibles
+
+        Returns:
+            np.ndarray: Posiciones de los puntos dentro del rectángulo
+        """
+        candidatos = self._candidatos_caja(lat_min, lng_min, lat_max, lng_max)
+        if mascara is not None:
+            candidatos = candidatos[mascara[candidatos]]
+        lats = self.latitudes[candidatos]
+        lngs = self.longitudes[candidatos]
+        dentro = (lats >= lat_min) & (lats <= lat_max) & (lngs >= lng_min) & (lngs <= lng_max)
+        return np.sort(candidatos[dentro])
+
+    def en_radio(self, lat, lng, radio_km, mascara=None):
+        """
+        Busca los puntos a menos de un radio, ordenados por distancia.
+
+        Args:
+            lat (float): Latitud del centro de búsqueda
+            lng (float): Longitud del centro de búsqueda
+            radio_km (float): Radio de búsqueda en km
+            mascara (np.ndarray, optional): Máscara booleana de los puntos admisibles
+
+        Returns:
+            tuple: (posiciones, distancias en km), ambas ordenadas de menor a mayor distancia
+        """
+        dlat = radio_km / KM_POR_GRADO
+        # Cerca de los polos el margen en longitud crece; se limita para no dividir entre cero
+        dlng = radio_km / (KM_POR_GRADO * max(math.cos(math.radians(min(abs(lat) + dlat, 89.9))), 1e-6))
+        candidatos = self._candidatos_caja(lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+        if mascara is not None:
+            candidatos = candidatos[mascara[candidatos]]
+
+        distancias = distancias_haversine_km(lat, lng, self.latitudes[candidatos], self.longitudes[candidatos])
+        dentro = distancias <= radio_km
+        candidatos, distancias = candidatos[dentro], distancias[dentro]
+        orden = np.argsort(distancias, kind="stable")
+        return candidatos[orden], distancias[orden]
+
+    def mas_cercanos(self, lat, lng, k, radio_max_km=None, mascara=None):
+        """
+        Busca los K puntos más cercanos, opcionalmente sin pasar de un radio.
+
+        Se empieza con un radio del tamaño de una celda y se duplica hasta que dentro hay al
+        menos K puntos: cualquier punto más cercano que el K-ésimo está necesariamente dentro.
+
+        Args:
+            lat (float): Latitud del centro de búsqueda
+            lng (float): Longitud del centro de búsqueda
+            k (int): Número de puntos
+            radio_max_km (float, optional): Radio máximo de búsqueda
+            mascara (np.ndarray, optional): Máscara booleana de los puntos admisibles
+
+        Returns:
+            tuple: (posiciones, distancias en km), ordenadas de menor a mayor distancia
+        """
+        total = len(self.puntos) if mascara is None else int(mascara[self.puntos].sum())
+        k = min(k, total)
+        # Media circunferencia terrestre: ningún punto puede estar más lejos
+        radio_total = math.pi * RADIO_TIERRA_KM
+        radio_tope = radio_total if radio_max_km is None else min(radio_max_km, radio_total)
+
+        radio = min(self.tam_celda * KM_POR_GRADO, radio_tope)
+        while True:
+            posiciones, distancias = self.en_radio(lat, lng, radio, mascara)
+            if len(posiciones) >= k or radio >= radio_tope:
+                return posiciones[:k], distancias[:k]
+            radio = min(radio * 2, radio_tope)
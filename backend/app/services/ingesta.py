@@ -0,0 +1,225 @@
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Formato de los ficheros de la Junta (da_centros.csv y sus ediciones)
+CODIFICACION_JUNTA = "iso-8859-1"
+DELIMITADOR_JUNTA = ";"
+
+# Columnas de da_centros.csv que usa la aplicación
+COLUMNAS_REGISTRO = ("codigo", "D_DENOMINA", "D_ESPECIFICA", "D_TIPO", "D_DOMICILIO", "D_LOCALIDAD",
+                     "D_MUNICIPIO", "D_PROVINCIA", "C_POSTAL", "N_LATITUD", "N_LONGITUD")
+
+# Primera de las marcas S/N de da_centros.csv: desde ella hasta la última columna, una por régimen o enseñanza
+PRIMERA_COLUMNA_NIVELES = "Regimen_general"
+
+# Mismo patrón que normalizar_codigo, aplicado de una vez a toda una columna
+_PATRON_CODIGO = r"^(\d{1,8})[cC]?$"
+
+
+def leer_columnas(ruta, columnas=None, categorias=(), encoding=CODIFICACION_JUNTA, delimitador=DELIMITADOR_JUNTA):
+    """
+    Lee de una vez las columnas pedidas de un CSV, como texto o como categorías.
+
+    No se convierte ningún valor: los códigos conservan sus ceros a la izquierda y las
+    celdas vacías quedan como "" (no como NaN), igual que con csv.DictReader.
+
+    Args:
+        ruta (str): Ruta del CSV
+        columnas (iterable, optional): Columnas a leer (por defecto todas); el resto no se procesa
+                                       y las que no estén en el fichero no aparecen en el resultado
+        categorias (iterable): Columnas con pocos valores distintos (las marcas S/N), que se leen
+                               como categorías: cada celda queda como un código entero
+        encoding (str): Codificación del fichero
+        delimitador (str): Delimitador de campos
+
+    Returns:
+        pd.DataFrame: Una columna de texto por columna leída, en el orden del fichero
+    """
+    if columnas is not None:
+        columnas = set(columnas)
+    return pd.read_csv(ruta, sep=delimitador, encoding=encoding,
+                       usecols=(lambda columna: columna in columnas) if columnas is not None else None,
+                       dtype=defaultdict(lambda: str, dict.fromkeys(categorias, "category")),
+                       keep_default_na=False, na_filter=False)
+
+
+def leer_encabezados(ruta, encoding=CODIFICACION_JUNTA, delimitador=DELIMITADOR_JUNTA):
+    """
+    Lee sólo la fila de encabezados de un CSV.
+
+    Returns:
+        list: Nombres de las columnas, en orden
+    """
+    return list(pd.read_csv(ruta, sep=delimitador, encoding=encoding, nrows=0).columns)
+
+
+def columnas_niveles(encabezados):
+    """
+    Columnas de marcas S/N de da_centros.csv: desde PRIMERA_COLUMNA_NIVELES hasta el final.
+
+    Se sacan de los encabezados para que una edición que añada o quite enseñanzas se lea igual.
+
+    Args:
+        encabezados (list): Encabezados del fichero
+
+    Returns:
+        list: Nombres de las columnas de marcas (vacía si el fichero no las tiene)
+    """
+    if PRIMERA_COLUMNA_NIVELES not in encabezados:
+        return []
+    return list(encabezados[encabezados.index(PRIMERA_COLUMNA_NIVELES):])
+
+
+def normalizar_codigos(codigos):
+    """
+    Versión por columnas de normalizar_codigo: mismo resultado para cada valor.
+
+    Args:
+        codigos (pd.Series): Códigos tal como aparecen en el fichero
+
+    Returns:
+        pd.Series: Códigos de 8 dígitos, o el texto original sin espacios si no tienen ese formato
+    """
+    codigos = codigos.str.strip()
+    digitos = codigos.str.extract(_PATRON_CODIGO, expand=False)
+    return digitos.str.zfill(8).fillna(codigos)
+
+
+class MarcasNiveles:
+    """
+    Marcas S/N de régimen y enseñanza de cada centro empaquetadas en bits.
+
+    Cada centro es una fila de palabras de 64 bits y cada columna de marcas un bit, así que
+    preguntar qué centros imparten a la vez varias enseñanzas ("Bachillerato y ESO públicos")
+    es un AND y una comparación sobre toda la tabla, sin comparar textos.
+
+    Attributes:
+        nombres (list): Columna de cada bit, en orden
+        bits (np.ndarray): Tabla uint64 de forma (centros, palabras)
+    """
+
+    def __init__(self, nombres, bits):
+        """
+        Args:
+            nombres (list): Columna de cada bit, en orden
+            bits (np.ndarray): Tabla uint64 de forma (centros, palabras)
+        """
+        self.nombres = list(nombres)
+        self.bits = bits
+        self._posiciones = {nombre: posicion for posicion, nombre in enumerate(self.nombres)}
+
+    @classmethod
+    def desde_columnas(cls, datos, nombres):
+        """
+        Empaqueta las marcas de las columnas leídas con leer_columnas.
+
+        Args:
+            datos (pd.DataFrame): Columnas de marcas ("S" o "N"), de texto o, mejor, de categorías
+            nombres (list): Columnas de marcas, en el orden de los bits
+
+        Returns:
+            MarcasNiveles: Marcas empaquetadas (un bit a 1 por cada "S")
+        """
+        palabras = max(1, -(-len(nombres) // 64))
+        marcas = np.zeros((len(datos), palabras * 64), dtype=bool)
+        for numero, nombre in enumerate(nombres):
+            columna = datos[nombre]
+            if isinstance(columna.dtype, pd.CategoricalDtype):
+                # Se decide una vez por valor distinto y se reparte con los códigos de cada celda
+                es_si = np.array([str(valor).strip() == "S" for valor in columna.cat.categories] + [False])
+                marcas[:, numero] = es_si[columna.cat.codes.to_numpy()]
+            else:
+                marcas[:, numero] = (columna.str.strip() == "S").to_numpy()
+        # Ocho marcas por byte empezando por el bit menos significativo: la marca i es el bit i % 64 de la palabra i // 64
+        bits = np.packbits(marcas, axis=1, bitorder="little").view("<u8")
+        return cls(nombres, bits)
+
+    @classmethod
+    def desde_archivo(cls, archivo, prefijo):
+        """
+        Marcas guardadas en una instantánea binaria con secciones().
+
+        Args:
+            archivo (ArchivoMapeado): Instantánea mapeada
+            prefijo (str): Prefijo de los nombres de sección
+
+        Returns:
+            MarcasNiveles: Marcas cuya tabla es una vista sobre el mapa
+        """
+        return cls(archivo.array(f"{prefijo}.nombres").tolist(), archivo.array(f"{prefijo}.bits"))
+
+    def secciones(self, prefijo):
+        """
+        Secciones de la instantánea binaria con las marcas.
+
+        Returns:
+            dict: '<prefijo>.nombres' y '<prefijo>.bits'
+        """
+        return {f"{prefijo}.nombres": np.array(self.nombres, dtype=str), f"{prefijo}.bits": self.bits}
+
+    def __len__(self):
+        return len(self.bits)
+
+    def patron(self, nombres):
+        """
+        Palabras con a 1 los bits de unas columnas de marcas.
+
+        Args:
+            nombres (iterable): Columnas de marcas ('pub_bach_ord', 'pub_eso'...)
+
+        Returns:
+            np.ndarray: Array uint64 con una palabra por palabra de la tabla
+
+        Raises:
+            ValueError: Si alguna columna no es una marca del registro
+        """
+        nombres = list(nombres)
+        desconocidas = [nombre for nombre in nombres if nombre not in self._posiciones]
+        if desconocidas:
+            raise ValueError(f"Enseñanzas desconocidas: {', '.join(desconocidas)}")
+        patron = np.zeros(self.bits.shape[1], dtype=np.uint64)
+        for nombre in nombres:
+            posicion = self._posiciones[nombre]
+            patron[posicion // 64] |= np.uint64(1) << np.uint64(posicion % 64)
+        return patron
+
+    def mascara(self, nombres, todas=True):
+        """
+        Máscara de los centros que tienen marcadas unas columnas.
+
+        Args:
+            nombres (iterable): Columnas de marcas
+            todas (bool): Si es True, el centro debe tenerlas todas; si es False, basta con una
+
+        Returns:
+            np.ndarray: Máscara booleana por centro
+        """
+        patron = self.patron(nombres)
+        if todas:
+            return ((self.bits & patron) == patron).all(axis=1)
+        return (self.bits & patron).any(axis=1)
+
+    def conteos(self):
+        """
+        Número de centros que tienen marcada cada columna.
+
+        Returns:
+            dict: Nombre de la marca -> número de centros, en el orden de los bits
+        """
+        marcas = np.unpackbits(self.bits.view(np.uint8), axis=1, bitorder="little")
+        return dict(zip(self.nombres, marcas[:, :len(self.nombres)].sum(axis=0).tolist()))
+
+    def de_centro(self, posicion):
+        """
+        Columnas marcadas de un centro.
+
+        Args:
+            posicion (int): Posición del centro
+
+        Returns:
+            list: Nombres de las marcas a "S", en orden
+        """
+        marcas = np.unpackbits(self.bits[posicion].view(np.uint8), bitorder="little")
+        return [self.nombres[numero] for numero in np.flatnonzero(marcas[:len(self.nombres)]).tolist()]
@@ -0,0 +1,291 @@
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+# Firma y versión del formato: cambia si cambia la disposición del fichero
+MAGIA = b"CENTBIN1"
+# Las secciones empiezan en múltiplos de 8 bytes para poder verlas como arrays sin copiarlas
+ALINEACION = 8
+
+
+def hash_fichero(ruta):
+    """
+    Calcula el SHA-256 del contenido de un fichero.
+
+    Args:
+        ruta (str): Ruta del fichero
+
+    Returns:
+        str: Hash en hexadecimal
+    """
+    resumen = hashlib.sha256()
+    with open(ruta, mode="rb") as file:
+        for bloque in iter(lambda: file.read(1 << 20), b""):
+            resumen.update(bloque)
+    return resumen.hexdigest()
+
+
+def escribir_secciones(ruta, metadatos, secciones):
+    """
+    Escribe una instantánea binaria: una cabecera JSON con los metadatos y la posición de
+    cada sección, seguida de las secciones (arrays de ancho fijo) alineadas.
+
+    El fichero se escribe aparte y se sustituye de una vez, así que los procesos que tienen
+    mapeada la versión anterior la siguen leyendo entera hasta que la suelten.
+
+    Args:
+        ruta (str): Ruta del fichero
+        metadatos (dict): Datos serializables a JSON que acompañan a las secciones
+        secciones (dict): Nombre -> np.ndarray o bytes
+    """
+    arrays = {nombre: np.ascontiguousarray(np.frombuffer(valor, dtype=np.uint8) if isinstance(valor, bytes) else valor)
+              for nombre, valor in secciones.items()}
+    descriptores = {}
+    desplazamiento = 0
+    for nombre, array in arrays.items():
+        descriptores[nombre] = {"desplazamiento": desplazamiento, "tipo": array.dtype.str, "forma": list(array.shape)}
+        desplazamiento = _alinear(desplazamiento + array.nbytes)
+    cabecera = json.dumps({"metadatos": metadatos, "secciones": descriptores}, ensure_ascii=False).encode("utf-8")
+    inicio_datos = _alinear(len(MAGIA) + 8 + len(cabecera))
+
+    temporal = f"{ruta}.tmp"
+    with open(temporal, mode="wb") as file:
+        file.write(MAGIA + struct.pack("<Q", len(cabecera)) + cabecera)
+        file.write(b"\0" * (inicio_datos - file.tell()))
+        for nombre, array in arrays.items():
+            file.write(b"\0" * (inicio_datos + descriptores[nombre]["desplazamiento"] - file.tell()))
+            file.write(array.tobytes())
+    os.replace(temporal, ruta)
+
+
+class ArchivoMapeado:
+    """
+    Instantánea binaria mapeada en memoria en modo sólo lectura.
+
+    Las secciones se devuelven como arrays de NumPy sobre el propio mapa, sin copiarlas: las
+    páginas las comparte el sistema operativo entre todos los procesos que mapean el mismo
+    fichero, así que los datos ocupan memoria una sola vez por máquina.
+
+    Attributes:
+        ruta (str): Ruta del fichero
+        metadatos (dict): Metadatos guardados al escribirlo
+        mtime_ns (int): Fecha de modificación del fichero mapeado
+    """
+
+    def __init__(self, ruta):
+        """
+        Args:
+            ruta (str): Ruta del fichero
+
+        Raises:
+            ValueError: Si el fichero no es una instantánea binaria de esta versión
+        """
+        self.ruta = ruta
+        with open(ruta, mode="rb") as file:
+            self.mtime_ns = os.fstat(file.fileno()).st_mtime_ns
+            self._mapa = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mapa[:len(MAGIA)] != MAGIA:
+            raise ValueError(f"'{ruta}' no es una instantánea binaria de esta versión")
+        (longitud,) = struct.unpack_from("<Q", self._mapa, len(MAGIA))
+        inicio_cabecera = len(MAGIA) + 8
+        cabecera = json.loads(self._mapa[inicio_cabecera:inicio_cabecera + longitud].decode("utf-8"))
+        self.metadatos = cabecera["metadatos"]
+        self._secciones = cabecera["secciones"]
+        self._inicio_datos = _alinear(inicio_cabecera + longitud)
+
+    def __contains__(self, nombre):
+        return nombre in self._secciones
+
+    def array(self, nombre):
+        """
+        Devuelve una sección como array de sólo lectura sobre el mapa.
+
+        Args:
+            nombre (str): Nombre de la sección
+
+        Returns:
+            np.ndarray: Array con el tipo y la forma con que se guardó
+        """
+        descriptor = self._secciones[nombre]
+        forma = tuple(descriptor["forma"])
+        return np.frombuffer(self._mapa, dtype=np.dtype(descriptor["tipo"]), count=int(np.prod(forma)),
+                             offset=self._inicio_datos + descriptor["desplazamiento"]).reshape(forma)
+
+    def bytes(self, nombre):
+        """
+        Devuelve una sección de bytes como memoryview sobre el mapa, sin copiarla.
+
+        Args:
+            nombre (str): Nombre de la sección
+
+        Returns:
+            memoryview: Contenido de la sección
+        """
+        return memoryview(self.array(nombre))
+
+
+def codificar_textos(columnas):
+    """
+    Convierte columnas de texto en identificadores de una tabla de cadenas común.
+
+    La tabla guarda cada texto distinto una sola vez, en orden, así que comparar
+    identificadores equivale a comparar los textos.
+
+    Args:
+        columnas (dict): Nombre -> lista de textos
+
+    Returns:
+        tuple: (dict nombre -> array int32 de identificadores, secciones de la tabla de cadenas)
+    """
+    distintos = sorted({texto for textos in columnas.values() for texto in textos})
+    identificadores = {texto: numero for numero, texto in enumerate(distintos)}
+    codificados = [texto.encode("utf-8") for texto in distintos]
+    inicios = np.zeros(len(codificados) + 1, dtype=np.int64)
+    np.cumsum([len(texto) for texto in codificados], out=inicios[1:])
+    ids = {nombre: np.array([identificadores[texto] for texto in textos], dtype=np.int32) for nombre, textos in columnas.items()}
+    return ids, {"cadenas.inicios": inicios, "cadenas.datos": b"".join(codificados)}
+
+
+class TablaCadenas:
+    """
+    Tabla de cadenas de una instantánea binaria. Cada texto se decodifica la primera vez que
+    se pide y se recuerda en el proceso: sólo se copian los textos que llegan a usarse.
+    """
+
+    def __init__(self, archivo):
+        """
+        Args:
+            archivo (ArchivoMapeado): Instantánea con las secciones de codificar_textos
+        """
+        self.inicios = memoryview(archivo.array("cadenas.inicios"))
+        self.datos = archivo.bytes("cadenas.datos")
+        self._textos = [None] * (len(self.inicios) - 1)
+
+    def __len__(self):
+        return len(self._textos)
+
+    def __getitem__(self, identificador):
+        texto = self._textos[identificador]
+        if texto is None:
+            texto = self._textos[identificador] = str(self.datos[self.inicios[identificador]:self.inicios[identificador + 1]], "utf-8")
+        return texto
+
+    def buscar(self, texto):
+        """
+        Busca el identificador de un texto por bisección (la tabla está ordenada).
+
+        Args:
+            texto (str): Texto buscado
+
+        Returns:
+            int: Identificador, o -1 si el texto no está en la tabla
+        """
+        posicion = bisect.bisect_left(self, texto)
+        return posicion if posicion < len(self) and self[posicion] == texto else -1
+
+
+class ColumnaTexto:
+    """
+    Columna de texto de una instantánea binaria, indexable como una lista.
+    """
+
+    def __init__(self, ids, tabla):
+        """
+        Args:
+            ids (np.ndarray): Identificador de cada valor en la tabla
+            tabla (TablaCadenas): Tabla de cadenas de la instantánea
+        """
+        self.ids = ids
+        self.tabla = tabla
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, posicion):
+        return self.tabla[int(self.ids[posicion])]
+
+    def __iter__(self):
+        return (self.tabla[identificador] for identificador in self.ids.tolist())
+
+    def igual_a(self, texto):
+        """
+        Máscara de los valores iguales a un texto, comparando identificadores.
+
+        Args:
+            texto (str): Valor buscado
+
+        Returns:
+            np.ndarray: Máscara booleana
+        """
+        return self.ids == self.tabla.buscar(texto)
+
+
+class Postings:
+    """
+    Diccionario de sólo lectura clave -> array de enteros guardado como columnas: claves
+    ordenadas de ancho fijo, inicios de cada lista y las listas concatenadas. Sólo las claves
+    se copian a un diccionario del proceso; las listas se devuelven como vistas sobre el mapa.
+    """
+
+    def __init__(self, claves, inicios, valores):
+        """
+        Args:
+            claves (np.ndarray): Claves ordenadas (texto de ancho fijo)
+            inicios (np.ndarray): Posición en valores de la lista de cada clave, más el final
+            valores (np.ndarray): Listas concatenadas
+        """
+        self.claves = claves
+        self.inicios = inicios
+        self.valores = valores
+        limites = inicios.tolist()
+        self._limites = {clave: (limites[numero], limites[numero + 1]) for numero, clave in enumerate(claves.tolist())}
+
+    @staticmethod
+    def secciones(diccionario, prefijo):
+        """
+        Convierte un diccionario clave -> array en las secciones que lee Postings.
+
+        Args:
+            diccionario (dict): Clave de texto -> array de enteros
+            prefijo (str): Prefijo de los nombres de sección
+
+        Returns:
+            dict: Secciones '<prefijo>.claves', '<prefijo>.inicios' y '<prefijo>.valores'
+        """
+        claves = sorted(diccionario)
+        listas = [diccionario[clave] for clave in claves]
+        inicios = np.zeros(len(claves) + 1, dtype=np.int64)
+        np.cumsum([len(lista) for lista in listas], out=inicios[1:])
+        valores = np.concatenate(listas) if listas else np.empty(0, dtype=np.int32)
+        return {f"{prefijo}.claves": np.array(claves, dtype=str), f"{prefijo}.inicios": inicios, f"{prefijo}.valores": valores}
+
+    @classmethod
+    def desde_archivo(cls, archivo, prefijo):
+        return cls(archivo.array(f"{prefijo}.claves"), archivo.array(f"{prefijo}.inicios"), archivo.array(f"{prefijo}.valores"))
+
+    def get(self, clave, defecto=None):
+        limites = self._limites.get(clave)
+        if limites is None:
+            return defecto
+        return self.valores[limites[0]:limites[1]]
+
+    def __contains__(self, clave):
+        return clave in self._limites
+
+    def __getitem__(self, clave):
+        valores = self.get(clave)
+        if valores is None:
+            raise KeyError(clave)
+        return valores
+
+    def __len__(self):
+        return len(self.claves)
+
+
+def _alinear(posicion):
+    return -(-posicion // ALINEACION) * ALINEACION
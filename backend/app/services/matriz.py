@@ -0,0 +1,222 @@
+import csv
+import os
+
+import numpy as np
+
+from services.enrutamiento import obtener_motor
+from services.geo import parsear_decimales
+from services.googleConnect import calcular_matriz_lote
+from services.metricas import medir_etapa
+
+# Valor de la matriz para los trayectos que no se pudieron calcular
+SIN_TRAYECTO = -1
+
+MODOS_ALCANCE = ("alguno", "todos")
+
+
+class MatrizTrayectos:
+    """
+    Matriz densa orígenes × centros con la duración y la distancia de cada trayecto.
+
+    Se calcula una vez para todos los orígenes candidatos (el piso actual, el trabajo de la
+    pareja, la casa familiar...) y se guarda como arrays de enteros en un .npz, de modo que
+    las preguntas sobre varios orígenes se responden con operaciones sobre columnas sin
+    volver a consultar el motor de trayectos.
+
+    Attributes:
+        origenes (list): Orígenes, uno por fila
+        codigos (np.ndarray): Código de cada centro, uno por columna
+        nombres (np.ndarray): Tipo y nombre de cada centro
+        municipios (np.ndarray): Municipio de cada centro
+        duraciones (np.ndarray): Segundos de trayecto (int32, SIN_TRAYECTO si no se conoce)
+        distancias (np.ndarray): Metros de trayecto (int32, SIN_TRAYECTO si no se conoce)
+        motor (str): Modo del motor de trayectos con el que se calculó
+    """
+
+    def __init__(self, origenes, codigos, nombres, municipios, duraciones, distancias, motor=None):
+        self.origenes = list(origenes)
+        self.codigos = np.asarray(codigos, dtype=str)
+        self.nombres = np.asarray(nombres, dtype=str)
+        self.municipios = np.asarray(municipios, dtype=str)
+        self.duraciones = np.asarray(duraciones, dtype=np.int32).reshape(len(self.origenes), len(self.codigos))
+        self.distancias = np.asarray(distancias, dtype=np.int32).reshape(self.duraciones.shape)
+        self.motor = motor
+
+    @classmethod
+    @medir_etapa("trayectos_matriz")
+    def calcular(cls, csv_centros, origenes, **opciones):
+        """
+        Calcula los trayectos de cada origen a cada centro de un CSV con el formato de coincidencias.csv.
+
+        Args:
+            csv_centros (str): Ruta al CSV de centros
+            origenes (list): Direcciones (o textos "lat,lng") de origen
+            **opciones: Opciones del cálculo concurrente (max_hilos, peticiones_por_segundo,
+                        max_reintentos, progreso, cancelado)
+
+        Returns:
+            MatrizTrayectos: Matriz calculada
+        """
+        with open(csv_centros, mode='r', encoding='utf-8') as file:
+            filas = list(csv.DictReader(file))
+
+        # Mismos destinos que CentroEducativo.destino_ruta, para aprovechar la caché de trayectos
+        motor = obtener_motor()
+        lats = parsear_decimales([fila.get("N_LATITUD", "") for fila in filas])
+        lngs = parsear_decimales([fila.get("N_LONGITUD", "") for fila in filas])
+        destinos = []
+        for fila, lat, lng in zip(filas, lats.tolist(), lngs.tolist()):
+            if motor.usa_coordenadas and lat == lat and lng == lng:
+                destinos.append((lat, lng))
+            else:
+                destinos.append(f"{fila['D_DOMICILIO']},{fila['C_POSTAL']}, {fila['D_MUNICIPIO']}, {fila['D_PROVINCIA']}")
+
+        resultados = calcular_matriz_lote(list(origenes), destinos, **opciones)
+        duraciones = np.full((len(origenes), len(filas)), SIN_TRAYECTO, dtype=np.int32)
+        distancias = np.full(duraciones.shape, SIN_TRAYECTO, dtype=np.int32)
+        for numero_origen, resultados_origen in enumerate(resultados):
+            for numero_centro, resultado in enumerate(resultados_origen):
+                if resultado["estado"] == "OK":
+                    duraciones[numero_origen, numero_centro] = resultado["duracion en s"]
+                    distancias[numero_origen, numero_centro] = resultado["distancia en m"]
+
+        sin_trayecto = int((duraciones == SIN_TRAYECTO).sum())
+        if sin_trayecto:
+            print(f"Sin trayecto en {sin_trayecto} de {duraciones.size} pares origen-centro.")
+        return cls(
+            origenes,
+            [fila["codigo"] for fila in filas],
+            [f"{fila['D_DENOMINA']} {fila['D_ESPECIFICA']}".strip() for fila in filas],
+            [fila["D_MUNICIPIO"] for fila in filas],
+            duraciones,
+            distancias,
+            motor.modo,
+        )
+
+    def guardar(self, ruta):
+        """
+        Guarda la matriz comprimida en un .npz, sustituyendo el anterior de una vez.
+
+        Args:
+            ruta (str): Ruta del fichero
+        """
+        temporal = f"{ruta}.tmp"
+        with open(temporal, mode='wb') as file:
+            np.savez_compressed(
+                file,
+                origenes=np.asarray(self.origenes, dtype=str),
+                codigos=self.codigos,
+                nombres=self.nombres,
+                municipios=self.municipios,
+                duraciones=self.duraciones,
+                distancias=self.distancias,
+                motor=np.asarray(self.motor or "", dtype=str),
+            )
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta):
+        """
+        Carga una matriz guardada con guardar().
+
+        Args:
+            ruta (str): Ruta del .npz
+
+        Returns:
+            MatrizTrayectos: Matriz guardada
+        """
+        with np.load(ruta) as datos:
+            return cls(datos["origenes"].tolist(), datos["codigos"], datos["nombres"], datos["municipios"],
+                       datos["duraciones"], datos["distancias"], str(datos["motor"]) or None)
+
+    def _filas(self, origenes=None):
+        # Duraciones de los orígenes pedidos (por posición), con infinito donde no hay trayecto
+        duraciones = self.duraciones if origenes is None else self.duraciones[list(origenes)]
+        return np.where(duraciones == SIN_TRAYECTO, np.inf, duraciones.astype(np.float64))
+
+    def peor_caso(self, origenes=None):
+        """
+        Duración del trayecto más largo hasta cada centro desde los orígenes.
+
+        Args:
+            origenes (list, optional): Posiciones de los orígenes a considerar (por defecto todos)
+
+        Returns:
+            np.ndarray: Segundos por centro (infinito si falta algún trayecto)
+        """
+        return self._filas(origenes).max(axis=0)
+
+    def mejor_caso(self, origenes=None):
+        """
+        Duración del trayecto más corto hasta cada centro desde los orígenes.
+
+        Args:
+            origenes (list, optional): Posiciones de los orígenes a considerar (por defecto todos)
+
+        Returns:
+            np.ndarray: Segundos por centro (infinito si no se conoce ninguno)
+        """
+        return self._filas(origenes).min(axis=0)
+
+    def alcanzables(self, minutos, modo="alguno", origenes=None):
+        """
+        Centros a menos de cierto tiempo de alguno o de todos los orígenes.
+
+        Args:
+            minutos (float): Duración máxima del trayecto
+            modo (str): 'alguno' (basta con un origen) o 'todos' (desde cada origen)
+            origenes (list, optional): Posiciones de los orígenes a considerar (por defecto todos)
+
+        Returns:
+            np.ndarray: Posiciones de los centros, del más cercano al más lejano según el modo
+
+        Raises:
+            ValueError: Si el modo no está en MODOS_ALCANCE
+        """
+        if modo not in MODOS_ALCANCE:
+            raise ValueError(f"Modo desconocido: {modo!r} (disponibles: {', '.join(MODOS_ALCANCE)})")
+        segundos = self.mejor_caso(origenes) if modo == "alguno" else self.peor_caso(origenes)
+        posiciones = np.flatnonzero(segundos <= minutos * 60)
+        return posiciones[np.argsort(segundos[posiciones], kind="stable")]
+
+    def minimax(self, limit=None, origenes=None):
+        """
+        Centros ordenados por el trayecto más largo desde los orígenes: los primeros minimizan
+        el peor desplazamiento. A igual peor caso se prefiere el menor tiempo total.
+
+        Args:
+            limit (int, optional): Número máximo de centros a devolver
+            origenes (list, optional): Posiciones de los orígenes a considerar (por defecto todos)
+
+        Returns:
+            np.ndarray: Posiciones de los centros con todos sus trayectos conocidos
+        """
+        filas = self._filas(origenes)
+        peor = filas.max(axis=0)
+        total = filas.sum(axis=0)
+        posiciones = np.flatnonzero(np.isfinite(peor))
+        orden = np.lexsort((total[posiciones], peor[posiciones]))
+        return posiciones[orden][:limit]
+
+    def fila(self, posicion, origenes=None):
+        """
+        Datos de un centro con su duración desde cada origen.
+
+        Args:
+            posicion (int): Columna del centro
+            origenes (list, optional): Posiciones de los orígenes a incluir (por defecto todos)
+
+        Returns:
+            dict: Código, nombre, municipio y minutos desde cada origen (None si no hay trayecto)
+        """
+        numeros = range(len(self.origenes)) if origenes is None else origenes
+        return {
+            "codigo": str(self.codigos[posicion]),
+            "nombre": str(self.nombres[posicion]),
+            "municipio": str(self.municipios[posicion]),
+            "minutos": {
+                self.origenes[numero]: (None if self.duraciones[numero, posicion] == SIN_TRAYECTO
+                                        else round(int(self.duraciones[numero, posicion]) / 60, 1))
+                for numero in numeros
+            },
+        }
@@ -0,0 +1,365 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites (en segundos) de los histogramas de latencia
+LIMITES_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Límites de las etapas del pipeline, que pueden durar minutos
+LIMITES_ETAPAS = (0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+
+
+class Contador:
+    """
+    Contador de Prometheus con etiquetas: sólo crece.
+    """
+
+    tipo = "counter"
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._cerrojo = threading.Lock()
+
+    def incrementar(self, cantidad=1, **etiquetas):
+        clave = tuple(str(etiquetas[etiqueta]) for etiqueta in self.etiquetas)
+        with self._cerrojo:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def muestras(self):
+        with self._cerrojo:
+            valores = dict(self._valores)
+        for clave, valor in sorted(valores.items()):
+            yield self.nombre, dict(zip(self.etiquetas, clave)), valor
+
+
+class Histograma:
+    """
+    Histograma de Prometheus con etiquetas: cubos acumulados, suma y número de observaciones.
+    """
+
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), limites=LIMITES_LATENCIA):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.limites = tuple(limites)
+        self._series = {}
+        self._cerrojo = threading.Lock()
+
+    def observar(self, valor, **etiquetas):
+        clave = tuple(str(etiquetas[etiqueta]) for etiqueta in self.etiquetas)
+        with self._cerrojo:
+            serie = self._series.get(clave)
+            if serie is None:
+                # Un cubo por límite más el de +Inf, la suma y el número de observaciones
+                serie = self._series[clave] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            cubos = serie[0]
+            for posicion, limite in enumerate(self.limites):
+                if valor <= limite:
+                    cubos[posicion] += 1
+                    break
+            else:
+                cubos[-1] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def muestras(self):
+        with self._cerrojo:
+            series = {clave: (list(cubos), suma, cuenta) for clave, (cubos, suma, cuenta) in self._series.items()}
+        for clave, (cubos, suma, cuenta) in sorted(series.items()):
+            etiquetas = dict(zip(self.etiquetas, clave))
+            acumulado = 0
+            for limite, cantidad in zip((*self.limites, float("inf")), cubos):
+                acumulado += cantidad
+                yield f"{self.nombre}_bucket", {**etiquetas, "le": _formatear_numero(limite)}, acumulado
+            yield f"{self.nombre}_sum", etiquetas, suma
+            yield f"{self.nombre}_count", etiquetas, cuenta
+
+
+class Calibre:
+    """
+    Valor que se lee al exponer las métricas, llamando a una función.
+    La función devuelve un número o un diccionario {tupla de etiquetas: número}. Con
+    tipo='counter' sirve para exponer contadores que ya lleva otro objeto (p. ej. la caché).
+    """
+
+    def __init__(self, nombre, ayuda, leer, etiquetas=(), tipo="gauge"):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.leer = leer
+        self.etiquetas = tuple(etiquetas)
+        self.tipo = tipo
+
+    def muestras(self):
+        valor = self.leer()
+        if not isinstance(valor, dict):
+            yield self.nombre, {}, valor
+            return
+        for clave, cantidad in sorted(valor.items()):
+            yield self.nombre, dict(zip(self.etiquetas, clave)), cantidad
+
+
+class RegistroMetricas:
+    """
+    Conjunto de métricas del proceso, expuestas en el formato de texto de Prometheus.
+    Registrar dos veces el mismo nombre devuelve la métrica ya creada.
+    """
+
+    def __init__(self):
+        self._metricas = {}
+        self._cerrojo = threading.Lock()
+
+    def _registrar(self, metrica):
+        with self._cerrojo:
+            return self._metricas.setdefault(metrica.nombre, metrica)
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._registrar(Contador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), limites=LIMITES_LATENCIA):
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, limites))
+
+    def calibre(self, nombre, ayuda, leer, etiquetas=(), tipo="gauge"):
+        # Un calibre nuevo sustituye al anterior: su función de lectura puede apuntar a otros objetos
+        with self._cerrojo:
+            self._metricas[nombre] = Calibre(nombre, ayuda, leer, etiquetas, tipo)
+            return self._metricas[nombre]
+
+    def exponer(self):
+        """
+        Devuelve todas las métricas en el formato de texto de Prometheus (versión 0.0.4).
+
+        Returns:
+            str: Texto con una línea HELP y TYPE por métrica y una línea por serie
+        """
+        with self._cerrojo:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for metrica in metricas:
+            try:
+                muestras = list(metrica.muestras())
+            except Exception as e:
+                # Un calibre que falla no debe impedir servir el resto
+                print(f"No se pudo leer la métrica {metrica.nombre}: {e}")
+                continue
+            lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+            for nombre, etiquetas, valor in muestras:
+                lineas.append(f"{nombre}{_formatear_etiquetas(etiquetas)} {_formatear_numero(valor)}")
+        return "\n".join(lineas) + "\n"
+
+
+# Registro compartido por la API y el pipeline
+REGISTRO = RegistroMetricas()
+
+PETICIONES_HTTP = REGISTRO.histograma(
+    "centros_http_peticion_segundos", "Latencia de las peticiones HTTP por ruta", ("metodo", "ruta", "codigo"))
+PETICIONES_RUTAS = REGISTRO.contador(
+    "centros_rutas_peticiones_total", "Peticiones al motor de trayectos por resultado", ("motor", "operacion", "estado"))
+LATENCIA_RUTAS = REGISTRO.histograma(
+    "centros_rutas_peticion_segundos", "Latencia de las peticiones al motor de trayectos", ("motor", "operacion"))
+DESTINOS_RUTAS = REGISTRO.contador(
+    "centros_rutas_destinos_total", "Destinos consultados al motor de trayectos por estado del elemento", ("motor", "estado"))
+ETAPAS_PIPELINE = REGISTRO.histograma(
+    "centros_pipeline_etapa_segundos", "Duración de las etapas del pipeline", ("etapa",), LIMITES_ETAPAS)
+
+
+class Perfil:
+    """
+    Desglose por etapas de una ejecución del pipeline (ver activar_perfil).
+
+    Las etapas anidadas se registran con su camino completo ('exportar/distancias').
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.etapas = {}
+        self._pila = threading.local()
+        self._cerrojo = threading.Lock()
+
+    def abrir(self, camino):
+        # Las etapas se listan en el orden en que empiezan, con las anidadas debajo de su etapa
+        with self._cerrojo:
+            self.etapas.setdefault(camino, {"llamadas": 0, "segundos": 0.0})
+
+    def registrar(self, camino, segundos):
+        with self._cerrojo:
+            etapa = self.etapas[camino]
+            etapa["llamadas"] += 1
+            etapa["segundos"] += segundos
+
+    def informe(self):
+        """
+        Returns:
+            dict: Tiempo total y, por etapa, llamadas, segundos y porcentaje del total
+        """
+        total = time.perf_counter() - self.inicio
+        return {
+            "total_s": round(total, 4),
+            "etapas": {
+                camino: {
+                    "llamadas": etapa["llamadas"],
+                    "segundos": round(etapa["segundos"], 4),
+                    "porcentaje": round(100 * etapa["segundos"] / total, 1) if total else 0.0,
+                }
+                for camino, etapa in self.etapas.items()
+            },
+        }
+
+
+_perfil = None
+
+
+def activar_perfil():
+    """
+    Empieza a registrar el desglose por etapas de esta ejecución.
+    También se activa al importar el módulo si la variable PERFILAR_PIPELINE tiene valor.
+
+    Returns:
+        Perfil: Perfil en curso
+    """
+    global _perfil
+    _perfil = Perfil()
+    return _perfil
+
+
+def volcar_perfil(ruta=None):
+    """
+    Imprime el desglose por etapas de la ejecución y, si se indica, lo guarda en JSON.
+
+    Args:
+        ruta (str, optional): Fichero JSON donde guardar el desglose
+
+    Returns:
+        dict: Desglose (None si el perfil no estaba activado)
+    """
+    if _perfil is None:
+        return None
+    informe = _perfil.informe()
+    print(f"Perfil de la ejecución ({informe['total_s']:.3f} s):")
+    for camino, etapa in informe["etapas"].items():
+        sangria = "  " * camino.count("/")
+        nombre = camino.rsplit("/", 1)[-1]
+        print(f"  {sangria}{nombre:<{30 - len(sangria)}} {etapa['segundos']:>9.3f} s {etapa['porcentaje']:>5.1f} %  ({etapa['llamadas']} llamadas)")
+    if ruta:
+        with open(ruta, mode='w', encoding='utf-8') as file:
+            json.dump(informe, file, ensure_ascii=False, indent=2)
+        print(f"Perfil guardado en '{ruta}'.")
+    return informe
+
+
+if os.getenv("PERFILAR_PIPELINE"):
+    activar_perfil()
+
+
+@contextmanager
+def medir_etapa(etapa):
+    """
+    Mide una etapa del pipeline: la añade al histograma de etapas y, si el perfil está
+    activado, a su desglose.
+
+    Args:
+        etapa (str): Nombre de la etapa ('lectura', 'distancias', 'exportacion'...)
+
+    Example:
+        >>> with medir_etapa("ordenacion"):
+        ...     centros = ordenar_centros_duracion(centros)
+    """
+    perfil = _perfil
+    camino = etapa
+    if perfil is not None:
+        pila = perfil._pila.__dict__.setdefault("etapas", [])
+        camino = "/".join((*pila, etapa))
+        pila.append(etapa)
+        perfil.abrir(camino)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        segundos = time.perf_counter() - inicio
+        ETAPAS_PIPELINE.observar(segundos, etapa=etapa)
+        if perfil is not None:
+            pila.pop()
+            perfil.registrar(camino, segundos)
+
+
+def registrar_peticion_rutas(motor, operacion, estado, segundos, estados_destinos=()):
+    """
+    Anota una petición al motor de trayectos.
+
+    Args:
+        motor (str): Modo del motor ('driving', 'driving-local', 'estimado')
+        operacion (str): 'distancias' o 'geocodigo'
+        estado (str): Resultado de la petición ('OK' o el código de error)
+        segundos (float): Duración de la petición
+        estados_destinos (iterable): Estado de cada destino devuelto
+    """
+    PETICIONES_RUTAS.incrementar(motor=motor, operacion=operacion, estado=estado)
+    LATENCIA_RUTAS.observar(segundos, motor=motor, operacion=operacion)
+    recuentos = {}
+    for estado_destino in estados_destinos:
+        recuentos[estado_destino] = recuentos.get(estado_destino, 0) + 1
+    for estado_destino, cantidad in recuentos.items():
+        DESTINOS_RUTAS.incrementar(cantidad, motor=motor, estado=estado_destino)
+
+
+class MiddlewareMetricas:
+    """
+    Middleware ASGI que mide la latencia de cada petición HTTP, etiquetada con la plantilla
+    de la ruta ('/api/centros', no la URL con sus parámetros) para acotar las series.
+    La medida termina al enviarse el último bloque del cuerpo, así que incluye las descargas por streaming.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        estado = {"codigo": 500}
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["codigo"] = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            ruta = scope.get("route")
+            PETICIONES_HTTP.observar(
+                time.perf_counter() - inicio,
+                metodo=scope["method"],
+                ruta=getattr(ruta, "path", None) or "sin_ruta",
+                codigo=estado["codigo"],
+            )
+
+
+def _formatear_etiquetas(etiquetas):
+    if not etiquetas:
+        return ""
+    pares = ",".join(f'{clave}="{_escapar(valor)}"' for clave, valor in etiquetas.items())
+    return f"{{{pares}}}"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatear_numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    if isinstance(valor, bool):
+        return "1" if valor else "0"
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor)) if abs(valor) < 1e15 else repr(valor)
+    return str(valor)
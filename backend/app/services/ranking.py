@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from models.CentroCollection import CentroCollection
+from services.cache_rutas import normalizar_direccion
+from services.csv_service import cargar_csv_centros
+from services.enriquecimiento import enriquecer_centros, indexar_bilingues, indexar_compensatorios
+from services.enrutamiento import obtener_motor
+
+# Número de orígenes distintos cuyos rankings se conservan en memoria
+CAPACIDAD_RANKINGS = int(os.getenv("RANKING_CAPACIDAD", 128))
+
+
+def normalizar_origen(origen=None, lat=None, lng=None):
+    """
+    Normaliza un origen para usarlo como clave: dirección normalizada o coordenadas
+    redondeadas a 4 decimales (unos 10 m), para que orígenes equivalentes compartan ranking.
+
+    Args:
+        origen (str, optional): Dirección postal
+        lat (float, optional): Latitud
+        lng (float, optional): Longitud
+
+    Returns:
+        str: Origen normalizado
+
+    Raises:
+        ValueError: Si no se indica ni dirección ni coordenadas
+    """
+    if lat is not None and lng is not None:
+        return f"{lat:.4f},{lng:.4f}"
+    if origen and origen.strip():
+        return normalizar_direccion(origen)
+    raise ValueError("Hay que indicar un origen o unas coordenadas (lat y lng)")
+
+
+class Ranking:
+    """
+    Centros ordenados por duración del trayecto desde un origen.
+
+    Attributes:
+        origen (str): Origen con el que se calculó (dirección o "lat,lng")
+        centros (CentroCollection): Centros ordenados de menor a mayor duración
+        filas (list): Los mismos centros con el formato de /api/centros
+        calculado_en (float): Marca de tiempo del cálculo
+        segundos_calculo (float): Tiempo que costó calcularlo
+    """
+
+    def __init__(self, origen, centros, segundos_calculo):
+        self.origen = origen
+        self.centros = centros
+        self.filas = list(centros.filas_exportacion())
+        self.calculado_en = time.time()
+        self.segundos_calculo = segundos_calculo
+
+
+class ServicioRanking:
+    """
+    Calcula rankings de centros para cualquier origen bajo demanda.
+
+    Las peticiones simultáneas del mismo origen se agrupan en un único cálculo: la primera
+    lo lanza y las demás esperan su resultado. Los rankings terminados se guardan en una
+    caché LRU acotada por origen normalizado.
+
+    Attributes:
+        aciertos (int): Rankings servidos desde la caché
+        calculos (int): Rankings calculados
+        agrupadas (int): Peticiones que esperaron a un cálculo ya en curso
+    """
+
+    def __init__(self, csv_centros, csv_bilingues=None, csv_compensatorios=None, capacidad=CAPACIDAD_RANKINGS, **opciones):
+        """
+        Args:
+            csv_centros (str): CSV de centros a ordenar (formato de coincidencias.csv)
+            csv_bilingues (str, optional): Ruta a da_centros_bilingues.csv
+            csv_compensatorios (str, optional): Ruta a centros_compensatoria.csv
+            capacidad (int): Número máximo de rankings en memoria
+            **opciones: Opciones del cálculo de distancias (max_hilos, peticiones_por_segundo...)
+        """
+        self.csv_centros = csv_centros
+        # Los ficheros de bilingües y compensatorios se indexan una vez para todos los rankings
+        self.bilingues = indexar_bilingues(csv_bilingues) if csv_bilingues else {}
+        self.compensatorios = indexar_compensatorios(csv_compensatorios) if csv_compensatorios else {}
+        self.capacidad = capacidad
+        self.opciones = opciones
+        self.aciertos = 0
+        self.calculos = 0
+        self.agrupadas = 0
+        self._rankings = OrderedDict()
+        self._en_curso = {}
+        self._cerrojo = threading.Lock()
+
+    def obtener(self, origen=None, lat=None, lng=None, radio_km=None, top_k=None):
+        """
+        Devuelve el ranking de un origen, de la caché, de un cálculo en curso o calculándolo.
+
+        Args:
+            origen (str, optional): Dirección de origen
+            lat (float, optional): Latitud del origen (junto con lng, en lugar de la dirección)
+            lng (float, optional): Longitud del origen
+            radio_km (float, optional): Sólo se calculan trayectos a centros a menos de este radio en línea recta
+            top_k (int, optional): Sólo se calculan trayectos a los K centros más cercanos en línea recta
+
+        Returns:
+            tuple: (Ranking, procedencia) con procedencia 'cache', 'agrupada' o 'calculada'
+
+        Raises:
+            ValueError: Si no se indica ni dirección ni coordenadas
+        """
+        origen_normalizado = normalizar_origen(origen, lat, lng)
+        # Motores distintos dan rankings distintos para el mismo origen
+        clave = (obtener_motor().modo, origen_normalizado, radio_km, top_k)
+
+        with self._cerrojo:
+            ranking = self._rankings.get(clave)
+            if ranking is not None:
+                self._rankings.move_to_end(clave)
+                self.aciertos += 1
+                return ranking, "cache"
+            futuro = self._en_curso.get(clave)
+            if futuro is not None:
+                self.agrupadas += 1
+                calcular = False
+            else:
+                futuro = self._en_curso[clave] = Future()
+                calcular = True
+
+        if not calcular:
+            return futuro.result(), "agrupada"
+
+        try:
+            ranking = self._calcular(origen_normalizado if lat is not None and lng is not None else origen.strip(), radio_km, top_k)
+        except BaseException as error:
+            with self._cerrojo:
+                del self._en_curso[clave]
+            futuro.set_exception(error)
+            raise
+
+        with self._cerrojo:
+            self.calculos += 1
+            del self._en_curso[clave]
+            # Un ranking sin ningún centro suele deberse a un fallo del motor: no se guarda
+            if len(ranking.centros):
+                self._rankings[clave] = ranking
+                while len(self._rankings) > self.capacidad:
+                    self._rankings.popitem(last=False)
+        futuro.set_result(ranking)
+        return ranking, "calculada"
+
+    def _calcular(self, origen, radio_km, top_k):
+        inicio = time.perf_counter()
+        centros = cargar_csv_centros(self.csv_centros, origen, radio_km=radio_km, top_k=top_k, **self.opciones)
+        enriquecer_centros(centros, self.bilingues, self.compensatorios)
+        coleccion = CentroCollection.desde_centros(centros).ordenar("duracion")
+        return Ranking(origen, coleccion, time.perf_counter() - inicio)
+
+    def estadisticas(self):
+        """
+        Devuelve los contadores de uso del servicio.
+
+        Returns:
+            dict: Aciertos, cálculos, peticiones agrupadas y rankings en memoria
+        """
+        with self._cerrojo:
+            return {
+                "aciertos": self.aciertos,
+                "calculos": self.calculos,
+                "agrupadas": self.agrupadas,
+                "rankings": len(self._rankings),
+                "en_curso": len(self._en_curso),
+            }
@@ -0,0 +1,237 @@
+import os
+
+import numpy as np
+
+from services.buscador import IndiceBusqueda
+from services.enriquecimiento import indexar_bilingues, indexar_compensatorios
+from services.geo import parsear_decimales
+from services.ingesta import (COLUMNAS_REGISTRO, MarcasNiveles, columnas_niveles, leer_columnas, leer_encabezados,
+                              normalizar_codigos)
+from services.instantanea_binaria import ArchivoMapeado, ColumnaTexto, TablaCadenas, codificar_textos, escribir_secciones, hash_fichero
+
+# Atributos de texto del registro, en el orden de sus columnas
+ATRIBUTOS_TEXTO = ("codigos", "nombres", "tipos", "publico_privado", "domicilios", "localidades", "municipios",
+                   "provincias", "codigos_postales")
+# Atributos numéricos y marcas, que se guardan tal cual en la instantánea binaria
+ATRIBUTOS_ARRAY = ("latitudes", "longitudes", "bilingue", "compensatorio")
+
+# Versión de las secciones de la instantánea binaria del registro: las de otra versión se descartan
+FORMATO_BINARIO = 2
+
+
+class RegistroCentros:
+    """
+    Registro completo de centros de la Junta (da_centros.csv) cargado en memoria por columnas.
+
+    Cada atributo es una lista o array con un valor por centro, en el orden del fichero,
+    y se completa con las marcas de bilingüe y compensatorio de sus ficheros respectivos.
+
+    Attributes:
+        codigos, nombres, tipos, publico_privado, domicilios, localidades, municipios,
+        provincias, codigos_postales (list): Columnas de texto del registro
+        latitudes, longitudes (np.ndarray): Coordenadas en grados (NaN si faltan)
+        bilingue, compensatorio (np.ndarray): Marcas booleanas por centro
+        niveles (MarcasNiveles): Marcas S/N de régimen y enseñanza, empaquetadas en bits
+    """
+
+    def __init__(self, csv_registro, csv_bilingues=None, csv_compensatorios=None):
+        """
+        Args:
+            csv_registro (str): Ruta a da_centros.csv (iso-8859-1, delimitador ';')
+            csv_bilingues (str, optional): Ruta a da_centros_bilingues.csv (iso-8859-1, delimitador ';')
+            csv_compensatorios (str, optional): Ruta a centros_compensatoria.csv (utf-8)
+        """
+        # Sólo se leen las columnas que se usan y las marcas de enseñanzas, de una vez
+        niveles = columnas_niveles(leer_encabezados(csv_registro))
+        datos = leer_columnas(csv_registro, [*COLUMNAS_REGISTRO, *niveles], categorias=niveles)
+        columnas = {columna: datos[columna].str.strip().tolist() for columna in COLUMNAS_REGISTRO
+                    if columna not in ("N_LATITUD", "N_LONGITUD")}
+
+        self.codigos = columnas["codigo"]
+        self.nombres = columnas["D_ESPECIFICA"]
+        self.tipos = columnas["D_DENOMINA"]
+        self.publico_privado = columnas["D_TIPO"]
+        self.domicilios = columnas["D_DOMICILIO"]
+        self.localidades = columnas["D_LOCALIDAD"]
+        self.municipios = columnas["D_MUNICIPIO"]
+        self.provincias = columnas["D_PROVINCIA"]
+        self.codigos_postales = columnas["C_POSTAL"]
+        self.latitudes = parsear_decimales(datos["N_LATITUD"])
+        self.longitudes = parsear_decimales(datos["N_LONGITUD"])
+        self.niveles = MarcasNiveles.desde_columnas(datos, niveles)
+
+        self.bilingue = np.zeros(len(self.codigos), dtype=bool)
+        self.compensatorio = np.zeros(len(self.codigos), dtype=bool)
+        claves = normalizar_codigos(datos["codigo"]).tolist()
+        if csv_bilingues:
+            bilingues = indexar_bilingues(csv_bilingues)
+            self.bilingue[:] = [clave in bilingues for clave in claves]
+        if csv_compensatorios:
+            compensatorios = indexar_compensatorios(csv_compensatorios)
+            self.compensatorio[:] = [clave in compensatorios for clave in claves]
+
+        self._mascaras = {}
+
+    @classmethod
+    def desde_binario(cls, archivo):
+        """
+        Construye el registro sobre una instantánea binaria mapeada, sin leer los CSV.
+
+        Args:
+            archivo (ArchivoMapeado): Fichero escrito por escribir_binario_registro
+
+        Returns:
+            RegistroCentros: Registro cuyas columnas son vistas sobre el mapa
+        """
+        registro = cls.__new__(cls)
+        tabla = TablaCadenas(archivo)
+        for atributo in ATRIBUTOS_TEXTO:
+            setattr(registro, atributo, ColumnaTexto(archivo.array(f"registro.{atributo}"), tabla))
+        for atributo in ATRIBUTOS_ARRAY:
+            setattr(registro, atributo, archivo.array(f"registro.{atributo}"))
+        registro.niveles = MarcasNiveles.desde_archivo(archivo, "registro.niveles")
+        registro._mascaras = {}
+        return registro
+
+    def secciones(self):
+        """
+        Secciones de la instantánea binaria con las columnas del registro.
+
+        Returns:
+            dict: Nombre de sección -> array
+        """
+        ids, secciones = codificar_textos({atributo: getattr(self, atributo) for atributo in ATRIBUTOS_TEXTO})
+        for atributo, valores in ids.items():
+            secciones[f"registro.{atributo}"] = valores
+        for atributo in ATRIBUTOS_ARRAY:
+            secciones[f"registro.{atributo}"] = getattr(self, atributo)
+        secciones.update(self.niveles.secciones("registro.niveles"))
+        return secciones
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def mascara(self, tipo=None, publico_privado=None, bilingue=None, compensatorio=None, ensenanzas=None):
+        """
+        Construye la máscara booleana de los centros que cumplen los filtros de atributos.
+
+        Args:
+            tipo (str, optional): Denominación exacta (D_DENOMINA)
+            publico_privado (str, optional): 'Público' o 'Privado' (D_TIPO)
+            bilingue (bool, optional): Sólo bilingües (True) o sólo no bilingües (False)
+            compensatorio (bool, optional): Sólo compensatorios (True) o sólo no compensatorios (False)
+            ensenanzas (list, optional): Columnas de marcas que el centro debe tener todas a "S"
+                                         (p. ej. ['pub_bach_ord', 'pub_eso'])
+
+        Returns:
+            np.ndarray: Máscara booleana, o None si no hay ningún filtro
+
+        Raises:
+            ValueError: Si alguna enseñanza no es una columna de marcas del registro
+        """
+        mascaras = []
+        if tipo:
+            mascaras.append(self._mascara_valor("tipos", tipo))
+        if publico_privado:
+            mascaras.append(self._mascara_valor("publico_privado", publico_privado))
+        if bilingue is not None:
+            mascaras.append(self.bilingue if bilingue else ~self.bilingue)
+        if compensatorio is not None:
+            mascaras.append(self.compensatorio if compensatorio else ~self.compensatorio)
+        if ensenanzas:
+            mascaras.append(self.niveles.mascara(ensenanzas))
+        if not mascaras:
+            return None
+        return np.logical_and.reduce(mascaras)
+
+    def _mascara_valor(self, columna, valor):
+        # Las máscaras por valor se calculan la primera vez y se reutilizan
+        clave = (columna, valor)
+        if clave not in self._mascaras:
+            datos = getattr(self, columna)
+            if isinstance(datos, ColumnaTexto):
+                self._mascaras[clave] = datos.igual_a(valor)
+            else:
+                self._mascaras[clave] = np.array([dato == valor for dato in datos], dtype=bool)
+        return self._mascaras[clave]
+
+    def centro(self, posicion):
+        """
+        Devuelve los datos de un centro listos para serializar a JSON.
+
+        Args:
+            posicion (int): Posición del centro en el registro
+
+        Returns:
+            dict: Datos del centro
+        """
+        return {
+            "codigo": self.codigos[posicion],
+            "nombre": self.nombres[posicion],
+            "tipo": self.tipos[posicion],
+            "publico_privado": self.publico_privado[posicion],
+            "domicilio": self.domicilios[posicion],
+            "localidad": self.localidades[posicion],
+            "municipio": self.municipios[posicion],
+            "provincia": self.provincias[posicion],
+            "codigo_postal": self.codigos_postales[posicion],
+            "latitud": float(self.latitudes[posicion]),
+            "longitud": float(self.longitudes[posicion]),
+            "bilingue": bool(self.bilingue[posicion]),
+            "compensatorio": bool(self.compensatorio[posicion]),
+            "ensenanzas": self.niveles.de_centro(posicion),
+        }
+
+
+def escribir_binario_registro(ruta_binaria, csv_registro, csv_bilingues=None, csv_compensatorios=None):
+    """
+    Escribe la instantánea binaria del registro y de su índice de búsqueda, para que los
+    procesos de la API la mapeen en memoria en lugar de leer los CSV y construir el índice.
+
+    Args:
+        ruta_binaria (str): Ruta del fichero binario (se sustituye de una vez)
+        csv_registro (str): Ruta a da_centros.csv
+        csv_bilingues (str, optional): Ruta a da_centros_bilingues.csv
+        csv_compensatorios (str, optional): Ruta a centros_compensatoria.csv
+    """
+    registro = RegistroCentros(csv_registro, csv_bilingues, csv_compensatorios)
+    secciones = registro.secciones()
+    secciones.update(IndiceBusqueda.desde_registro(registro).secciones())
+    metadatos = {"formato": FORMATO_BINARIO, "fuentes": _huellas(csv_registro, csv_bilingues, csv_compensatorios),
+                 "centros": len(registro)}
+    escribir_secciones(ruta_binaria, metadatos, secciones)
+    print(f"Instantánea binaria del registro ({len(registro)} centros) en '{ruta_binaria}'.")
+
+
+def cargar_registro(csv_registro, csv_bilingues=None, csv_compensatorios=None, ruta_binaria=None):
+    """
+    Carga el registro y su índice de búsqueda, mapeando la instantánea binaria si existe y
+    se escribió a partir de los mismos CSV; si no, los lee y construye el índice.
+
+    Args:
+        csv_registro (str): Ruta a da_centros.csv
+        csv_bilingues (str, optional): Ruta a da_centros_bilingues.csv
+        csv_compensatorios (str, optional): Ruta a centros_compensatoria.csv
+        ruta_binaria (str, optional): Ruta de la instantánea binaria
+
+    Returns:
+        tuple: (RegistroCentros, IndiceBusqueda)
+    """
+    if ruta_binaria and os.path.exists(ruta_binaria):
+        try:
+            archivo = ArchivoMapeado(ruta_binaria)
+        except (OSError, ValueError) as e:
+            print(f"No se pudo mapear la instantánea binaria del registro: {e}")
+        else:
+            if (archivo.metadatos.get("formato") == FORMATO_BINARIO
+                    and archivo.metadatos.get("fuentes") == _huellas(csv_registro, csv_bilingues, csv_compensatorios)):
+                return RegistroCentros.desde_binario(archivo), IndiceBusqueda.desde_binario(archivo)
+            print(f"La instantánea binaria '{ruta_binaria}' no corresponde a los CSV actuales o a esta versión: se leen los CSV")
+
+    registro = RegistroCentros(csv_registro, csv_bilingues, csv_compensatorios)
+    return registro, IndiceBusqueda.desde_registro(registro)
+
+
+def _huellas(*rutas):
+    # Hash de cada fichero de origen: la instantánea sólo vale si ninguno ha cambiado
+    return [hash_fichero(ruta) if ruta else None for ruta in rutas]
@@ -0,0 +1,162 @@
+# Servidor HTTP local que imita las respuestas JSON de la Distance Matrix API y de la
+# Geocoding API de Google Maps. Sirve para probar y medir el cálculo de distancias sin
+# clave, sin red y sin coste: basta con arrancarlo y apuntar GOOGLE_MAPS_BASE_URL a él.
+#
+#   python backend/app/services/servidor_google_falso.py --puerto 8765
+#   GOOGLE_MAPS_BASE_URL=http://127.0.0.1:8765 GOOGLE_MAPS_API_KEY=AIzaFalsa python ...
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+if __package__ in (None, ""):
+    # Ejecutado como script: los servicios se importan relativos a backend/app
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.unidades import formatear_distancia, formatear_duracion
+
+# Velocidad media y factor de rodeo usados para inventar trayectos coherentes
+VELOCIDAD_KMH = 60.0
+FACTOR_CARRETERA = 1.3
+_PATRON_COORDENADAS = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+def _coordenadas(texto):
+    """
+    Obtiene unas coordenadas deterministas para un origen o destino.
+    Si el texto ya es "lat,lng" se usan esas; si es una dirección se derivan de su hash
+    dentro del recuadro de Andalucía, de modo que la misma dirección da siempre el mismo punto.
+    """
+    coincidencia = _PATRON_COORDENADAS.match(texto)
+    if coincidencia:
+        return float(coincidencia.group(1)), float(coincidencia.group(2))
+    resumen = hashlib.sha1(texto.strip().casefold().encode("utf-8")).digest()
+    lat = 36.0 + 2.7 * int.from_bytes(resumen[:4], "big") / 2**32
+    lng = -7.5 + 5.7 * int.from_bytes(resumen[4:8], "big") / 2**32
+    return lat, lng
+
+
+def _haversine_km(origen, destino):
+    lat1, lng1 = map(math.radians, origen)
+    lat2, lng2 = map(math.radians, destino)
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * 6371.0088 * math.asin(math.sqrt(a))
+
+
+def elemento_matriz(origen, destino):
+    """
+    Calcula el elemento de la matriz para un par origen/destino.
+
+    Args:
+        origen (str): Dirección o "lat,lng" de origen
+        destino (str): Dirección o "lat,lng" de destino
+
+    Returns:
+        dict: Elemento con el mismo formato que la Distance Matrix API
+    """
+    if not destino.strip() or "SIN DETERMINAR" in destino.upper():
+        return {"status": "NOT_FOUND"}
+    metros = int(_haversine_km(_coordenadas(origen), _coordenadas(destino)) * FACTOR_CARRETERA * 1000)
+    segundos = int(metros / 1000 / VELOCIDAD_KMH * 3600)
+    return {
+        "status": "OK",
+        "distance": {"text": formatear_distancia(metros), "value": metros},
+        "duration": {"text": formatear_duracion(segundos), "value": segundos},
+    }
+
+
+class ManejadorGoogleFalso(BaseHTTPRequestHandler):
+    """
+    Atiende las rutas /maps/api/distancematrix/json y /maps/api/geocode/json.
+    """
+
+    # Probabilidad de contestar OVER_QUERY_LIMIT, para probar reintentos y esperas
+    probabilidad_sobrecuota = 0.0
+    peticiones = 0
+    _cerrojo = threading.Lock()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parametros = {clave: valores[0] for clave, valores in parse_qs(url.query).items()}
+        with self._cerrojo:
+            ManejadorGoogleFalso.peticiones += 1
+
+        if random.random() < self.probabilidad_sobrecuota:
+            self._responder({"status": "OVER_QUERY_LIMIT", "rows": []})
+        elif url.path == "/maps/api/distancematrix/json":
+            self._responder(self._matriz(parametros))
+        elif url.path == "/maps/api/geocode/json":
+            self._responder(self._geocodificar(parametros))
+        else:
+            self.send_error(404)
+
+    def _matriz(self, parametros):
+        origenes = parametros.get("origins", "").split("|")
+        destinos = parametros.get("destinations", "").split("|")
+        if len(origenes) * len(destinos) > 100 or len(origenes) > 25 or len(destinos) > 25:
+            return {"status": "MAX_ELEMENTS_EXCEEDED", "rows": []}
+        return {
+            "status": "OK",
+            "origin_addresses": origenes,
+            "destination_addresses": destinos,
+            "rows": [{"elements": [elemento_matriz(origen, destino) for destino in destinos]} for origen in origenes],
+        }
+
+    def _geocodificar(self, parametros):
+        direccion = parametros.get("address", "")
+        if not direccion.strip():
+            return {"status": "ZERO_RESULTS", "results": []}
+        lat, lng = _coordenadas(direccion)
+        return {
+            "status": "OK",
+            "results": [{"formatted_address": direccion, "geometry": {"location": {"lat": lat, "lng": lng}}}],
+        }
+
+    def _responder(self, cuerpo):
+        contenido = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(contenido)))
+        self.end_headers()
+        self.wfile.write(contenido)
+
+    def log_message(self, formato, *args):
+        # Sin una línea por petición: en los benchmarks habría miles
+        pass
+
+
+def iniciar_servidor(puerto=0, probabilidad_sobrecuota=0.0):
+    """
+    Arranca el servidor falso en un hilo en segundo plano.
+
+    Args:
+        puerto (int): Puerto de escucha (0 elige uno libre)
+        probabilidad_sobrecuota (float): Fracción de peticiones que responderán OVER_QUERY_LIMIT
+
+    Returns:
+        tuple: (servidor, URL base para GOOGLE_MAPS_BASE_URL)
+    """
+    ManejadorGoogleFalso.probabilidad_sobrecuota = probabilidad_sobrecuota
+    servidor = ThreadingHTTPServer(("127.0.0.1", puerto), ManejadorGoogleFalso)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local que imita la Distance Matrix API de Google")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--sobrecuota", type=float, default=0.0, help="Probabilidad de responder OVER_QUERY_LIMIT")
+    argumentos = parser.parse_args()
+
+    ManejadorGoogleFalso.probabilidad_sobrecuota = argumentos.sobrecuota
+    servidor = ThreadingHTTPServer(("127.0.0.1", argumentos.puerto), ManejadorGoogleFalso)
+    print(f"Servidor falso de Google Maps escuchando en http://127.0.0.1:{argumentos.puerto}")
+    servidor.serve_forever()
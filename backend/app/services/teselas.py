@@ -0,0 +1,118 @@
+import math
+
+import numpy as np
+
+# Zoom máximo de las teselas (18 es el nivel de calle de los mapas web)
+ZOOM_MAXIMO = 18
+
+# Celdas de agrupación por lado de tesela: con teselas de 256 px, grupos de 64 px
+CELDAS_POR_TESELA = 4
+
+# Latitud máxima de la proyección Web Mercator
+LATITUD_MAXIMA = 85.05112878
+
+
+class TeselasCentros:
+    """
+    Agrupación por rejilla de los centros para dibujarlos en un mapa por teselas (z/x/y).
+
+    Para cada zoom, cada tesela se divide en CELDAS_POR_TESELA × CELDAS_POR_TESELA celdas y
+    los centros de una misma celda se agrupan en un punto con su número de centros. Al cargar
+    se calcula, para cada zoom, la clave (tesela, celda) de cada centro y se ordenan los
+    centros por ella: los de una tesela quedan contiguos y se leen con una búsqueda binaria.
+    Los grupos sin filtros también se calculan al cargar; con filtros se recuentan sólo los
+    centros de la tesela pedida.
+    """
+
+    def __init__(self, latitudes, longitudes, zoom_maximo=ZOOM_MAXIMO, celdas=CELDAS_POR_TESELA):
+        """
+        Args:
+            latitudes (np.ndarray): Latitud de cada centro en grados (NaN si se desconoce)
+            longitudes (np.ndarray): Longitud de cada centro en grados (NaN si se desconoce)
+            zoom_maximo (int): Zoom más detallado que se sirve
+            celdas (int): Celdas de agrupación por lado de tesela
+        """
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.zoom_maximo = zoom_maximo
+        self.celdas = celdas
+
+        validos = np.flatnonzero(~(np.isnan(self.latitudes) | np.isnan(self.longitudes)))
+        # Coordenadas Web Mercator normalizadas a [0, 1): x hacia el este, y hacia el sur
+        x, y = _mercator(self.latitudes[validos], self.longitudes[validos])
+
+        self.niveles = []
+        for zoom in range(zoom_maximo + 1):
+            lado = (1 << zoom) * celdas
+            columna = np.minimum((x * lado).astype(np.int64), lado - 1)
+            fila = np.minimum((y * lado).astype(np.int64), lado - 1)
+            # Clave ordenable: tesela (x, y) y, dentro de ella, celda (columna, fila)
+            tesela = ((columna // celdas) << zoom) | (fila // celdas)
+            claves = tesela * celdas * celdas + (columna % celdas) * celdas + fila % celdas
+
+            orden = np.argsort(claves, kind="stable")
+            claves = claves[orden]
+            posiciones = validos[orden]
+            grupos, inicios, cuentas = np.unique(claves, return_index=True, return_counts=True)
+            self.niveles.append({
+                "claves": claves,
+                "posiciones": posiciones,
+                # Grupos sin filtros: clave de la celda, número de centros, suma de coordenadas y primer centro
+                "grupos": grupos,
+                "cuentas": cuentas,
+                "suma_lat": np.add.reduceat(self.latitudes[posiciones], inicios) if len(inicios) else np.empty(0),
+                "suma_lng": np.add.reduceat(self.longitudes[posiciones], inicios) if len(inicios) else np.empty(0),
+                "primeros": posiciones[inicios],
+            })
+
+    def tesela(self, zoom, x, y, mascara=None):
+        """
+        Agrupa los centros de una tesela.
+
+        Args:
+            zoom (int): Zoom de la tesela (0 a zoom_maximo)
+            x (int): Columna de la tesela (0 a 2^zoom - 1, de oeste a este)
+            y (int): Fila de la tesela (0 a 2^zoom - 1, de norte a sur)
+            mascara (np.ndarray, optional): Máscara booleana de los centros admisibles
+
+        Returns:
+            tuple: (lista de grupos de varios centros como (lat, lng, número de centros) en el
+                   centroide de sus centros, posiciones de los centros que quedan solos en su celda)
+
+        Raises:
+            ValueError: Si la tesela no existe
+        """
+        if not 0 <= zoom <= self.zoom_maximo or not (0 <= x < 1 << zoom and 0 <= y < 1 << zoom):
+            raise ValueError(f"La tesela {zoom}/{x}/{y} no existe (zoom de 0 a {self.zoom_maximo})")
+        nivel = self.niveles[zoom]
+        por_tesela = self.celdas * self.celdas
+        base = ((x << zoom) | y) * por_tesela
+
+        if mascara is None:
+            inicio, fin = np.searchsorted(nivel["grupos"], [base, base + por_tesela])
+            cuentas = nivel["cuentas"][inicio:fin]
+            suma_lat, suma_lng = nivel["suma_lat"][inicio:fin], nivel["suma_lng"][inicio:fin]
+            primeros = nivel["primeros"][inicio:fin]
+        else:
+            inicio, fin = np.searchsorted(nivel["claves"], [base, base + por_tesela])
+            posiciones = nivel["posiciones"][inicio:fin]
+            admitidos = mascara[posiciones]
+            posiciones = posiciones[admitidos]
+            _, primeros_en_tesela, grupo, cuentas = np.unique(nivel["claves"][inicio:fin][admitidos], return_index=True,
+                                                              return_inverse=True, return_counts=True)
+            suma_lat = np.bincount(grupo, self.latitudes[posiciones], minlength=len(cuentas))
+            suma_lng = np.bincount(grupo, self.longitudes[posiciones], minlength=len(cuentas))
+            primeros = posiciones[primeros_en_tesela]
+
+        varios = cuentas > 1
+        grupos = list(zip((suma_lat[varios] / cuentas[varios]).tolist(), (suma_lng[varios] / cuentas[varios]).tolist(),
+                          cuentas[varios].tolist()))
+        return grupos, primeros[~varios]
+
+
+def _mercator(latitudes, longitudes):
+    # Proyección Web Mercator (la de las teselas de OpenStreetMap) normalizada a [0, 1)
+    latitudes = np.radians(np.clip(latitudes, -LATITUD_MAXIMA, LATITUD_MAXIMA))
+    x = (longitudes + 180.0) / 360.0
+    y = (1.0 - np.log(np.tan(latitudes) + 1.0 / np.cos(latitudes)) / math.pi) / 2.0
+    return np.clip(x, 0.0, 1.0), np.clip(y, 0.0, 1.0)
@@ -0,0 +1,460 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:
+    # Sin fcntl (Windows) el cerrojo sólo vale dentro del proceso: hay que arrancar la API con un solo worker
+    fcntl = None
+
+from models.CentroCollection import CentroCollection
+from services.almacen_centros import escribir_binario_centros
+from services.csv_service import cargar_csv_centros, exportar_csv_centros
+from services.enriquecimiento import enriquecer_centros, normalizar_codigo
+from services.enrutamiento import obtener_motor
+from services.incremental import duraciones_centros, guardar_instantanea
+from services.metricas import medir_etapa
+
+# Etapas de la reconstrucción de la exportación, en orden
+ETAPAS_RECONSTRUCCION = ("trayectos", "enriquecimiento", "exportacion", "sustitucion")
+
+# Estados de un trabajo que ya no van a cambiar
+ESTADOS_TERMINADOS = ("completado", "fallido", "cancelado")
+
+# Segundos mínimos entre dos escrituras del estado mientras avanza una etapa
+INTERVALO_GUARDADO = 1.0
+
+# Proporción máxima de centros sin trayecto con la que aún se sustituye la exportación: por
+# encima, lo más probable es que falle el motor (clave inválida, caída de Google...), no los centros
+PROPORCION_MAXIMA_SIN_TRAYECTO = 0.5
+
+_PATRON_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class TrabajoCancelado(Exception):
+    """
+    Se ha pedido cancelar el trabajo en curso.
+    """
+
+
+class ExportacionIncompleta(Exception):
+    """
+    Demasiados centros se han quedado sin trayecto: no se sustituye la exportación vigente.
+    """
+
+
+class TrabajoEnCurso(Exception):
+    """
+    Ya hay un trabajo ejecutándose en algún proceso de la API.
+
+    Attributes:
+        id_trabajo (str): Identificador del trabajo en curso, si se conoce
+    """
+
+    def __init__(self, id_trabajo=None):
+        super().__init__(f"Ya hay un trabajo en curso: {id_trabajo}" if id_trabajo else "Ya hay un trabajo en curso")
+        self.id_trabajo = id_trabajo
+
+
+class SeguimientoTrabajo:
+    """
+    Etapa, avance y tiempo restante estimado de un trabajo en curso.
+
+    El estado se guarda en el fichero del trabajo al cambiar de etapa y, mientras avanza una
+    etapa, como mucho una vez por INTERVALO_GUARDADO, para que cualquier proceso de la API
+    pueda consultarlo. Al cambiar de etapa y con cada avance se comprueba si se ha pedido la
+    cancelación; el evento 'cancelado' detiene además las peticiones de trayectos pendientes.
+
+    Attributes:
+        estado (dict): Estado del trabajo tal como se guarda en su fichero
+        cancelado (threading.Event): Se activa cuando se pide la cancelación
+    """
+
+    def __init__(self, gestor, estado):
+        """
+        Args:
+            gestor (GestorTrabajos): Gestor que guarda el estado
+            estado (dict): Estado del trabajo
+        """
+        self.gestor = gestor
+        self.estado = estado
+        self.cancelado = threading.Event()
+        self._inicio_etapa = time.monotonic()
+        self._ultimo_guardado = 0.0
+
+    def etapa(self, nombre):
+        """
+        Cierra la etapa actual y empieza otra.
+
+        Args:
+            nombre (str): Etapa que empieza
+
+        Raises:
+            TrabajoCancelado: Si se ha pedido la cancelación
+        """
+        self.comprobar()
+        self._cerrar_etapa()
+        self.estado["etapa"] = nombre
+        self.estado["etapas"][nombre] = {"inicio": time.time(), "fin": None, "completados": 0, "total": None}
+        self.estado["eta_segundos"] = None
+        self._inicio_etapa = time.monotonic()
+        self.gestor.guardar(self.estado)
+
+    def progreso(self, completados, total):
+        """
+        Registra el avance de la etapa actual y estima lo que le queda al ritmo medio hasta ahora.
+        Tiene la firma de los callbacks de progreso de calcular_distancias_lote.
+
+        Args:
+            completados (int): Elementos resueltos hasta ahora
+            total (int): Elementos totales de la etapa
+        """
+        etapa = self.estado["etapas"][self.estado["etapa"]]
+        etapa["completados"], etapa["total"] = completados, total
+        transcurrido = time.monotonic() - self._inicio_etapa
+        self.estado["eta_segundos"] = round(transcurrido * (total - completados) / completados, 1) if completados else None
+        if self.gestor.cancelacion_pedida(self.estado["id"]):
+            self.cancelado.set()
+        if completados >= total or time.monotonic() - self._ultimo_guardado >= INTERVALO_GUARDADO:
+            self._ultimo_guardado = time.monotonic()
+            self.gestor.guardar(self.estado)
+
+    def comprobar(self):
+        """
+        Raises:
+            TrabajoCancelado: Si se ha pedido la cancelación del trabajo
+        """
+        if self.cancelado.is_set() or self.gestor.cancelacion_pedida(self.estado["id"]):
+            self.cancelado.set()
+            raise TrabajoCancelado()
+
+    def terminar(self, estado, error=None, resultado=None):
+        """
+        Cierra el trabajo con su estado final y lo guarda.
+
+        Args:
+            estado (str): Uno de ESTADOS_TERMINADOS
+            error (str, optional): Descripción del error, si ha fallado
+            resultado (dict, optional): Resultado del trabajo, si ha terminado bien
+        """
+        self._cerrar_etapa()
+        self.estado.update(estado=estado, error=error, resultado=resultado, eta_segundos=None, terminado_en=time.time())
+        self.gestor.guardar(self.estado)
+
+    def _cerrar_etapa(self):
+        actual = self.estado["etapas"].get(self.estado["etapa"])
+        if actual is not None and actual["fin"] is None:
+            actual["fin"] = time.time()
+
+
+class GestorTrabajos:
+    """
+    Ejecuta en segundo plano los trabajos largos del pipeline, en un hilo del proceso de la API.
+
+    Cada trabajo tiene un fichero JSON con su estado en el directorio de trabajos, así que
+    cualquier worker de uvicorn puede consultarlo o pedir su cancelación. Un cerrojo de fichero
+    impide que se ejecute más de un trabajo a la vez entre todos los workers. Si el proceso que
+    ejecutaba un trabajo muere, el cerrojo se libera y el trabajo queda 'en_curso' en disco: el
+    siguiente proceso que arranca lo reanuda (ver reanudar). Lo ya calculado no se pierde
+    porque los trayectos se guardan en la caché de rutas a medida que llegan.
+    """
+
+    def __init__(self, directorio, ejecutar):
+        """
+        Args:
+            directorio (str): Directorio de los ficheros de estado (se crea si no existe)
+            ejecutar (callable): Función (parámetros, SeguimientoTrabajo) que hace el trabajo y
+                                 devuelve su resultado (dict serializable a JSON)
+        """
+        os.makedirs(directorio, exist_ok=True)
+        self.directorio = directorio
+        self.ejecutar = ejecutar
+        self._cerrojo = threading.Lock()
+        self._fichero_cerrojo = None
+        self._hilo = None
+
+    def crear(self, parametros):
+        """
+        Lanza un trabajo nuevo. Si hay uno interrumpido con los mismos parámetros y el mismo motor de
+        trayectos, lo reanuda en su lugar.
+
+        Args:
+            parametros (dict): Parámetros del trabajo (serializables a JSON)
+
+        Returns:
+            dict: Estado del trabajo lanzado
+
+        Raises:
+            TrabajoEnCurso: Si ya hay un trabajo ejecutándose
+        """
+        with self._cerrojo:
+            if not self._adquirir():
+                raise TrabajoEnCurso(self._interrumpido())
+            interrumpido = self.obtener(self._interrumpido())
+            if interrumpido is not None and interrumpido["parametros"] == parametros and interrumpido["motor"] == obtener_motor().modo:
+                return self._lanzar(interrumpido, reanudado=True)
+            if interrumpido is not None:
+                interrumpido.update(estado="fallido", error="Interrumpido y sustituido por otro trabajo", terminado_en=time.time())
+                self.guardar(interrumpido)
+            estado = {
+                "id": uuid.uuid4().hex,
+                "tipo": "reconstruccion",
+                "estado": "en_curso",
+                "parametros": parametros,
+                "motor": obtener_motor().modo,
+                "creado_en": time.time(),
+                "terminado_en": None,
+                "etapa": None,
+                "etapas": {},
+                "eta_segundos": None,
+                "reanudaciones": 0,
+                "error": None,
+                "resultado": None,
+            }
+            return self._lanzar(estado)
+
+    def reanudar(self):
+        """
+        Reanuda el trabajo que quedó 'en_curso' porque murió el proceso que lo ejecutaba.
+        Se llama al arrancar el servidor de la API; si otro proceso ya lo está ejecutando no hace nada.
+        Si el motor de trayectos configurado no es con el que empezó, el trabajo no se reanuda
+        (sus trayectos no serían comparables) y se da por fallido.
+
+        Returns:
+            dict: Estado del trabajo reanudado, o None si no había ninguno
+        """
+        with self._cerrojo:
+            if self._interrumpido() is None or not self._adquirir():
+                return None
+            # Se vuelve a leer con el cerrojo tomado: puede haber terminado mientras tanto
+            interrumpido = self.obtener(self._interrumpido())
+            if interrumpido is None:
+                self._liberar()
+                return None
+            if interrumpido["motor"] != obtener_motor().modo:
+                interrumpido.update(estado="fallido", terminado_en=time.time(),
+                                    error=f"Interrumpido con el motor de trayectos '{interrumpido['motor']}' y ahora "
+                                          f"está configurado '{obtener_motor().modo}': no se reanuda")
+                self.guardar(interrumpido)
+                self._liberar()
+                print(f"No se reanuda el trabajo {interrumpido['id']}: {interrumpido['error']}.")
+                return None
+            print(f"Reanudando el trabajo {interrumpido['id']} (etapa {interrumpido['etapa']}).")
+            return self._lanzar(interrumpido, reanudado=True)
+
+    def obtener(self, id_trabajo):
+        """
+        Lee el estado de un trabajo.
+
+        Args:
+            id_trabajo (str): Identificador del trabajo
+
+        Returns:
+            dict: Estado del trabajo, o None si no existe
+        """
+        if not id_trabajo or not _PATRON_ID.fullmatch(id_trabajo):
+            return None
+        try:
+            with open(self._ruta(id_trabajo), mode="r", encoding="utf-8") as file:
+                estado = json.load(file)
+        except FileNotFoundError:
+            return None
+        estado["cancelacion_pedida"] = estado["estado"] == "en_curso" and self.cancelacion_pedida(id_trabajo)
+        return estado
+
+    def cancelar(self, id_trabajo):
+        """
+        Pide la cancelación de un trabajo. El proceso que lo ejecuta la atiende en su siguiente
+        avance: deja de enviar peticiones de trayectos y no sustituye la exportación.
+
+        Args:
+            id_trabajo (str): Identificador del trabajo
+
+        Returns:
+            dict: Estado del trabajo, o None si no existe
+        """
+        estado = self.obtener(id_trabajo)
+        if estado is None or estado["estado"] in ESTADOS_TERMINADOS:
+            return estado
+        with open(self._ruta(id_trabajo, ".cancelar"), mode="w", encoding="utf-8"):
+            pass
+        estado["cancelacion_pedida"] = True
+        return estado
+
+    def cancelacion_pedida(self, id_trabajo):
+        return os.path.exists(self._ruta(id_trabajo, ".cancelar"))
+
+    def guardar(self, estado):
+        """
+        Guarda el estado de un trabajo, sustituyendo el fichero de una vez.
+
+        Args:
+            estado (dict): Estado del trabajo
+        """
+        ruta = self._ruta(estado["id"])
+        temporal = f"{ruta}.tmp"
+        with open(temporal, mode="w", encoding="utf-8") as file:
+            json.dump({clave: valor for clave, valor in estado.items() if clave != "cancelacion_pedida"}, file,
+                      ensure_ascii=False, indent=2)
+        os.replace(temporal, ruta)
+
+    def esperar(self, timeout=None):
+        """
+        Espera a que termine el trabajo lanzado por este proceso (para scripts y pruebas).
+
+        Returns:
+            bool: True si no queda ningún trabajo en ejecución en este proceso
+        """
+        hilo = self._hilo
+        if hilo is not None:
+            hilo.join(timeout)
+        return hilo is None or not hilo.is_alive()
+
+    def _lanzar(self, estado, reanudado=False):
+        # Se llama con el cerrojo de fichero tomado; el hilo lo libera al terminar
+        if reanudado:
+            estado["reanudaciones"] += 1
+        self.guardar(estado)
+        seguimiento = SeguimientoTrabajo(self, estado)
+        self._hilo = threading.Thread(target=self._ejecutar, args=(seguimiento,), name=f"trabajo-{estado['id']}", daemon=True)
+        self._hilo.start()
+        return dict(estado, cancelacion_pedida=False)
+
+    def _ejecutar(self, seguimiento):
+        id_trabajo = seguimiento.estado["id"]
+        try:
+            resultado = self.ejecutar(seguimiento.estado["parametros"], seguimiento)
+        except TrabajoCancelado:
+            print(f"Trabajo {id_trabajo} cancelado.")
+            seguimiento.terminar("cancelado")
+        except Exception as e:
+            print(f"El trabajo {id_trabajo} ha fallado: {e}")
+            seguimiento.terminar("fallido", error=f"{type(e).__name__}: {e}")
+        else:
+            seguimiento.terminar("completado", resultado=resultado)
+        finally:
+            try:
+                os.remove(self._ruta(id_trabajo, ".cancelar"))
+            except FileNotFoundError:
+                pass
+            with self._cerrojo:
+                self._liberar()
+
+    def _interrumpido(self):
+        # Identificador del trabajo que figura en curso en disco, si hay alguno
+        for nombre in os.listdir(self.directorio):
+            id_trabajo, extension = os.path.splitext(nombre)
+            if extension == ".json" and _PATRON_ID.fullmatch(id_trabajo):
+                estado = self.obtener(id_trabajo)
+                if estado is not None and estado["estado"] == "en_curso":
+                    return id_trabajo
+        return None
+
+    def _adquirir(self):
+        # Cerrojo entre procesos: el sistema lo suelta solo si el proceso muere
+        if self._hilo is not None and self._hilo.is_alive():
+            return False
+        if fcntl is None:
+            return True
+        fichero = open(os.path.join(self.directorio, ".cerrojo"), mode="a")
+        try:
+            fcntl.flock(fichero.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fichero.close()
+            return False
+        self._fichero_cerrojo = fichero
+        return True
+
+    def _liberar(self):
+        if self._fichero_cerrojo is not None:
+            fcntl.flock(self._fichero_cerrojo.fileno(), fcntl.LOCK_UN)
+            self._fichero_cerrojo.close()
+            self._fichero_cerrojo = None
+
+    def _ruta(self, id_trabajo, extension=".json"):
+        return os.path.join(self.directorio, f"{id_trabajo}{extension}")
+
+
+def reconstruir_exportacion(csv_coincidencias, csv_exportado, origen, ruta_binaria=None, csv_instantanea=None,
+                            csv_bilingues=None, csv_compensatorios=None, radio_km=None, top_k=None,
+                            seguimiento=None, proporcion_maxima_sin_trayecto=PROPORCION_MAXIMA_SIN_TRAYECTO,
+                            **opciones):
+    """
+    Calcula los trayectos, cruza los centros con los ficheros de bilingües y compensatorios
+    en memoria y sustituye la exportación y su instantánea binaria.
+
+    La exportación nueva se escribe aparte y sólo se sustituye al final, primero la instantánea
+    binaria y después el CSV: hasta entonces la API sigue sirviendo la anterior, y un proceso
+    que vea la binaria nueva antes que el CSV la descarta porque no corresponde al CSV vigente.
+
+    Args:
+        csv_coincidencias (str): Centros a exportar (formato de coincidencias.csv)
+        csv_exportado (str): Exportación a sustituir
+        origen (str): Dirección de origen de los trayectos
+        ruta_binaria (str, optional): Instantánea binaria de la exportación
+        csv_instantanea (str, optional): Copia de las coincidencias para la próxima actualización incremental
+        csv_bilingues (str, optional): Ruta a da_centros_bilingues.csv
+        csv_compensatorios (str, optional): Ruta a centros_compensatoria.csv
+        radio_km (float, optional): Sólo se calculan trayectos a centros a menos de este radio en línea recta
+        top_k (int, optional): Sólo se calculan trayectos a los K centros más cercanos en línea recta
+        seguimiento (SeguimientoTrabajo, optional): Recibe las etapas y el avance, y puede cancelar
+        proporcion_maxima_sin_trayecto (float): Proporción de centros sin trayecto a partir de la cual
+                                                se abandona la reconstrucción
+        **opciones: Opciones del cálculo concurrente (max_hilos, peticiones_por_segundo, max_reintentos, progreso)
+
+    Returns:
+        dict: Centros exportados y centros sin trayecto
+
+    Raises:
+        TrabajoCancelado: Si se cancela antes de sustituir la exportación (la anterior queda intacta)
+        ExportacionIncompleta: Si ningún centro tiene trayecto, o demasiados se quedan sin él
+                               (la anterior queda intacta)
+    """
+    def etapa(nombre):
+        if seguimiento is not None:
+            seguimiento.etapa(nombre)
+
+    if seguimiento is not None:
+        opciones.update(progreso=seguimiento.progreso, cancelado=seguimiento.cancelado)
+
+    etapa("trayectos")
+    fallidos = []
+    centros = cargar_csv_centros(csv_coincidencias, origen, fallidos=fallidos, radio_km=radio_km, top_k=top_k, **opciones)
+    # Una cancelación durante los trayectos deja centros sin enviar: no es un fallo del motor
+    if seguimiento is not None:
+        seguimiento.comprobar()
+    elif opciones.get("cancelado") is not None and opciones["cancelado"].is_set():
+        raise TrabajoCancelado()
+    intentados = len(centros) + len(fallidos)
+    if not centros or len(fallidos) > proporcion_maxima_sin_trayecto * intentados:
+        raise ExportacionIncompleta(f"{len(fallidos)} de {intentados} centros sin trayecto: se conserva la exportación vigente "
+                                    f"(¿funciona el motor de trayectos '{obtener_motor().modo}'?)")
+
+    etapa("enriquecimiento")
+    enriquecer_centros(centros, csv_bilingues, csv_compensatorios)
+    with medir_etapa("ordenacion"):
+        coleccion = CentroCollection.desde_centros(centros).ordenar("duracion")
+
+    etapa("exportacion")
+    csv_nuevo = f"{csv_exportado}.nuevo"
+    exportar_csv_centros(csv_nuevo, coleccion)
+    if ruta_binaria:
+        binaria_nueva = f"{ruta_binaria}.nuevo"
+        escribir_binario_centros(csv_nuevo, binaria_nueva)
+
+    etapa("sustitucion")
+    if ruta_binaria:
+        os.replace(binaria_nueva, ruta_binaria)
+    os.replace(csv_nuevo, csv_exportado)
+    print(f"Exportados {len(coleccion)} centros a '{csv_exportado}'.")
+
+    if csv_instantanea:
+        # Punto de partida de la próxima actualización incremental
+        guardar_instantanea(csv_coincidencias, csv_instantanea, origen, radio_km, top_k,
+                            pendientes=(normalizar_codigo(centro.codigo_centro) for centro, _ in fallidos),
+                            duraciones=duraciones_centros(centros))
+    return {"centros": len(coleccion), "sin_trayecto": len(fallidos)}
@@ -0,0 +1,95 @@
+import re
+
+# Patrones de los textos que devuelve Google en español ("1 h 5 min", "1,2 km", "850 m")
+_PATRON_DURACION = re.compile(r'(\d+)\s*(h|min)')
+_PATRON_DISTANCIA = re.compile(r'([\d.,]+)\s*(km|m)\b')
+
+
+def duracion_a_segundos(duracion_str):
+    """
+    Convierte una duración en texto ('1h 5 min', '1 h 5 min', '45 min') a segundos.
+
+    Args:
+        duracion_str (str): Duración con el formato de la exportación o el de Google Maps
+
+    Returns:
+        int: Segundos totales, o None si el texto está vacío o no tiene el formato esperado
+
+    Example:
+        >>> duracion_a_segundos('1 h 5 min')
+        3900
+    """
+    if not duracion_str:
+        return None
+    partes = _PATRON_DURACION.findall(duracion_str)
+    if not partes:
+        return None
+    total_minutos = 0
+    for valor, unidad in partes:
+        total_minutos += int(valor) * 60 if unidad == 'h' else int(valor)
+    return total_minutos * 60
+
+
+def distancia_a_metros(distancia_str):
+    """
+    Convierte una distancia en texto ('1,2 km', '850 m') a metros.
+
+    Args:
+        distancia_str (str): Distancia con el formato de Google Maps (coma decimal)
+
+    Returns:
+        int: Metros, o None si el texto está vacío o no tiene el formato esperado
+
+    Example:
+        >>> distancia_a_metros('1,2 km')
+        1200
+    """
+    if not distancia_str:
+        return None
+    coincidencia = _PATRON_DISTANCIA.search(distancia_str)
+    if not coincidencia:
+        return None
+    # El punto es separador de miles y la coma separador decimal ("1.234,5 km")
+    valor = float(coincidencia.group(1).replace('.', '').replace(',', '.'))
+    if coincidencia.group(2) == 'km':
+        valor *= 1000
+    return int(round(valor))
+
+
+def formatear_distancia(metros):
+    """
+    Formatea una distancia en metros como el texto que muestra Google ('1,2 km', '850 m').
+
+    Args:
+        metros (int): Distancia en metros
+
+    Returns:
+        str: Texto de la distancia, o cadena vacía si no hay dato
+    """
+    if metros is None:
+        return ""
+    if metros < 1000:
+        return f"{int(metros)} m"
+    kilometros = metros / 1000
+    if kilometros < 100:
+        return f"{kilometros:.1f} km".replace(".", ",")
+    return f"{kilometros:.0f} km"
+
+
+def formatear_duracion(segundos):
+    """
+    Formatea una duración en segundos como el texto de la exportación ('4 min', '1h 5 min', '2h 0 min').
+
+    Args:
+        segundos (int): Duración en segundos
+
+    Returns:
+        str: Texto de la duración, o cadena vacía si no hay dato
+    """
+    if segundos is None:
+        return ""
+    minutos = max(1, int(round(segundos / 60)))
+    horas, minutos = divmod(minutos, 60)
+    if not horas:
+        return f"{minutos} min"
+    return f"{horas}h {minutos} min"
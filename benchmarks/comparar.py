@@ -0,0 +1,73 @@
+# Compara dos ficheros de resultados de benchmarks/ejecutar.py y señala las regresiones:
+#
+#   python benchmarks/comparar.py benchmarks/resultados/abc1234-10000.json benchmarks/resultados/def5678-10000.json
+#
+# Termina con código 1 si alguna medida empeora más del umbral, para poder usarlo en CI.
+
+import argparse
+import json
+import sys
+
+
+def metrica(resultado):
+    """
+    Devuelve la medida principal de un resultado, donde menos es mejor.
+
+    Returns:
+        tuple: (valor, unidad)
+    """
+    if "mediana_s" in resultado:
+        return resultado["mediana_s"] * 1000, "ms"
+    return resultado["p50_ms"], "ms p50"
+
+
+def comparar(antes, despues, umbral):
+    """
+    Compara las medidas comunes a dos informes.
+
+    Args:
+        antes (dict): Informe de referencia
+        despues (dict): Informe nuevo
+        umbral (float): Cociente despues/antes a partir del cual se considera regresión
+
+    Returns:
+        list: Nombres de las medidas que empeoran más del umbral
+    """
+    if antes.get("filas") != despues.get("filas") or antes.get("motor") != despues.get("motor"):
+        print(f"Aviso: se comparan ejecuciones distintas ({antes.get('filas')} filas/{antes.get('motor')} "
+              f"frente a {despues.get('filas')} filas/{despues.get('motor')})")
+
+    print(f"{'medida':<36} {antes.get('commit', '?'):>12} {despues.get('commit', '?'):>12}  cociente")
+    regresiones = []
+    for nombre, resultado in antes["resultados"].items():
+        if nombre not in despues["resultados"]:
+            continue
+        valor_antes, unidad = metrica(resultado)
+        valor_despues, _ = metrica(despues["resultados"][nombre])
+        cociente = valor_despues / valor_antes if valor_antes else float("inf")
+        marca = ""
+        if cociente > umbral:
+            marca = "  REGRESIÓN"
+            regresiones.append(nombre)
+        elif cociente < 1 / umbral:
+            marca = "  mejora"
+        print(f"{nombre:<36} {valor_antes:>9.2f} {unidad:<2} {valor_despues:>9.2f} {unidad:<2}  {cociente:6.2f}x{marca}")
+    return regresiones
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara dos ejecuciones de los benchmarks")
+    parser.add_argument("antes", help="JSON de referencia")
+    parser.add_argument("despues", help="JSON a comparar")
+    parser.add_argument("--umbral", type=float, default=1.10, help="Cociente máximo tolerado (1.10 = 10 %% más lento)")
+    argumentos = parser.parse_args()
+
+    with open(argumentos.antes, encoding="utf-8") as file:
+        antes = json.load(file)
+    with open(argumentos.despues, encoding="utf-8") as file:
+        despues = json.load(file)
+
+    regresiones = comparar(antes, despues, argumentos.umbral)
+    if regresiones:
+        print(f"{len(regresiones)} medidas empeoran más de un {(argumentos.umbral - 1) * 100:.0f} %: {', '.join(regresiones)}")
+        sys.exit(1)
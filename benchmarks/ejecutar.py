@@ -0,0 +1,247 @@
+# Mide el pipeline de datos y la API sobre un registro sintético y guarda los resultados en JSON,
+# para poder comparar una versión con otra. Se ejecuta desde la raíz del repositorio:
+#
+#   python benchmarks/ejecutar.py --filas 10000
+#   python benchmarks/comparar.py benchmarks/resultados/<antes>.json benchmarks/resultados/<despues>.json
+#
+# Los trayectos se calculan con un motor determinista sin red (google_local por defecto: el cliente
+# de Google contra servidor_google_falso), de modo que dos ejecuciones hacen exactamente el mismo trabajo.
+# Los ficheros generados se guardan en benchmarks/datos/<filas>/data y se reutilizan.
+
+import argparse
+import asyncio
+import contextlib
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(RAIZ, "backend", "app"))
+
+from generar_registro import generar_registro
+
+# Origen fijo de los trayectos, en coordenadas para que cualquier motor lo entienda sin geocodificar
+ORIGEN = "37.1500,-3.6500"
+
+# Peticiones a la API: nombre -> (ruta, cabeceras)
+PETICIONES_API = {
+    "api_centros_completo": ("/api/centros", {}),
+    "api_centros_gzip": ("/api/centros", {"accept-encoding": "gzip"}),
+    "api_centros_304": ("/api/centros", {"if-none-match": None}),
+    "api_centros_filtrado": ("/api/centros?provincia=Granada&orden=duracion&limit=50", {}),
+    "api_centros_pagina": ("/api/centros?orden=nombre&limit=100&offset=500", {}),
+    "api_facetas": ("/api/centros/facetas?provincia=Sevilla", {}),
+    "api_cercanos": ("/api/cercanos?lat=37.18&lng=-3.60&k=20", {}),
+    "api_buscar": ("/api/buscar?q=ies%20gra&limit=10", {}),
+}
+
+
+def medir(funcion, repeticiones, preparar=None):
+    """
+    Ejecuta una función varias veces y devuelve sus tiempos.
+
+    Args:
+        funcion (callable): Función sin argumentos a medir
+        repeticiones (int): Número de ejecuciones
+        preparar (callable, optional): Se llama antes de cada ejecución, fuera de la medida
+
+    Returns:
+        dict: Mediana y mínimo en segundos y número de repeticiones
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        if preparar:
+            preparar()
+        # Los mensajes del pipeline no cuentan en la medida
+        with open(os.devnull, "w", encoding="utf-8") as nulo, contextlib.redirect_stdout(nulo):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+    return {"mediana_s": statistics.median(tiempos), "minimo_s": min(tiempos), "repeticiones": repeticiones}
+
+
+async def peticion_asgi(app, ruta, cabeceras):
+    """
+    Hace una petición GET directamente a la aplicación ASGI, sin red ni servidor.
+
+    Returns:
+        tuple: (código de estado, bytes del cuerpo)
+    """
+    camino, _, consulta = ruta.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": camino,
+        "raw_path": camino.encode(),
+        "query_string": consulta.encode(),
+        "root_path": "",
+        "headers": [(clave.encode(), valor.encode()) for clave, valor in cabeceras.items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    respuesta = {"estado": None, "cuerpo": []}
+
+    async def recibir():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def enviar(mensaje):
+        if mensaje["type"] == "http.response.start":
+            respuesta["estado"] = mensaje["status"]
+        elif mensaje["type"] == "http.response.body":
+            respuesta["cuerpo"].append(mensaje.get("body", b""))
+
+    await app(scope, recibir, enviar)
+    return respuesta["estado"], b"".join(respuesta["cuerpo"])
+
+
+async def medir_api(app, ruta, cabeceras, peticiones, concurrencia):
+    """
+    Mide la latencia de peticiones sucesivas y el rendimiento con varias peticiones a la vez.
+
+    Returns:
+        dict: Percentiles de latencia en ms, peticiones por segundo y tamaño de la respuesta
+    """
+    estado, cuerpo = await peticion_asgi(app, ruta, cabeceras)
+    if estado not in (200, 304):
+        raise RuntimeError(f"{ruta} respondió {estado}: {cuerpo[:200]!r}")
+
+    latencias = []
+    for _ in range(peticiones):
+        inicio = time.perf_counter()
+        await peticion_asgi(app, ruta, cabeceras)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    latencias.sort()
+
+    async def trabajador(numero):
+        for _ in range(numero):
+            await peticion_asgi(app, ruta, cabeceras)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador(peticiones // concurrencia) for _ in range(concurrencia)))
+    total = (peticiones // concurrencia) * concurrencia
+
+    return {
+        "p50_ms": latencias[len(latencias) // 2],
+        "p95_ms": latencias[int(len(latencias) * 0.95) - 1],
+        "p99_ms": latencias[int(len(latencias) * 0.99) - 1],
+        "peticiones_por_segundo": total / (time.perf_counter() - inicio),
+        "estado": estado,
+        "bytes": len(cuerpo),
+    }
+
+
+def commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+def ejecutar(argumentos):
+    """
+    Genera (o reutiliza) el registro sintético, mide cada etapa y devuelve los resultados.
+    """
+    espacio = os.path.join(RAIZ, "benchmarks", "datos", str(argumentos.filas))
+    if not os.path.exists(os.path.join(espacio, "data", "da_centros.csv")):
+        print(f"Generando registro sintético de {argumentos.filas} centros en {espacio}...")
+        generar_registro(argumentos.filas, os.path.join(espacio, "data"))
+
+    # Las rutas de config.py son relativas a "data/": se trabaja dentro del espacio generado
+    os.chdir(espacio)
+    os.environ["CACHE_RUTAS_PATH"] = os.path.join(espacio, "cache_rutas.sqlite3")
+
+    from config import (bin_centros_exportados, bin_registro, csv1, csv2, csv_bilingues, csv_centros_exportados, csv_coincidencias,
+                        csv_compensatorios)
+    from services.almacen_centros import escribir_binario_centros
+    from services.cache_rutas import obtener_cache
+    from services.csv_service import (cargar_csv_centros, coincidencias, cotejar_bilingues, cotejar_compensatorios,
+                                      exportar_csv_centros, ordenar_centros_duracion)
+    from services.enriquecimiento import enriquecer_centros
+    from services.enrutamiento import configurar_motor
+    from services.registro import escribir_binario_registro
+
+    configurar_motor(argumentos.motor)
+    opciones = {"max_hilos": argumentos.max_hilos, "peticiones_por_segundo": argumentos.peticiones_por_segundo}
+    repeticiones = argumentos.repeticiones
+    resultados = {}
+    estado = {}
+
+    def anotar(nombre, resultado):
+        resultados[nombre] = resultado
+        resumen = f"{resultado['mediana_s'] * 1000:.1f} ms" if "mediana_s" in resultado else \
+            f"p50 {resultado['p50_ms']:.2f} ms, {resultado['peticiones_por_segundo']:.0f} pet/s"
+        print(f"  {nombre:<36} {resumen}")
+
+    print(f"Pipeline ({argumentos.filas} centros, motor {argumentos.motor}):")
+    anotar("coincidencias", medir(lambda: coincidencias(csv1, csv2, csv_coincidencias), repeticiones))
+
+    def cargar():
+        estado["centros"] = cargar_csv_centros(csv_coincidencias, ORIGEN, **opciones)
+
+    anotar("cargar_csv_centros_cache_fria", medir(cargar, repeticiones, preparar=obtener_cache().vaciar))
+    anotar("cargar_csv_centros_cache_caliente", medir(cargar, repeticiones))
+    anotar("ordenar_centros_duracion", medir(lambda: estado.update(centros=ordenar_centros_duracion(estado["centros"])), repeticiones))
+    anotar("enriquecer_centros", medir(lambda: enriquecer_centros(estado["centros"], csv_bilingues, csv_compensatorios), repeticiones))
+    anotar("exportar_csv_centros", medir(lambda: exportar_csv_centros(csv_centros_exportados, estado["centros"]), repeticiones))
+    anotar("cotejar_bilingues", medir(lambda: cotejar_bilingues(csv_centros_exportados, csv_bilingues), repeticiones))
+    anotar("cotejar_compensatorios", medir(lambda: cotejar_compensatorios(csv_centros_exportados, csv_compensatorios), repeticiones))
+
+    def escribir_binarios():
+        escribir_binario_centros(csv_centros_exportados, bin_centros_exportados)
+        escribir_binario_registro(bin_registro, csv1, csv_bilingues, csv_compensatorios)
+
+    # La API arranca mapeando las instantáneas binarias, como en producción
+    anotar("escribir_binarios", medir(escribir_binarios, repeticiones))
+
+    print("API:")
+    inicio = time.perf_counter()
+    with open(os.devnull, "w", encoding="utf-8") as nulo, contextlib.redirect_stdout(nulo):
+        main = importlib.import_module("main")
+    arranque = time.perf_counter() - inicio
+    anotar("api_arranque", {"mediana_s": arranque, "minimo_s": arranque, "repeticiones": 1})
+
+    for nombre, (ruta, cabeceras) in PETICIONES_API.items():
+        if "if-none-match" in cabeceras:
+            cabeceras = {"if-none-match": main.almacen_centros.obtener().etag}
+        anotar(nombre, asyncio.run(medir_api(main.app, ruta, cabeceras, argumentos.peticiones, argumentos.concurrencia)))
+
+    return {
+        "commit": commit_actual(),
+        "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "filas": argumentos.filas,
+        "motor": argumentos.motor,
+        "resultados": resultados,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline y de la API sobre un registro sintético")
+    parser.add_argument("--filas", type=int, default=10000, help="Tamaño del registro sintético (10000, 100000, 1000000...)")
+    parser.add_argument("--motor", default="google_local", choices=["google_local", "estimado"], help="Motor de trayectos determinista")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Ejecuciones de cada etapa del pipeline")
+    parser.add_argument("--peticiones", type=int, default=200, help="Peticiones por endpoint de la API")
+    parser.add_argument("--concurrencia", type=int, default=16, help="Peticiones simultáneas al medir el rendimiento")
+    parser.add_argument("--max-hilos", type=int, default=8)
+    # El servidor falso no tiene cuota: se mide el coste propio del pipeline, no la espera de la tasa
+    parser.add_argument("--peticiones-por-segundo", type=float, default=1000.0)
+    parser.add_argument("--salida", help="Fichero JSON de resultados (por defecto benchmarks/resultados/<commit>-<filas>.json)")
+    argumentos = parser.parse_args()
+
+    informe = ejecutar(argumentos)
+    salida = argumentos.salida or os.path.join(RAIZ, "benchmarks", "resultados", f"{informe['commit']}-{argumentos.filas}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, "w", encoding="utf-8") as file:
+        json.dump(informe, file, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {salida}")
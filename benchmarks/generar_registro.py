@@ -0,0 +1,145 @@
+# Genera un registro sintético con el formato de los ficheros de la Junta, para medir el
+# pipeline y la API con tamaños mucho mayores que los datos reales. Se ejecuta desde la raíz:
+#
+#   python benchmarks/generar_registro.py 100000 benchmarks/datos/100000
+#
+# Escribe en el directorio de salida:
+#   da_centros.csv              iso-8859-1, ';', coma decimal, las 87 columnas del registro real
+#   centros_todos.csv           utf-8, códigos con "C" final (un 12 % de los centros)
+#   da_centros_bilingues.csv    iso-8859-1, ';', modalidad por etapa (un 23 % de los centros)
+#   centros_compensatoria.csv   utf-8 (un 3 % de los centros)
+
+import argparse
+import csv
+import os
+import random
+
+# Provincia, prefijo del código y municipios con su latitud y longitud aproximadas
+PROVINCIAS = [
+    ("Almería", "04", [("Almería", 36.84, -2.46), ("Roquetas de Mar", 36.76, -2.61), ("El Ejido", 36.78, -2.81), ("Vera", 37.25, -1.87)]),
+    ("Cádiz", "11", [("Cádiz", 36.53, -6.29), ("Jerez de la Frontera", 36.69, -6.13), ("Algeciras", 36.13, -5.45), ("Ubrique", 36.68, -5.45)]),
+    ("Córdoba", "14", [("Córdoba", 37.89, -4.78), ("Lucena", 37.41, -4.49), ("Pozoblanco", 38.38, -4.85), ("Montilla", 37.59, -4.64)]),
+    ("Granada", "18", [("Granada", 37.18, -3.60), ("Motril", 36.75, -3.52), ("Baza", 37.49, -2.77), ("Churriana de la Vega", 37.15, -3.65)]),
+    ("Huelva", "21", [("Huelva", 37.26, -6.94), ("Lepe", 37.25, -7.20), ("Aracena", 37.89, -6.56), ("Moguer", 37.28, -6.84)]),
+    ("Jaén", "23", [("Jaén", 37.77, -3.79), ("Linares", 38.09, -3.64), ("Úbeda", 38.01, -3.37), ("Andújar", 38.04, -4.05)]),
+    ("Málaga", "29", [("Málaga", 36.72, -4.42), ("Marbella", 36.51, -4.88), ("Antequera", 37.02, -4.56), ("Ronda", 36.74, -5.17)]),
+    ("Sevilla", "41", [("Sevilla", 37.39, -5.98), ("Dos Hermanas", 37.28, -5.92), ("Écija", 37.54, -5.08), ("Utrera", 37.18, -5.78)]),
+]
+
+DENOMINACIONES = [
+    ("Colegio de Educación Infantil y Primaria", "Público"),
+    ("Centro de Educación Infantil", "Privado"),
+    ("Instituto de Educación Secundaria", "Público"),
+    ("Escuela Infantil", "Público"),
+    ("Centro Docente Privado", "Privado"),
+    ("Sección de Educación Permanente", "Público"),
+]
+
+NOMBRES = ["Ángel de Haro", "Federico García Lorca", "Alba Longa", "Averroes", "Al-Ándalus", "Mariana Pineda",
+           "Clara Campoamor", "Antonio Machado", "Virgen del Carmen", "San José", "Los Olivos", "Nuestra Señora del Rosario"]
+VIAS = ["C/", "Avda.", "Plaza", "Ctra.", "Paseo"]
+
+COLUMNAS_BASE = ["curso", "codigo", "D_DENOMINA", "D_ESPECIFICA", "D_TIPO", "D_DOMICILIO", "D_LOCALIDAD", "cod_municipio",
+                 "D_MUNICIPIO", "D_PROVINCIA", "C_POSTAL", "N_TELEFONO", "Correo_e", "N_LATITUD", "N_LONGITUD",
+                 "N_COUTMX", "N_COUTMY"]
+COLUMNAS_MARCAS = [
+    "Regimen_general", "Regimen_adultos", "Regimen_especial", "pub_adh_inf1", "pub_noadh_inf1", "priv_adh_inf1",
+    "priv_noadh_inf1", "pub_inf2", "priv_c_inf2", "priv_noc_inf2", "pub_pri", "priv_c_pri", "priv_noc_pri", "pub_eso",
+    "priv_c_eso", "priv_noc_eso", "pub_bach_ord", "priv_c_bach_ord", "priv_noc_bach_ord", "pub_bach_adul",
+    "pub_bach_semi_dist", "pub_fpbasica", "priv_c_fpbas", "priv_noc_fpbas", "pub_fpgm_ord", "priv_c_fpgm_ord",
+    "priv_noc_fpgm_ord", "pub_fpgm_adul", "pub_fpgm_semi_dist", "priv_noc_fpgm_semi_dist", "pub_fpgs_ord",
+    "priv_c_fpgs_ord", "priv_noc_fpgs_ord", "pub_fpgs_adul", "priv_noc_fpgs_adul", "pub_fpgs_semi_dist",
+    "priv_noc_fpgs_semi_dist", "pub_ce_gm", "pri_noc_ce_gm", "pub_ce_gs", "pri_noc_ce_gs", "pub_ee", "priv_c_ee",
+    "priv_noc_ee", "pub_ccff_gm_apd", "priv_ccff_gm_apd", "pub_ccff_gs_apd", "priv_ccff_gs_apd", "pub_ESD", "priv_ESD",
+    "priv_Master_EA", "pub_Dra", "priv_Dra", "pub_Ens_Mus", "priv_Ens_Mus", "pub_Ens_Dan", "priv_Ens_Dan",
+    "pub_Ens_no_reg_mus", "priv_Ens_no_reg_mus", "pub_Ens_no_reg_dan", "priv_Ens_no_reg_dan", "pub_idi",
+    "pub_idi_libre", "pub_Ens_no_reg_idi", "pub_Dep_gm", "priv_Dep_gm", "pub_Dep_gs", "priv_Dep_gs",
+    "pub_Adul_formal", "pub_planes",
+]
+ETAPAS_BILINGUES = ["Infantil_2_ciclo", "Primaria", "ESO", "Bachillerato", "CCFF_Grado_Básico", "CCFF_Grado_Medio",
+                    "CCFF_Grado_Superior", "Cur_Especialización_FP_Grado_Superior"]
+MODALIDADES = ["BIL ING", "BIL ING", "BIL ING", "BIL FRA", "BIL ALE", "PLURIL ING/FRA"]
+
+
+def _decimal(valor, decimales):
+    return f"{valor:.{decimales}f}".replace(".", ",")
+
+
+def generar_registro(filas, directorio, semilla=2024):
+    """
+    Escribe un registro sintético y sus ficheros auxiliares.
+
+    Args:
+        filas (int): Número de centros del registro
+        directorio (str): Directorio de salida (se crea si no existe)
+        semilla (int): Semilla del generador: la misma semilla produce los mismos ficheros
+
+    Returns:
+        dict: Nombre de cada fichero -> ruta escrita
+    """
+    os.makedirs(directorio, exist_ok=True)
+    aleatorio = random.Random(semilla)
+    rutas = {
+        "registro": os.path.join(directorio, "da_centros.csv"),
+        "todos": os.path.join(directorio, "centros_todos.csv"),
+        "bilingues": os.path.join(directorio, "da_centros_bilingues.csv"),
+        "compensatorios": os.path.join(directorio, "centros_compensatoria.csv"),
+    }
+    # Número de centros ya generados en cada provincia, para que los códigos no se repitan
+    contadores = [0] * len(PROVINCIAS)
+
+    with open(rutas["registro"], "w", newline="", encoding="iso-8859-1") as registro, \
+            open(rutas["todos"], "w", newline="", encoding="utf-8") as todos, \
+            open(rutas["bilingues"], "w", newline="", encoding="iso-8859-1") as bilingues, \
+            open(rutas["compensatorios"], "w", newline="", encoding="utf-8") as compensatorios:
+        escritor_registro = csv.writer(registro, delimiter=";")
+        escritor_todos = csv.writer(todos)
+        escritor_bilingues = csv.writer(bilingues, delimiter=";")
+        escritor_compensatorios = csv.writer(compensatorios)
+        escritor_registro.writerow(COLUMNAS_BASE + COLUMNAS_MARCAS)
+        escritor_todos.writerow(["Provincia", "codigo", "Nombre Centro"])
+        escritor_bilingues.writerow(["Curso", "codigo", "X_DENGEN"] + COLUMNAS_BASE[2:] + ETAPAS_BILINGUES)
+        escritor_compensatorios.writerow(["Código Centro", "Nombre Centro", "Localidad", "Año Inicio", "Año Fin", "Programas"])
+
+        for _ in range(filas):
+            numero_provincia = aleatorio.randrange(len(PROVINCIAS))
+            provincia, prefijo, municipios = PROVINCIAS[numero_provincia]
+            contadores[numero_provincia] += 1
+            codigo = f"{prefijo}{contadores[numero_provincia]:06d}"
+            municipio, lat, lng = aleatorio.choice(municipios)
+            lat += aleatorio.gauss(0, 0.08)
+            lng += aleatorio.gauss(0, 0.08)
+            denominacion, tipo = aleatorio.choice(DENOMINACIONES)
+            nombre = aleatorio.choice(NOMBRES)
+            domicilio = f"{aleatorio.choice(VIAS)} {aleatorio.choice(NOMBRES)}, {aleatorio.randint(1, 120)}"
+            codigo_postal = f"{prefijo}{aleatorio.randint(0, 999):03d}"
+
+            base = [
+                "22", codigo, denominacion, nombre, tipo, domicilio, municipio, f"{prefijo}{aleatorio.randint(1, 200):03d}",
+                municipio, provincia, codigo_postal, f"9{aleatorio.randint(10000000, 99999999)}",
+                f"{codigo}.edu@juntadeandalucia.es", _decimal(lat, 14), _decimal(lng, 14),
+                _decimal(500000 + (lng + 3) * 88000, 4), _decimal(lat * 111000, 3),
+            ]
+            marcas = ["S" if aleatorio.random() < 0.15 else "N" for _ in COLUMNAS_MARCAS]
+            escritor_registro.writerow(base + marcas)
+
+            if aleatorio.random() < 0.12:
+                escritor_todos.writerow([provincia, f"{codigo}C", nombre])
+            if aleatorio.random() < 0.23:
+                etapas = [aleatorio.choice(MODALIDADES) if aleatorio.random() < 0.5 else "" for _ in ETAPAS_BILINGUES]
+                escritor_bilingues.writerow(["22", codigo, "Centro"] + base[2:] + etapas)
+            if aleatorio.random() < 0.03:
+                escritor_compensatorios.writerow([codigo, nombre, municipio, "01/09/2008", "", "CAEP"])
+
+    return rutas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un registro sintético de centros con el formato de da_centros.csv")
+    parser.add_argument("filas", type=int, help="Número de centros (p. ej. 10000, 100000, 1000000)")
+    parser.add_argument("directorio", help="Directorio de salida")
+    parser.add_argument("--semilla", type=int, default=2024)
+    argumentos = parser.parse_args()
+
+    for nombre, ruta in generar_registro(argumentos.filas, argumentos.directorio, argumentos.semilla).items():
+        print(f"{nombre}: {ruta} ({os.path.getsize(ruta) / 1e6:.1f} MB)")
@@ -1,15 +1,51 @@
 /**
- * Obtiene los datos de los centros desde la API
- * @returns {Promise} Datos de los centros
+ * Obtiene una página de los centros que cumplen los filtros
+ * @param {Object} filtros - Parámetro de la API -> valor seleccionado
+ * @param {number} offset - Centros que se saltan (los de las páginas ya cargadas)
+ * @param {AbortSignal} [signal] - Señal para cancelar la petición
+ * @returns {Promise<Object>} {centros: página de centros, total: centros que cumplen los filtros}
  */
-async function obtenerDatosCentros() {
-    const response = await fetch(API_CONFIG.URL);
+async function obtenerPaginaCentros(filtros = {}, offset = 0, signal = undefined) {
+    const url = construirUrl(API_CONFIG.URL, { ...filtros, limit: API_CONFIG.TAMANO_PAGINA, offset });
+    const response = await fetch(url, { signal });
+    if (!response.ok) {
+        throw new Error(`Error HTTP: ${response.status}`);
+    }
+    const centros = await response.json();
+    return { centros, total: Number(response.headers.get('X-Total-Count') ?? centros.length) };
+}
+
+/**
+ * Obtiene el número de centros de cada valor de las columnas filtrables
+ * @param {Object} filtros - Parámetro de la API -> valor seleccionado
+ * @param {AbortSignal} [signal] - Señal para cancelar la petición
+ * @returns {Promise<Object>} Columna -> {valor: número de centros}
+ */
+async function obtenerFacetas(filtros = {}, signal = undefined) {
+    const response = await fetch(construirUrl(API_CONFIG.URL_FACETAS, filtros), { signal });
     if (!response.ok) {
         throw new Error(`Error HTTP: ${response.status}`);
     }
     return await response.json();
 }
 
+/**
+ * Añade a la URL los filtros que tienen valor como parámetros de consulta
+ * @param {string} url - URL base del endpoint
+ * @param {Object} filtros - Parámetro de la API -> valor seleccionado
+ * @returns {string} URL con los parámetros
+ */
+function construirUrl(url, filtros) {
+    const params = new URLSearchParams();
+    Object.entries(filtros).forEach(([parametro, valor]) => {
+        if (valor) {
+            params.append(parametro, valor);
+        }
+    });
+    const consulta = params.toString();
+    return consulta ? `${url}?${consulta}` : url;
+}
+
 
 /**
  * Obtiene una imagen desde el endpoint del servidor local.
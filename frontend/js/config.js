@@ -4,11 +4,23 @@
  */
 const API_CONFIG = {
     URL: "http://localhost:8000/api/centros",
+    URL_FACETAS: "http://localhost:8000/api/centros/facetas",
+    TAMANO_PAGINA: 100, // Centros que se piden cada vez; la tabla no descarga el dataset completo
     HEADERS: {
         'Content-Type': 'application/json'
     }
 };
 
+/**
+ * Columnas filtrables y nombre del parámetro de la API que las filtra
+ */
+const PARAMETROS_FILTRO = {
+    'Municipio': 'municipio',
+    'Provincia': 'provincia',
+    'Centro Compensatorio': 'compensatorio',
+    'Idiomas': 'idiomas'
+};
+
 /**
  * Mapeo de nombres de columnas
  * Define la estructura y nombres de las columnas que se mostrarán en la tabla
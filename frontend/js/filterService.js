@@ -1,121 +1,35 @@
 // Variables globales
-let datosOriginales = []; // Almacenar datos sin filtrar
-let datosFiltrados = []; // Almacenar datos filtrados
-
-/**
- * Crea el selector de provincias
- */
-/**
- * Crea y configura un menú desplegable de filtro de provincias encima de la tabla de centros.
- * Esta función genera un elemento select con todas las provincias únicas de los datos originales,
- * lo añade a un contenedor y lo coloca antes de la tabla de centros.
- * El desplegable incluye una opción predeterminada "Todas las provincias" y nombres de provincias ordenados.
- * Cuando se selecciona una provincia, activa la función filtrarPorProvincia.
- * 
- * @function crearFiltroProvincia
- * @requires datosOriginales - Array global que contiene los datos de los centros
- * @requires filtrarPorProvincia - Función para manejar el filtrado por provincia
- * @returns {void}
- */
-function crearFiltroProvincia() {
-    // Crear contenedor
-    const filterContainer = document.createElement('div');
-    filterContainer.className = 'filter-container';
-    
-    // Crear select
-    const select = document.createElement('select');
-    select.id = 'provincia-filter';
-    
-    // Opción por defecto
-    const defaultOption = document.createElement('option');
-    defaultOption.value = '';
-    defaultOption.textContent = 'Todas las provincias';
-    select.appendChild(defaultOption);
-    
-    // Obtener provincias únicas
-    const provincias = [...new Set(datosOriginales.map(centro => centro["Provincia"]))];
-    
-    // Agregar opciones
-    provincias.sort().forEach(provincia => {
-        const option = document.createElement('option');
-        option.value = provincia;
-        option.textContent = provincia;
-        select.appendChild(option);
-    });
-    
-    // Evento de cambio
-    select.addEventListener('change', filtrarPorProvincia);
-    
-    filterContainer.appendChild(select);
-    document.querySelector('#centros-table').before(filterContainer);
-}
-
-/**
- * Filtra los datos por provincia seleccionada
- * 
- * @function filtrarPorProvincia
- * @description
- * Esta función:
- * 1. Obtiene la provincia seleccionada del selector
- * 2. Filtra los datos originales si hay una provincia seleccionada
- * 3. Si no hay provincia seleccionada, usa todos los datos originales
- * 4. Actualiza la tabla con los datos filtrados
- * 
- * @example
- * // Cuando el usuario selecciona una provincia en el selector
- * filtrarPorProvincia();
- */
-function filtrarPorProvincia() {
-    // Obtener valor seleccionado del filtro de provincia
-    const provinciaSeleccionada = document.querySelector('#provincia-filter').value;
-    
-    // Filtrar datos o usar todos si no hay selección
-    datosFiltrados = provinciaSeleccionada 
-        ? datosOriginales.filter(centro => centro['Provincia'] === provinciaSeleccionada)
-        : [...datosOriginales];
-    
-    // Actualizar la visualización de la tabla
-    mostrarDatosEnTabla(datosFiltrados);
-}
-
+let datosFiltrados = []; // Centros ya descargados que cumplen los filtros actuales
+let totalFiltrados = 0; // Centros que cumplen los filtros actuales (cabecera X-Total-Count)
+let controladorPeticion = new AbortController(); // Cancela las peticiones de unos filtros que ya no están seleccionados
 
 /**
  * Crea los filtros en la cabecera
  */
 /**
  * Crea y configura filtros en la cabecera de la tabla para diferentes columnas
- * @param {Array<Object>} datos - Array de objetos que contiene los datos de los centros educativos
+ * @param {Object} facetas - Columna -> {valor: número de centros}, tal como lo devuelve /api/centros/facetas
  * 
  * @description
  * Esta función realiza lo siguiente:
  * 1. Crea un contenedor para los filtros
- * 2. Define las columnas que se podrán filtrar
- * 3. Para cada columna:
+ * 2. Para cada columna filtrable (PARAMETROS_FILTRO):
  *    - Crea un grupo de filtro con etiqueta y selector
  *    - Añade una opción por defecto "Todos"
- *    - Obtiene valores únicos de los datos para esa columna
- *    - Crea opciones para cada valor único
+ *    - Crea una opción por cada valor de la faceta con su número de centros
  *    - Configura el evento de cambio
- * 4. Inserta los filtros antes de la tabla
+ * 3. Inserta los filtros antes de la tabla
  * 
  * @example
- * // Asumiendo que tienes un array de datos de centros:
- * const datosCentros = [
- *   { Municipio: "Sevilla", Provincia: "Sevilla", "Centro Compensatorio": "Sí", Idiomas: "Inglés" },
- *   // ... más datos
- * ];
- * crearFiltrosCabecera(datosCentros);
+ * crearFiltrosCabecera(await obtenerFacetas());
  */
-function crearFiltrosCabecera(datos) {
+function crearFiltrosCabecera(facetas) {
     // Crear contenedor principal
     const filterContainer = document.createElement('div');
     filterContainer.className = 'filters-header';
 
-    // Definir columnas para filtrar
-    const columnasFiltrar = ['Municipio', 'Provincia', 'Centro Compensatorio', 'Idiomas'];
-
     // Crear filtros para cada columna
-    columnasFiltrar.forEach(columna => {
+    Object.keys(PARAMETROS_FILTRO).forEach(columna => {
         const filterGroup = document.createElement('div');
         filterGroup.className = 'filter-group';
 
@@ -126,20 +40,7 @@ function crearFiltrosCabecera(datos) {
         select.id = `filter-${columna.toLowerCase().replace(/\s+/g, '-')}`;
         select.className = 'header-filter';
 
-        // Opción por defecto
-        const defaultOption = document.createElement('option');
-        defaultOption.value = '';
-        defaultOption.textContent = `Todos ${columna}`;
-        select.appendChild(defaultOption);
-
-        // Obtener valores únicos para el filtro
-        const valores = [...new Set(datos.map(item => item[columna]))];
-        valores.sort().forEach(valor => {
-            const option = document.createElement('option');
-            option.value = valor;
-            option.textContent = valor;
-            select.appendChild(option);
-        });
+        rellenarOpciones(select, columna, facetas[columna] || {});
 
         // Evento de cambio
         select.addEventListener('change', aplicarFiltros);
@@ -153,41 +54,127 @@ function crearFiltrosCabecera(datos) {
     document.querySelector('#centros-table').before(filterContainer);
 }
 
+/**
+ * Rellena un selector con los valores de una faceta conservando la opción seleccionada
+ * @param {HTMLSelectElement} select - Selector a rellenar
+ * @param {string} columna - Nombre de la columna
+ * @param {Object} valores - Valor -> número de centros
+ */
+function rellenarOpciones(select, columna, valores) {
+    const seleccionado = select.value;
+    select.innerHTML = '';
+
+    // Opción por defecto
+    const defaultOption = document.createElement('option');
+    defaultOption.value = '';
+    defaultOption.textContent = `Todos ${columna}`;
+    select.appendChild(defaultOption);
+
+    Object.keys(valores).sort().forEach(valor => {
+        const option = document.createElement('option');
+        option.value = valor;
+        option.textContent = `${valor} (${valores[valor]})`;
+        select.appendChild(option);
+    });
+    select.value = seleccionado;
+}
+
+/**
+ * Lee los valores seleccionados en los filtros de la cabecera
+ * @returns {Object} Parámetro de la API -> valor seleccionado
+ */
+function leerFiltros() {
+    const filtros = {};
+    Object.entries(PARAMETROS_FILTRO).forEach(([columna, parametro]) => {
+        const select = document.querySelector(`#filter-${columna.toLowerCase().replace(/\s+/g, '-')}`);
+        filtros[parametro] = select ? select.value : '';
+    });
+    return filtros;
+}
+
 /**
  * Aplica todos los filtros seleccionados
  * 
- * Esta función aplica filtros al conjunto de datos original basándose en los criterios 
- * seleccionados por el usuario y actualiza la visualización de la tabla.
- * Los filtros se aplican por municipio, provincia, estado compensatorio e idiomas.
+ * Esta función pide al servidor la primera página de los centros que cumplen los criterios
+ * seleccionados por el usuario y actualiza la visualización de la tabla y los recuentos de
+ * los desplegables. Los filtros se aplican por municipio, provincia, estado compensatorio e idiomas.
  * 
+ * @async
  * @function aplicarFiltros
- * @returns {void} Actualiza la variable global datosFiltrados y refresca la tabla
- * 
- * @example
- * // Llamar a la función cuando cambien los valores de los filtros
- * aplicarFiltros();
+ * @returns {Promise<void>} Actualiza las variables globales datosFiltrados y totalFiltrados y refresca la tabla
  * 
  * @description
  * La función:
- * 1. Recopila los valores de los filtros desde elementos del DOM
- * 2. Filtra el conjunto de datos original (datosOriginales) según los criterios
- * 3. Actualiza la visualización de la tabla con los resultados filtrados
- * Los valores de filtro vacíos se ignoran (se tratan como "mostrar todo")
+ * 1. Cancela las peticiones de los filtros anteriores que sigan en curso
+ * 2. Recopila los valores de los filtros desde elementos del DOM
+ * 3. Pide al servidor la primera página de centros filtrados y las facetas de la nueva combinación
+ * 4. Actualiza la visualización de la tabla con los resultados filtrados
+ * Los valores de filtro vacíos se ignoran (se tratan como "mostrar todo"). Si el usuario cambia
+ * otro filtro antes de que lleguen las respuestas, éstas se descartan: la tabla siempre
+ * corresponde a los filtros seleccionados en ese momento.
  */
-function aplicarFiltros() {
-    const filtros = {
-        municipio: document.querySelector('#filter-municipio').value,
-        provincia: document.querySelector('#filter-provincia').value,
-        compensatorio: document.querySelector('#filter-centro-compensatorio').value,
-        idiomas: document.querySelector('#filter-idiomas').value
-    };
-
-    datosFiltrados = datosOriginales.filter(centro => {
-        return (!filtros.municipio || centro['Municipio'] === filtros.municipio) &&
-               (!filtros.provincia || centro['Provincia'] === filtros.provincia) &&
-               (!filtros.compensatorio || centro['Centro Compensatorio'] === filtros.compensatorio) &&
-               (!filtros.idiomas || centro['Idiomas'] === filtros.idiomas);
-    });
+async function aplicarFiltros() {
+    controladorPeticion.abort();
+    controladorPeticion = new AbortController();
+    const signal = controladorPeticion.signal;
+    const filtros = leerFiltros();
+    // Hasta que llegue la primera página de los nuevos filtros no se sabe desde dónde seguir
+    document.querySelector('#cargar-mas-btn').disabled = true;
+
+    try {
+        const [pagina, facetas] = await Promise.all([
+            obtenerPaginaCentros(filtros, 0, signal),
+            obtenerFacetas(filtros, signal)
+        ]);
+        if (signal.aborted) {
+            return;
+        }
+        datosFiltrados = pagina.centros;
+        totalFiltrados = pagina.total;
+
+        Object.keys(PARAMETROS_FILTRO).forEach(columna => {
+            const select = document.querySelector(`#filter-${columna.toLowerCase().replace(/\s+/g, '-')}`);
+            rellenarOpciones(select, columna, facetas[columna] || {});
+        });
 
-    mostrarDatosEnTabla(datosFiltrados);
-}
\ No newline at end of file
+        mostrarDatosEnTabla(datosFiltrados);
+        actualizarPaginacion(datosFiltrados.length, totalFiltrados);
+    } catch (error) {
+        if (!signal.aborted) {
+            mostrarError(error);
+        }
+    }
+}
+
+/**
+ * Añade a la tabla la siguiente página de centros de los filtros seleccionados
+ * 
+ * Si los filtros cambian mientras llega la página, la respuesta se descarta (ver aplicarFiltros).
+ * 
+ * @async
+ * @function cargarMasCentros
+ * @returns {Promise<void>}
+ */
+async function cargarMasCentros() {
+    const signal = controladorPeticion.signal;
+    // Evita pedir dos veces la misma página con un doble clic
+    const boton = document.querySelector('#cargar-mas-btn');
+    boton.disabled = true;
+
+    try {
+        const pagina = await obtenerPaginaCentros(leerFiltros(), datosFiltrados.length, signal);
+        if (signal.aborted) {
+            return;
+        }
+        datosFiltrados = datosFiltrados.concat(pagina.centros);
+        totalFiltrados = pagina.total;
+
+        mostrarDatosEnTabla(datosFiltrados);
+        actualizarPaginacion(datosFiltrados.length, totalFiltrados);
+    } catch (error) {
+        if (!signal.aborted) {
+            boton.disabled = false;
+            mostrarError(error);
+        }
+    }
+}
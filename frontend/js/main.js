@@ -4,11 +4,10 @@ document.addEventListener("DOMContentLoaded", inicializarTabla);
 /**
  * Inicializa la tabla de datos obteniendo datos de centros, configurando filtros y mostrando la información.
  * Esta función maneja la configuración inicial del componente de tabla incluyendo:
- * - Obtención de datos desde la API de centros
- * - Creación de copias de respaldo de los datos originales y filtrados
+ * - Obtención de la primera página de centros desde la API (el resto se pide al pulsar "Mostrar más")
  * - Configuración de filtros de encabezado
  * - Inicialización de encabezados de tabla
- * - Visualización de los datos filtrados en la tabla
+ * - Visualización de los datos filtrados en la tabla y del recuento de centros
  * 
  * @async
  * @function inicializarTabla
@@ -17,13 +16,19 @@ document.addEventListener("DOMContentLoaded", inicializarTabla);
  */
 async function inicializarTabla() {
     try {
-        const datos = await obtenerDatosCentros();
-        datosOriginales = [...datos];
-        datosFiltrados = [...datos];
+        const signal = controladorPeticion.signal;
+        const [pagina, facetas] = await Promise.all([
+            obtenerPaginaCentros({}, 0, signal),
+            obtenerFacetas({}, signal)
+        ]);
+        datosFiltrados = pagina.centros;
+        totalFiltrados = pagina.total;
         
-        crearFiltrosCabecera(datos);
-        inicializarHeaders(datos);
+        crearFiltrosCabecera(facetas);
+        crearPaginacion();
+        inicializarHeaders(datosFiltrados);
         mostrarDatosEnTabla(datosFiltrados);
+        actualizarPaginacion(datosFiltrados.length, totalFiltrados);
     } catch (error) {
         mostrarError(error);
     }
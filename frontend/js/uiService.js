@@ -80,6 +80,38 @@ function mostrarDatosEnTabla(datos) {
     });
 }
 
+/**
+ * Crea bajo la tabla el recuento de centros mostrados y el botón para cargar la siguiente página
+ */
+function crearPaginacion() {
+    const paginacion = document.createElement("div");
+    paginacion.className = "paginacion";
+
+    const recuento = document.createElement("span");
+    recuento.id = "recuento-centros";
+
+    const boton = document.createElement("button");
+    boton.id = "cargar-mas-btn";
+    boton.textContent = "Mostrar más";
+    boton.addEventListener("click", cargarMasCentros);
+
+    paginacion.appendChild(recuento);
+    paginacion.appendChild(boton);
+    document.querySelector("#centros-table").after(paginacion);
+}
+
+/**
+ * Actualiza el recuento de centros y oculta el botón cuando ya se han cargado todos
+ * @param {number} mostrados - Centros cargados en la tabla
+ * @param {number} total - Centros que cumplen los filtros
+ */
+function actualizarPaginacion(mostrados, total) {
+    document.querySelector("#recuento-centros").textContent = `Mostrando ${mostrados} de ${total} centros`;
+    const boton = document.querySelector("#cargar-mas-btn");
+    boton.disabled = false;
+    boton.style.display = mostrados < total ? "" : "none";
+}
+
 /**
  * Muestra mensajes de error en la consola y opcionalmente en la UI
  * @param {Error} error - Error ocurrido
@@ -0,0 +1,37 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Los servicios se importan relativos a backend/app (from services...), como en la API y el pipeline
+sys.path.insert(0, os.path.join(RAIZ, "backend", "app"))
+
+
+@pytest.fixture(scope="session")
+def directorio_datos(tmp_path_factory):
+    """
+    Copia de data/ en un directorio temporal que pasa a ser el de trabajo: la API y el pipeline
+    usan rutas relativas a la raíz del repositorio (config.py) y las pruebas no deben tocar los
+    datos del repositorio (caché de rutas, instantáneas, trabajos...).
+    """
+    directorio = tmp_path_factory.mktemp("repositorio")
+    shutil.copytree(os.path.join(RAIZ, "data"), directorio / "data")
+    anterior = os.getcwd()
+    os.chdir(directorio)
+    yield directorio
+    os.chdir(anterior)
+
+
+@pytest.fixture(scope="session")
+def cliente(directorio_datos):
+    """
+    Cliente de la API sobre la copia de los datos. No arranca el ciclo de vida de la aplicación,
+    así que no reanuda trabajos.
+    """
+    from fastapi.testclient import TestClient
+
+    import main
+    return TestClient(main.app)
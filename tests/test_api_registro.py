@@ -0,0 +1,73 @@
+# Pruebas de /api/caja y /api/cercanos contra un recorrido completo de las coordenadas del
+# registro (da_centros.csv), sobre una copia de los datos:
+#
+#   python -m pytest tests
+
+import numpy as np
+import pytest
+
+from services.geo import distancias_haversine_km
+
+# Plaza del Carmen (Granada) y un rectángulo alrededor del área metropolitana
+LAT, LNG = 37.1744, -3.5990
+CAJA = {"lat_min": 37.05, "lng_min": -3.75, "lat_max": 37.30, "lng_max": -3.45}
+
+
+@pytest.fixture(scope="module")
+def registro(cliente):
+    import main
+    return main.registro_centros
+
+
+def distancias_registro(registro):
+    # Distancia a todos los centros con coordenadas, sin índice espacial
+    distancias = distancias_haversine_km(LAT, LNG, registro.latitudes, registro.longitudes)
+    return np.sort(distancias[~np.isnan(distancias)])
+
+
+@pytest.mark.parametrize("invertida", [
+    {**CAJA, "lat_min": CAJA["lat_max"], "lat_max": CAJA["lat_min"]},
+    {**CAJA, "lng_min": CAJA["lng_max"], "lng_max": CAJA["lng_min"]},
+])
+def test_caja_invertida_se_rechaza(cliente, invertida):
+    respuesta = cliente.get("/api/caja", params=invertida)
+
+    assert respuesta.status_code == 400
+
+
+def test_caja_devuelve_los_centros_del_rectangulo(cliente, registro):
+    dentro = ((registro.latitudes >= CAJA["lat_min"]) & (registro.latitudes <= CAJA["lat_max"])
+              & (registro.longitudes >= CAJA["lng_min"]) & (registro.longitudes <= CAJA["lng_max"]))
+    esperados = {registro.codigos[posicion] for posicion in np.flatnonzero(dentro).tolist()}
+
+    respuesta = cliente.get("/api/caja", params={**CAJA, "limit": 10000})
+    assert respuesta.status_code == 200
+    assert int(respuesta.headers["X-Total-Count"]) == len(esperados) > 0
+    assert {centro["codigo"] for centro in respuesta.json()} == esperados
+
+    pagina = cliente.get("/api/caja", params={**CAJA, "limit": 5})
+    assert len(pagina.json()) == 5
+    assert pagina.headers["X-Total-Count"] == respuesta.headers["X-Total-Count"]
+
+
+def test_cercanos_ordenados_por_distancia(cliente, registro):
+    esperadas = distancias_registro(registro)
+
+    centros = cliente.get("/api/cercanos", params={"lat": LAT, "lng": LNG, "k": 25}).json()
+    distancias = [centro["distancia_linea_km"] for centro in centros]
+    assert distancias == sorted(distancias)
+    # Los 25 más cercanos del índice son los 25 más cercanos de todo el registro
+    assert distancias == pytest.approx(np.round(esperadas[:25], 3).tolist(), abs=1e-3)
+
+    # Sin k ni radio, los 20 más cercanos
+    assert len(cliente.get("/api/cercanos", params={"lat": LAT, "lng": LNG}).json()) == 20
+
+
+def test_cercanos_en_radio(cliente, registro):
+    esperadas = distancias_registro(registro)
+
+    centros = cliente.get("/api/cercanos", params={"lat": LAT, "lng": LNG, "radio_km": 5}).json()
+    distancias = [centro["distancia_linea_km"] for centro in centros]
+    assert len(centros) == int((esperadas <= 5).sum()) > 0
+    assert distancias == sorted(distancias)
+    assert max(distancias) <= 5
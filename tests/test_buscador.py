@@ -0,0 +1,79 @@
+# Pruebas de /api/buscar: el índice de n-gramas encuentra lo mismo que un recorrido de los
+# textos del registro sin mayúsculas ni tildes, sobre una copia de los datos:
+#
+#   python -m pytest tests
+
+import pytest
+
+from services.buscador import CAMPOS_BUSQUEDA, plegar, reparar_mojibake, siglas
+
+
+@pytest.fixture(scope="module")
+def registro(cliente):
+    import main
+    return main.registro_centros
+
+
+def buscar(cliente, q, **parametros):
+    respuesta = cliente.get("/api/buscar", params={"q": q, **parametros})
+    assert respuesta.status_code == 200
+    return int(respuesta.headers["X-Total-Count"]), respuesta.json()
+
+
+def contienen(registro, fragmento):
+    # Centros con el fragmento en alguno de los campos de búsqueda, recorriendo los textos
+    campos = [getattr(registro, campo) for campo in CAMPOS_BUSQUEDA]
+    return {registro.codigos[posicion] for posicion in range(len(registro))
+            if any(fragmento in plegar(textos[posicion]) for textos in campos)}
+
+
+@pytest.mark.parametrize("consulta", ["vicar", "Vícar", "VICAR", "vícar"])
+def test_sin_tildes_ni_mayusculas(cliente, registro, consulta):
+    esperados = contienen(registro, "vicar")
+
+    total, centros = buscar(cliente, consulta, limit=100)
+
+    # Las coincidencias exactas van primero; detrás se completa con las aproximadas
+    assert total == len(esperados) > 0
+    assert {centro["codigo"] for centro in centros[:total]} == esperados
+    assert centros[0]["municipio"] == "Vícar"
+    puntuaciones = [centro["puntuacion"] for centro in centros]
+    assert puntuaciones == sorted(puntuaciones, reverse=True)
+
+
+def test_todas_las_palabras_deben_aparecer(cliente):
+    total, centros = buscar(cliente, "instituto vicar", limit=100)
+
+    assert total > 0
+    assert all(centro["municipio"] == "Vícar" and "Instituto" in centro["tipo"] for centro in centros[:total])
+    assert all(centro["puntuacion"] < 1 for centro in centros[total:])
+
+
+def test_siglas_del_tipo(cliente):
+    _, centros = buscar(cliente, "ies granada")
+
+    assert centros
+    assert all(centro["tipo"] == "Instituto de Educación Secundaria" for centro in centros)
+
+
+def test_errata_devuelve_resultados_aproximados(cliente):
+    total, centros = buscar(cliente, "granda")
+
+    # Sin coincidencias exactas, pero con los más parecidos por debajo de cualquier exacta
+    assert total == 0
+    assert centros
+    assert all(centro["puntuacion"] < 1 for centro in centros)
+
+
+def test_filtros_de_atributos(cliente):
+    _, centros = buscar(cliente, "vicar", limit=100, publico_privado="Público")
+
+    assert centros
+    assert all(centro["publico_privado"] == "Público" for centro in centros)
+
+
+def test_plegar():
+    assert plegar("C.E.I.P. Ángel de Haro") == "c e i p angel de haro"
+    assert plegar("Año Ñandú") == "año ñandu"
+    assert plegar(reparar_mojibake("VÃ­car")) == plegar("VÍCAR") == "vicar"
+    assert siglas("colegio de educacion infantil y primaria") == "ceip"
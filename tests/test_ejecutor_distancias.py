@@ -0,0 +1,123 @@
+# Pruebas de EjecutorDistancias contra el servidor falso de Google (sin clave ni red):
+#
+#   python -m pytest tests
+
+import threading
+import time
+
+import pytest
+
+from services import servidor_google_falso
+from services.ejecutor_distancias import ESTADO_CANCELADO, EjecutorDistancias
+from services.enrutamiento import MotorGoogleLocal
+from services.servidor_google_falso import ManejadorGoogleFalso, elemento_matriz
+
+ORIGEN = "Calle Costa Rica 49, 18194, Churriana de la Vega, Granada"
+# Tres lotes de 25 destinos como mucho; uno de ellos no existe
+DESTINOS = [f"C/ Prueba, {numero}, Granada" for numero in range(60)]
+DESTINOS[37] = "C/ SIN DETERMINAR, Marbella, Málaga"
+
+
+@pytest.fixture(scope="module")
+def motor():
+    motor = MotorGoogleLocal()
+    yield motor
+    motor.servidor.shutdown()
+
+
+@pytest.fixture
+def sobrecuota(monkeypatch):
+    """
+    Hace que las primeras N peticiones al servidor falso respondan OVER_QUERY_LIMIT.
+    """
+    cerrojo = threading.Lock()
+    estado = {"restantes": 0}
+
+    def aleatorio():
+        with cerrojo:
+            if estado["restantes"] > 0:
+                estado["restantes"] -= 1
+                return 0.0
+            return 1.0
+
+    def configurar(peticiones):
+        estado["restantes"] = peticiones
+        monkeypatch.setattr(ManejadorGoogleFalso, "probabilidad_sobrecuota", 0.5)
+        monkeypatch.setattr(servidor_google_falso.random, "random", aleatorio)
+
+    ManejadorGoogleFalso.peticiones = 0
+    return configurar
+
+
+def ejecutar(motor, **opciones):
+    lotes = [DESTINOS[inicio:inicio + motor.destinos_por_peticion] for inicio in range(0, len(DESTINOS), motor.destinos_por_peticion)]
+    opciones = {"peticiones_por_segundo": 1000, "espera_base": 0.01, **opciones}
+    ejecutor = EjecutorDistancias(lambda lote: motor.consultar_lote(ORIGEN, lote), progreso=lambda completados, total: None, **opciones)
+    return lotes, ejecutor.ejecutar(lotes)
+
+
+def ejecutar_y_cancelar(motor, segundos, **opciones):
+    # Cancela a los 'segundos' y devuelve los resultados y lo que tardó la ejecución
+    cancelado = threading.Event()
+    threading.Timer(segundos, cancelado.set).start()
+    inicio = time.monotonic()
+    _, resultados = ejecutar(motor, cancelado=cancelado, **opciones)
+    return resultados, time.monotonic() - inicio
+
+
+def test_resultados_en_el_orden_de_los_destinos_con_reintentos(motor, sobrecuota):
+    sobrecuota(4)
+    lotes, resultados = ejecutar(motor, max_hilos=4, max_reintentos=5)
+
+    # Cada lote devuelve sus destinos en orden, aunque los lotes terminen en otro orden
+    planos = [resultado for lote in resultados for resultado in lote]
+    assert len(planos) == len(DESTINOS)
+    for destino, resultado in zip(DESTINOS, planos):
+        esperado = elemento_matriz(ORIGEN, destino)
+        assert resultado["estado"] == esperado["status"]
+        if esperado["status"] == "OK":
+            assert resultado["distancia en m"] == esperado["distance"]["value"]
+            assert resultado["duracion en s"] == esperado["duration"]["value"]
+    assert planos[37]["estado"] == "NOT_FOUND"
+    # Las cuatro respuestas OVER_QUERY_LIMIT se han repetido hasta obtener el resultado
+    assert ManejadorGoogleFalso.peticiones == len(lotes) + 4
+
+
+def test_reintentos_agotados_conservan_el_estado_transitorio(motor, sobrecuota):
+    sobrecuota(1000)
+    lotes, resultados = ejecutar(motor, max_hilos=2, max_reintentos=2)
+
+    assert all(resultado["estado"] == "OVER_QUERY_LIMIT" for lote in resultados for resultado in lote)
+    # Un intento más los reintentos por lote
+    assert ManejadorGoogleFalso.peticiones == len(lotes) * 3
+
+
+def test_cancelado_no_envia_peticiones(motor, sobrecuota):
+    sobrecuota(0)
+    cancelado = threading.Event()
+    cancelado.set()
+    _, resultados = ejecutar(motor, max_hilos=4, cancelado=cancelado)
+
+    assert all(resultado["estado"] == ESTADO_CANCELADO for lote in resultados for resultado in lote)
+    assert ManejadorGoogleFalso.peticiones == 0
+
+
+def test_cancelado_interrumpe_la_espera_entre_reintentos(motor, sobrecuota):
+    sobrecuota(1000)
+    resultados, segundos = ejecutar_y_cancelar(motor, 0.3, max_hilos=4, espera_base=30.0, espera_maxima=30.0)
+
+    # Sin cancelación, cada lote esperaría al menos 15 s antes de su primer reintento
+    assert segundos < 5
+    assert all(resultado["estado"] == ESTADO_CANCELADO for lote in resultados for resultado in lote)
+    assert ManejadorGoogleFalso.peticiones == 3
+
+
+def test_cancelado_interrumpe_la_espera_del_limitador(motor, sobrecuota):
+    sobrecuota(0)
+    # Con 0,2 peticiones por segundo el tercer lote esperaría 5 s a su ficha
+    resultados, segundos = ejecutar_y_cancelar(motor, 0.3, max_hilos=4, peticiones_por_segundo=0.2)
+
+    assert segundos < 3
+    estados = [lote[0]["estado"] for lote in resultados]
+    assert estados.count(ESTADO_CANCELADO) == 2
+    assert ManejadorGoogleFalso.peticiones == 1
@@ -0,0 +1,62 @@
+# Pruebas de /api/export: los tres formatos contienen las mismas filas, en el mismo orden,
+# que /api/centros con los mismos filtros:
+#
+#   python -m pytest tests
+
+import csv
+import io
+import json
+import zipfile
+from xml.etree import ElementTree
+
+import pytest
+
+CONSULTA = {"provincia": "Málaga", "idiomas": "Es bilingüe", "orden": "duracion", "desc": "true"}
+HOJA = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+
+@pytest.fixture(scope="module")
+def esperadas(cliente):
+    respuesta = cliente.get("/api/centros", params=CONSULTA)
+    filas = respuesta.json()
+    assert int(respuesta.headers["X-Total-Count"]) == len(filas) > 0
+    return filas
+
+
+def exportar(cliente, formato, **cabeceras):
+    respuesta = cliente.get("/api/export", params={**CONSULTA, "format": formato}, headers=cabeceras)
+    assert respuesta.status_code == 200
+    return respuesta
+
+
+def test_csv(cliente, esperadas):
+    respuesta = exportar(cliente, "csv")
+
+    assert respuesta.headers["content-type"].startswith("text/csv")
+    assert int(respuesta.headers["X-Total-Count"]) == len(esperadas)
+    assert list(csv.DictReader(io.StringIO(respuesta.text, newline=""))) == esperadas
+
+
+def test_ndjson(cliente, esperadas):
+    respuesta = exportar(cliente, "ndjson")
+
+    assert [json.loads(linea) for linea in respuesta.text.splitlines()] == esperadas
+
+
+def test_xlsx(cliente, esperadas):
+    respuesta = exportar(cliente, "xlsx", **{"Accept-Encoding": "gzip"})
+
+    # El Excel ya es un ZIP: se envía sin volver a comprimirlo
+    assert "content-encoding" not in respuesta.headers
+    with zipfile.ZipFile(io.BytesIO(respuesta.content)) as libro:
+        assert libro.testzip() is None
+        hoja = ElementTree.fromstring(libro.read("xl/worksheets/sheet1.xml"))
+    filas = [[celda.findtext(f"{HOJA}is/{HOJA}t") for celda in fila] for fila in hoja.iter(f"{HOJA}row")]
+    encabezados = filas[0]
+    assert [dict(zip(encabezados, fila)) for fila in filas[1:]] == esperadas
+
+
+def test_csv_se_comprime(cliente):
+    respuesta = cliente.get("/api/export", params={"format": "csv"}, headers={"Accept-Encoding": "gzip"})
+
+    assert respuesta.headers["content-encoding"] == "gzip"
@@ -0,0 +1,106 @@
+# Pruebas del procesado del registro por fragmentos: partir los ficheros entre varios
+# procesos da el mismo CSV, byte a byte, que procesarlos enteros en uno solo:
+#
+#   python -m pytest tests
+
+import csv
+
+import pytest
+
+from services import fragmentos
+from services.unidades import distancia_a_metros
+
+REGISTRO = "data/da_centros.csv"
+FICHEROS = {"csv_bilingues": "data/da_centros_bilingues.csv", "csv_compensatorios": "data/centros_compensatoria.csv"}
+# Plaza del Carmen (Granada)
+ORIGEN = (37.1744, -3.5990)
+
+
+@pytest.fixture
+def comunidades(directorio_datos, tmp_path):
+    # El registro partido en dos ficheros, cada uno con su fila de encabezados, como dos comunidades
+    with open(REGISTRO, mode="rb") as file:
+        cabecera, *filas = file.readlines()
+    rutas = [str(tmp_path / "comunidad_1.csv"), str(tmp_path / "comunidad_2.csv")]
+    for ruta, parte in zip(rutas, (filas[:len(filas) // 3], filas[len(filas) // 3:])):
+        with open(ruta, mode="wb") as file:
+            file.write(cabecera + b"".join(parte))
+    return rutas
+
+
+@pytest.fixture
+def origen_fijo(monkeypatch):
+    # Sin clave de Google: el origen se da ya geocodificado
+    monkeypatch.setattr(fragmentos, "obtener_coordenadas", lambda direccion: ORIGEN)
+
+
+def fragmentos_pequenos(monkeypatch, tamano_minimo):
+    planificar = fragmentos.planificar_fragmentos
+    monkeypatch.setattr(fragmentos, "planificar_fragmentos",
+                        lambda rutas, procesos: planificar(rutas, procesos, tamano_minimo))
+
+
+def leer(ruta):
+    with open(ruta, mode="rb") as file:
+        return file.read()
+
+
+@pytest.mark.parametrize("procesos", [1, 4])
+def test_planificar_fragmentos_cubre_los_ficheros(comunidades, procesos):
+    planificados = fragmentos.planificar_fragmentos(comunidades, procesos, tamano_minimo=64 * 1024)
+
+    for ruta in comunidades:
+        contenido = leer(ruta)
+        cabecera = contenido[:contenido.index(b"\n") + 1]
+        rangos = sorted((inicio, fin) for fichero, encabezados, inicio, fin in planificados if fichero == ruta)
+        assert all(encabezados == cabecera for fichero, encabezados, _, _ in planificados if fichero == ruta)
+        # Rangos contiguos desde la fila siguiente a los encabezados hasta el final, cortados en saltos de línea
+        assert rangos[0][0] == len(cabecera)
+        assert rangos[-1][1] == len(contenido)
+        assert all(fin == siguiente for (_, fin), (siguiente, _) in zip(rangos, rangos[1:]))
+        assert all(contenido[inicio - 1:inicio] == b"\n" for inicio, _ in rangos)
+    if procesos > 1:
+        assert len(planificados) > len(comunidades)
+    tamanos = [fin - inicio for _, _, inicio, fin in planificados]
+    assert tamanos == sorted(tamanos, reverse=True)
+
+
+def test_varios_procesos_dan_el_mismo_csv(comunidades, origen_fijo, monkeypatch, tmp_path):
+    un_proceso = str(tmp_path / "un_proceso.csv")
+    varios = str(tmp_path / "varios.csv")
+
+    resumen = fragmentos.procesar_registros_fragmentados(comunidades, un_proceso, "Granada", procesos=1, **FICHEROS)
+    fragmentos_pequenos(monkeypatch, 64 * 1024)
+    resumen_varios = fragmentos.procesar_registros_fragmentados(comunidades, varios, "Granada", procesos=4, **FICHEROS)
+
+    assert resumen["fragmentos"] == len(comunidades)
+    assert resumen_varios["fragmentos"] > len(comunidades)
+    assert {**resumen_varios, "fragmentos": None} == {**resumen, "fragmentos": None}
+    assert leer(varios) == leer(un_proceso)
+
+    with open(varios, mode="r", encoding="utf-8", newline="") as file:
+        filas = list(csv.DictReader(file))
+    assert len(filas) == resumen["centros"] == resumen["leidas"]
+    # Ordenados por distancia (redondeada en el CSV); sin coordenadas al final
+    distancias = [distancia_a_metros(fila["Distancia en línea (Km)"]) for fila in filas]
+    distancias = [float("inf") if distancia is None else distancia for distancia in distancias]
+    assert distancias == sorted(distancias)
+
+
+def test_sin_origen_se_ordena_por_codigo(comunidades, monkeypatch, tmp_path):
+    def sin_geocodificar(direccion):
+        raise AssertionError("No hay origen que geocodificar")
+
+    monkeypatch.setattr(fragmentos, "obtener_coordenadas", sin_geocodificar)
+    fragmentos_pequenos(monkeypatch, 64 * 1024)
+    salida = str(tmp_path / "por_codigo.csv")
+
+    fragmentos.procesar_registros_fragmentados(comunidades, salida, procesos=2, csv_codigos="data/coincidencias.csv")
+
+    with open(salida, mode="r", encoding="utf-8", newline="") as file:
+        filas = list(csv.DictReader(file))
+    codigos = [fila["Código Centro"] for fila in filas]
+    assert codigos == sorted(codigos)
+    with open("data/coincidencias.csv", mode="r", encoding="utf-8", newline="") as file:
+        assert len(filas) == len(list(csv.DictReader(file)))
+    assert all(fila["Distancia en línea (Km)"] == "" for fila in filas)
@@ -0,0 +1,104 @@
+# Pruebas de la actualización incremental de la exportación contra la exportación completa,
+# con el servidor falso de Google (sin clave ni red) y sobre una copia de los datos:
+#
+#   python -m pytest tests
+
+import csv
+import os
+import shutil
+
+import pytest
+
+from services import enrutamiento
+from services.incremental import actualizar_incremental, comparar_ediciones, leer_coincidencias
+from services.trabajos import reconstruir_exportacion
+
+ORIGEN = "Calle Costa Rica 49, 18194, Churriana de la Vega, Granada"
+FICHEROS = {"csv_bilingues": "data/da_centros_bilingues.csv", "csv_compensatorios": "data/centros_compensatoria.csv"}
+OPCIONES = {"peticiones_por_segundo": 1000, "progreso": lambda completados, total: None}
+
+
+@pytest.fixture(scope="module")
+def motor_local(directorio_datos):
+    anterior = enrutamiento._motor
+    motor = enrutamiento.configurar_motor("google_local")
+    yield motor
+    motor.servidor.shutdown()
+    enrutamiento._motor = anterior
+
+
+@pytest.fixture(scope="module")
+def exportacion(motor_local, tmp_path_factory):
+    """
+    Exportación completa de coincidencias.csv con su instantánea para la actualización incremental.
+    """
+    directorio = tmp_path_factory.mktemp("incremental")
+    rutas = {"csv_exportado": str(directorio / "centros_exportados.csv"), "csv_instantanea": str(directorio / "coincidencias_procesadas.csv")}
+    resultado = reconstruir_exportacion("data/coincidencias.csv", origen=ORIGEN, **rutas, **FICHEROS, **OPCIONES)
+    with open(rutas["csv_exportado"], mode="rb") as file:
+        contenido = file.read()
+    return {"contenido": contenido, "resultado": resultado, **rutas}
+
+
+def copiar_exportacion(exportacion, destino):
+    # Cada prueba actualiza su propia copia de la exportación y de la instantánea
+    rutas = {}
+    for clave in ("csv_exportado", "csv_instantanea"):
+        rutas[clave] = str(destino / os.path.basename(exportacion[clave]))
+        shutil.copyfile(exportacion[clave], rutas[clave])
+    metadatos = f"{os.path.splitext(exportacion['csv_instantanea'])[0]}.json"
+    shutil.copyfile(metadatos, str(destino / os.path.basename(metadatos)))
+    return rutas
+
+
+def test_misma_edicion_deja_la_exportacion_identica(exportacion, tmp_path):
+    rutas = copiar_exportacion(exportacion, tmp_path)
+
+    informe = actualizar_incremental("data/coincidencias.csv", rutas["csv_instantanea"], rutas["csv_exportado"], **FICHEROS, **OPCIONES)
+
+    with open(rutas["csv_exportado"], mode="rb") as file:
+        assert file.read() == exportacion["contenido"]
+    assert informe["anadidos"] == informe["eliminados"] == informe["direccion_cambiada"] == informe["datos_cambiados"] == []
+    # Sólo se vuelven a pedir los centros que se quedaron sin trayecto (direcciones que el servidor falso no encuentra)
+    assert len(informe["reintentados"]) == exportacion["resultado"]["sin_trayecto"] > 0
+    assert informe["trayectos_recalculados"] == len(informe["reintentados"])
+
+
+def test_edicion_nueva_ordena_como_la_exportacion_completa(exportacion, tmp_path):
+    rutas = copiar_exportacion(exportacion, tmp_path)
+    encabezados, filas = leer_coincidencias("data/coincidencias.csv")
+    codigos = list(filas)
+    eliminado, cambiado, renombrado = codigos[3], codigos[10], codigos[20]
+    del filas[eliminado]
+    filas[cambiado]["D_DOMICILIO"] = "Calle Nueva, 1"
+    filas[renombrado]["D_ESPECIFICA"] = "Nombre Nuevo"
+    edicion = str(tmp_path / "coincidencias_nuevas.csv")
+    with open(edicion, mode="w", newline="", encoding="utf-8") as file:
+        escritor = csv.DictWriter(file, fieldnames=encabezados)
+        escritor.writeheader()
+        escritor.writerows(filas.values())
+
+    informe = actualizar_incremental(edicion, rutas["csv_instantanea"], rutas["csv_exportado"], **FICHEROS, **OPCIONES)
+    completa = str(tmp_path / "completa.csv")
+    reconstruir_exportacion(edicion, completa, ORIGEN, **FICHEROS, **OPCIONES)
+
+    assert [centro["codigo"] for centro in informe["eliminados"]] == [eliminado]
+    assert [centro["codigo"] for centro in informe["direccion_cambiada"]] == [cambiado]
+    assert [centro["codigo"] for centro in informe["datos_cambiados"]] == [renombrado]
+    with open(rutas["csv_exportado"], mode="r", encoding="utf-8") as incremental, open(completa, mode="r", encoding="utf-8") as file:
+        assert list(csv.DictReader(incremental)) == list(csv.DictReader(file))
+
+
+def test_comparar_ediciones():
+    fila = {"D_DOMICILIO": "C/ Uno, 1", "C_POSTAL": "18001", "D_MUNICIPIO": "Granada", "D_PROVINCIA": "Granada",
+            "N_LATITUD": "37,1", "N_LONGITUD": "-3,6", "D_DENOMINA": "Instituto", "D_ESPECIFICA": "Uno", "D_TIPO": "Público"}
+    anteriores = {codigo: dict(fila) for codigo in ("1", "2", "3", "4", "5")}
+    nuevas = {codigo: dict(fila) for codigo in ("2", "3", "4", "5", "6")}
+    nuevas["2"]["N_LATITUD"] = "37,2"
+    nuevas["3"]["D_ESPECIFICA"] = "Tres"
+    nuevas["4"]["D_ESPECIFICA"] = "Cuatro"
+
+    cambios = comparar_ediciones(anteriores, nuevas, pendientes=["4", "5"])
+
+    assert cambios == {"anadidos": ["6"], "eliminados": ["1"], "direccion_cambiada": ["2"],
+                       "reintentados": ["4", "5"], "datos_cambiados": ["3"]}
@@ -0,0 +1,126 @@
+# Pruebas de los índices de filtrado, facetas y ordenación de /api/centros contra un
+# recorrido directo de las filas de la exportación, leída del CSV (IndiceCentros) y de su
+# instantánea binaria mapeada en memoria (IndiceMapeado):
+#
+#   python -m pytest tests
+
+import os
+import unicodedata
+from collections import Counter
+
+import pytest
+
+from services.almacen_centros import AlmacenCentros, InstantaneaMapeada, escribir_binario_centros
+from services.indice_centros import COLUMNAS_FILTRO, ORDENACIONES
+from services.unidades import distancia_a_metros, duracion_a_segundos
+
+CSV_EXPORTADO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "centros_exportados.csv")
+
+COMBINACIONES = [
+    {},
+    {"provincia": "Granada"},
+    {"provincia": "Málaga", "idiomas": "Es bilingüe"},
+    {"provincia": "Sevilla", "compensatorio": "Es compensatorio", "tipo": "Instituto de Educación Secundaria"},
+    {"municipio": "Córdoba", "idiomas": "Empty", "provincia": ""},
+    # Sin resultados: valores que existen pero no juntos, y un valor que no existe
+    {"provincia": "Granada", "municipio": "Sevilla"},
+    {"provincia": "Atlántida"},
+]
+
+PAGINAS = [(0, 10), (25, 10), (100, 400), (500, 100), (2000, 10)]
+
+
+@pytest.fixture(scope="module")
+def leida():
+    return AlmacenCentros(CSV_EXPORTADO).obtener()
+
+
+@pytest.fixture(scope="module")
+def mapeada(tmp_path_factory):
+    ruta_binaria = str(tmp_path_factory.mktemp("binaria") / "centros_exportados.bin")
+    escribir_binario_centros(CSV_EXPORTADO, ruta_binaria)
+    instantanea = AlmacenCentros(CSV_EXPORTADO, ruta_binaria=ruta_binaria).obtener()
+    assert isinstance(instantanea, InstantaneaMapeada)
+    return instantanea
+
+
+@pytest.fixture(params=["leida", "mapeada"])
+def instantanea(request):
+    return request.getfixturevalue(request.param)
+
+
+def cumple(fila, filtros, excluir=None):
+    return all(fila.get(COLUMNAS_FILTRO[parametro], "") == valor
+               for parametro, valor in filtros.items() if valor and parametro != excluir)
+
+
+def sin_tildes(texto):
+    return "".join(caracter for caracter in unicodedata.normalize("NFKD", texto.casefold()) if not unicodedata.combining(caracter))
+
+
+def o_infinito(valor):
+    return float("inf") if valor is None else valor
+
+
+@pytest.mark.parametrize("filtros", COMBINACIONES)
+def test_filtrar_coincide_con_recorrer_las_filas(instantanea, filtros):
+    esperadas = {posicion for posicion, fila in enumerate(instantanea.filas) if cumple(fila, filtros)}
+
+    assert {int(posicion) for posicion in instantanea.indice.filtrar(filtros)} == esperadas
+
+
+@pytest.mark.parametrize("filtros", COMBINACIONES)
+def test_facetas_aplican_los_filtros_de_las_demas_columnas(instantanea, filtros):
+    facetas = instantanea.indice.facetas(filtros)
+
+    for parametro, columna in COLUMNAS_FILTRO.items():
+        esperadas = Counter(fila.get(columna, "") for fila in instantanea.filas if cumple(fila, filtros, excluir=parametro))
+        assert facetas[columna] == dict(sorted(esperadas.items()))
+
+
+def test_ordenaciones(instantanea):
+    claves = {
+        "duracion": lambda fila: o_infinito(duracion_a_segundos(fila["Duración"])),
+        "distancia": lambda fila: o_infinito(distancia_a_metros(fila["Distancia (Km)"])),
+        "nombre": lambda fila: sin_tildes(fila["Nombre Centro"]),
+    }
+    for orden, clave in claves.items():
+        _, filas = instantanea.indice.buscar({}, orden)
+        valores = [clave(fila) for fila in filas]
+        assert valores == sorted(valores), orden
+        _, filas = instantanea.indice.buscar({}, orden, descendente=True)
+        valores = [clave(fila) for fila in filas]
+        assert valores == sorted(valores, reverse=True), orden
+
+    # Sin orden se respeta el del fichero
+    total, filas = instantanea.indice.buscar({})
+    assert total == len(instantanea.filas)
+    assert filas == list(instantanea.filas)
+
+
+@pytest.mark.parametrize("orden", [None, *ORDENACIONES])
+@pytest.mark.parametrize("descendente", [False, True])
+def test_paginas_coinciden_con_el_orden_completo(instantanea, orden, descendente):
+    filtros = {"idiomas": "Es bilingüe"}
+    total, todas = instantanea.indice.buscar(filtros, orden, descendente)
+
+    assert total == len(todas)
+    assert list(instantanea.indice.iterar(filtros, orden, descendente)) == todas
+    # Las páginas pequeñas se seleccionan con un montículo y las grandes ordenando todo
+    for offset, limit in PAGINAS:
+        total_pagina, pagina = instantanea.indice.buscar(filtros, orden, descendente, limit, offset)
+        assert total_pagina == total
+        assert pagina == todas[offset:offset + limit]
+
+
+@pytest.mark.parametrize("filtros", COMBINACIONES)
+def test_indice_mapeado_coincide_con_el_leido_del_csv(leida, mapeada, filtros):
+    assert sorted(int(posicion) for posicion in mapeada.indice.filtrar(filtros)) == sorted(leida.indice.filtrar(filtros))
+    assert mapeada.indice.facetas(filtros) == leida.indice.facetas(filtros)
+    for orden in (None, *ORDENACIONES):
+        for descendente in (False, True):
+            for offset, limit in [(0, None), *PAGINAS]:
+                assert (mapeada.indice.buscar(filtros, orden, descendente, limit, offset)
+                        == leida.indice.buscar(filtros, orden, descendente, limit, offset)), (orden, descendente, offset)
+            assert list(mapeada.indice.iterar(filtros, orden, descendente)) == list(leida.indice.iterar(filtros, orden, descendente))
+    assert mapeada.json == leida.json
@@ -0,0 +1,126 @@
+# Pruebas de la agrupación de peticiones y la caché LRU de ServicioRanking, con un cálculo
+# simulado en lugar de los trayectos:
+#
+#   python -m pytest tests
+
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from services import enrutamiento
+from services.ranking import ServicioRanking
+
+
+@pytest.fixture(autouse=True)
+def motor_estimado(monkeypatch):
+    # La clave de la caché incluye el motor; el estimado no necesita clave ni red
+    monkeypatch.setattr(enrutamiento, "_motor", enrutamiento.crear_motor("estimado"))
+
+
+class CalculoSimulado:
+    """
+    Sustituye a ServicioRanking._calcular: cuenta los cálculos y, si se indica, los retiene
+    hasta que se suelta el evento 'soltar'.
+    """
+
+    def __init__(self, retener=False, error=None, centros=(1,)):
+        self.origenes = []
+        self.soltar = threading.Event()
+        if not retener:
+            self.soltar.set()
+        self.error = error
+        self.centros = list(centros)
+
+    def __call__(self, origen, radio_km, top_k):
+        self.origenes.append(origen)
+        self.soltar.wait(10)
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(origen=origen, centros=self.centros)
+
+
+def servicio_simulado(monkeypatch, capacidad=8, **opciones):
+    servicio = ServicioRanking("coincidencias.csv", capacidad=capacidad)
+    calculo = CalculoSimulado(**opciones)
+    monkeypatch.setattr(servicio, "_calcular", calculo)
+    return servicio, calculo
+
+
+def pedir_a_la_vez(servicio, calculo, peticiones, **origen):
+    # Lanza las peticiones en paralelo y suelta el cálculo cuando todas menos una esperan a la primera
+    resultados = [None] * peticiones
+
+    def pedir(numero):
+        try:
+            resultados[numero] = servicio.obtener(**origen)
+        except Exception as error:
+            resultados[numero] = error
+
+    hilos = [threading.Thread(target=pedir, args=(numero,)) for numero in range(peticiones)]
+    for hilo in hilos:
+        hilo.start()
+    limite = time.monotonic() + 10
+    while servicio.estadisticas()["agrupadas"] < peticiones - 1 and time.monotonic() < limite:
+        time.sleep(0.005)
+    calculo.soltar.set()
+    for hilo in hilos:
+        hilo.join(10)
+    return resultados
+
+
+def test_peticiones_simultaneas_comparten_un_calculo(monkeypatch):
+    servicio, calculo = servicio_simulado(monkeypatch, retener=True)
+
+    resultados = pedir_a_la_vez(servicio, calculo, 8, origen="Calle Costa Rica 49, Churriana de la Vega")
+
+    assert len(calculo.origenes) == 1
+    assert Counter(procedencia for _, procedencia in resultados) == {"calculada": 1, "agrupada": 7}
+    assert len({id(ranking) for ranking, _ in resultados}) == 1
+    # Un origen equivalente (mayúsculas, espacios) sale ya de la caché
+    ranking, procedencia = servicio.obtener(origen="  calle costa rica 49,  churriana de la vega ")
+    assert procedencia == "cache"
+    assert ranking is resultados[0][0]
+    assert servicio.estadisticas() == {"aciertos": 1, "calculos": 1, "agrupadas": 7, "rankings": 1, "en_curso": 0}
+
+
+def test_un_error_llega_a_todas_las_peticiones_agrupadas_y_no_se_guarda(monkeypatch):
+    servicio, calculo = servicio_simulado(monkeypatch, retener=True, error=RuntimeError("motor caído"))
+
+    resultados = pedir_a_la_vez(servicio, calculo, 4, lat=37.1744, lng=-3.599)
+
+    assert len(calculo.origenes) == 1
+    assert all(isinstance(resultado, RuntimeError) for resultado in resultados)
+    assert servicio.estadisticas()["rankings"] == servicio.estadisticas()["en_curso"] == 0
+    # La siguiente petición vuelve a calcular
+    calculo.error = None
+    assert servicio.obtener(lat=37.1744, lng=-3.599)[1] == "calculada"
+    assert len(calculo.origenes) == 2
+
+
+def test_ranking_vacio_no_se_guarda(monkeypatch):
+    servicio, calculo = servicio_simulado(monkeypatch, centros=())
+
+    assert servicio.obtener(origen="Granada")[1] == "calculada"
+    assert servicio.obtener(origen="Granada")[1] == "calculada"
+    assert len(calculo.origenes) == 2
+
+
+def test_cache_lru_descarta_el_origen_usado_hace_mas_tiempo(monkeypatch):
+    servicio, calculo = servicio_simulado(monkeypatch, capacidad=2)
+
+    def procedencia(lat):
+        return servicio.obtener(lat=lat, lng=-3.6)[1]
+
+    assert procedencia(37.1) == "calculada"
+    assert procedencia(37.2) == "calculada"
+    # Coordenadas a menos de 10 m comparten ranking; 37.1 pasa a ser el más reciente
+    assert procedencia(37.10001) == "cache"
+    assert procedencia(37.3) == "calculada"  # descarta 37.2
+    assert procedencia(37.1) == "cache"
+    assert procedencia(37.2) == "calculada"  # descarta 37.3
+    assert procedencia(37.3) == "calculada"
+    assert calculo.origenes == ["37.1000,-3.6000", "37.2000,-3.6000", "37.3000,-3.6000", "37.2000,-3.6000", "37.3000,-3.6000"]
+    assert servicio.estadisticas()["rankings"] == 2
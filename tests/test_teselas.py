@@ -0,0 +1,90 @@
+# Pruebas de /api/tiles/{z}/{x}/{y}: los centros de cada tesela coinciden con un recuento
+# directo de las coordenadas del registro dentro de los límites de la tesela:
+#
+#   python -m pytest tests
+
+import math
+
+import numpy as np
+import pytest
+
+# Plaza del Carmen (Granada): se prueban las teselas que la contienen, de toda Andalucía a unas pocas calles
+LAT, LNG = 37.1744, -3.5990
+ZOOMS = [6, 8, 10, 12, 14]
+
+
+@pytest.fixture(scope="module")
+def registro(cliente):
+    import main
+    return main.registro_centros
+
+
+def longitud(x, zoom):
+    return x / (1 << zoom) * 360.0 - 180.0
+
+
+def latitud(y, zoom):
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / (1 << zoom)))))
+
+
+def tesela_de(lat, lng, zoom):
+    x = int((lng + 180.0) / 360.0 * (1 << zoom))
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * (1 << zoom))
+    return zoom, x, y
+
+
+TESELAS = [tesela_de(LAT, LNG, zoom) for zoom in ZOOMS]
+
+
+def dentro_de_tesela(registro, zoom, x, y):
+    # Límites de la tesela: incluye el borde oeste y el norte y excluye el este y el sur
+    return ((registro.longitudes >= longitud(x, zoom)) & (registro.longitudes < longitud(x + 1, zoom))
+            & (registro.latitudes <= latitud(y, zoom)) & (registro.latitudes > latitud(y + 1, zoom)))
+
+
+def leer_tesela(cliente, zoom, x, y, **filtros):
+    respuesta = cliente.get(f"/api/tiles/{zoom}/{x}/{y}", params=filtros)
+    assert respuesta.status_code == 200
+    tesela = respuesta.json()
+    total = sum(grupo["centros"] for grupo in tesela["grupos"]) + len(tesela["centros"])
+    assert int(respuesta.headers["X-Total-Count"]) == total
+    return total, tesela
+
+
+@pytest.mark.parametrize("zoom, x, y", TESELAS)
+def test_total_coincide_con_el_recuento_directo(cliente, registro, zoom, x, y):
+    dentro = dentro_de_tesela(registro, zoom, x, y)
+
+    total, tesela = leer_tesela(cliente, zoom, x, y)
+
+    assert total == int(dentro.sum()) > 0
+    # Los centros sueltos están dentro de la tesela y los grupos tienen al menos dos
+    codigos = {registro.codigos[posicion] for posicion in np.flatnonzero(dentro).tolist()}
+    assert {centro["codigo"] for centro in tesela["centros"]} <= codigos
+    assert all(grupo["centros"] > 1 for grupo in tesela["grupos"])
+    assert all(longitud(x, zoom) <= grupo["lng"] <= longitud(x + 1, zoom) and latitud(y + 1, zoom) <= grupo["lat"] <= latitud(y, zoom)
+               for grupo in tesela["grupos"])
+
+
+@pytest.mark.parametrize("zoom, x, y", TESELAS)
+def test_total_con_filtros(cliente, registro, zoom, x, y):
+    dentro = dentro_de_tesela(registro, zoom, x, y) & registro.bilingue
+    dentro &= np.array([valor == "Público" for valor in registro.publico_privado])
+
+    total, _ = leer_tesela(cliente, zoom, x, y, publico_privado="Público", bilingue="true")
+
+    assert total == int(dentro.sum())
+
+
+def test_las_teselas_de_un_zoom_suman_todos_los_centros(cliente, registro):
+    zoom = 3
+    con_coordenadas = int((~(np.isnan(registro.latitudes) | np.isnan(registro.longitudes))).sum())
+
+    total = sum(leer_tesela(cliente, zoom, x, y)[0] for x in range(1 << zoom) for y in range(1 << zoom))
+
+    assert total == con_coordenadas > 0
+
+
+@pytest.mark.parametrize("ruta", ["/api/tiles/19/0/0", "/api/tiles/3/8/0", "/api/tiles/3/0/-1"])
+def test_tesela_inexistente(cliente, ruta):
+    assert cliente.get(ruta).status_code == 404